@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from datetime import date, time as dtime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+AVAILABILITY_CACHE_TTL = float(os.environ.get('AVAILABILITY_CACHE_TTL', '30'))
+AVAILABILITY_VERSION = 'availability'
+SLOT_STEP_MINUTES = int(os.environ.get('SLOT_STEP_MINUTES', '15'))
+AVAILABILITY_MAX_DAYS = int(os.environ.get('AVAILABILITY_MAX_DAYS', '31'))
+
+Interval = Tuple[int, int]
+
+
+def to_minutes(value: Any) -> int:
+    '''TIME или строка "HH:MM[:SS]" -> минуты от начала суток'''
+    if isinstance(value, dtime):
+        return value.hour * 60 + value.minute
+    hours, minutes = str(value).split(':')[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def format_minutes(minutes: int) -> str:
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+def day_of_week(day: date) -> int:
+    '''Номер дня недели как в employee_schedule и EXTRACT(DOW): 0 — воскресенье'''
+    return day.isoweekday() % 7
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    '''Сортирует и склеивает пересекающиеся интервалы, O(n log n)'''
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(working: Interval, busy: Iterable[Interval]) -> List[Interval]:
+    '''Свободные интервалы рабочего времени за вычетом занятых, один проход по отсортированным'''
+    free: List[Interval] = []
+    cursor, end = working
+    for busy_start, busy_end in merge_intervals(busy):
+        if busy_end <= cursor:
+            continue
+        if busy_start >= end:
+            break
+        if busy_start > cursor:
+            free.append((cursor, busy_start))
+        cursor = max(cursor, busy_end)
+    if cursor < end:
+        free.append((cursor, end))
+    return free
+
+
+def slots_in(free: List[Interval], duration: int, step: int = SLOT_STEP_MINUTES) -> List[Interval]:
+    '''Начала слотов с шагом step, в которые услуга длительностью duration помещается целиком'''
+    slots: List[Interval] = []
+    for start, end in free:
+        slot = -(-start // step) * step
+        while slot + duration <= end:
+            slots.append((slot, slot + duration))
+            slot += step
+    return slots
+
+
+class AvailabilityCache:
+    '''
+    Свободные интервалы по (сотрудник, день) вместе с версией 'availability'
+    из cache_versions, при которой они посчитаны. Запись бронирования или
+    расписания в любой функции увеличивает версию (триггеры V0015), и записи
+    со старой версией не отдаются; TTL ограничивает размер кэша. Без версии
+    (None) ничего не кэшируется.
+    '''
+
+    def __init__(self, ttl: float = AVAILABILITY_CACHE_TTL):
+        self.ttl = ttl
+        self._entries: Dict[Tuple[int, date], Tuple[List[Interval], int, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, employee_id: int, day: date, version: Optional[int]) -> Optional[List[Interval]]:
+        if version is None:
+            return None
+        with self._lock:
+            entry = self._entries.get((employee_id, day))
+            if entry is None:
+                return None
+            if entry[1] != version or entry[2] <= time.monotonic():
+                del self._entries[(employee_id, day)]
+                return None
+            return entry[0]
+
+    def put(self, employee_id: int, day: date, version: Optional[int], free: List[Interval]) -> None:
+        if self.ttl <= 0 or version is None:
+            return
+        with self._lock:
+            self._entries[(employee_id, day)] = (free, version, time.monotonic() + self.ttl)
+
+    def invalidate(self, employee_id: Optional[int] = None, day: Optional[date] = None) -> None:
+        with self._lock:
+            if employee_id is None and day is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries
+                        if (employee_id is None or k[0] == employee_id) and (day is None or k[1] == day)]:
+                del self._entries[key]
+
+
+availability_cache = AvailabilityCache()
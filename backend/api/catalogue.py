@@ -0,0 +1,64 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+SERVICES_CACHE_TTL = float(os.environ.get('SERVICES_CACHE_TTL', '60'))
+
+
+def get_version(cursor, name: str) -> Optional[int]:
+    '''Текущая версия каталога из cache_versions (один запрос по первичному ключу)'''
+    cursor.execute('SELECT version FROM cache_versions WHERE name = %s', (name,))
+    row = cursor.fetchone()
+    return row['version'] if row else None
+
+
+def bump_version(cursor, name: str) -> None:
+    '''Увеличивает версию каталога в той же транзакции, что и изменение данных'''
+    cursor.execute('''
+        INSERT INTO cache_versions (name, version) VALUES (%s, 1)
+        ON CONFLICT (name) DO UPDATE SET version = cache_versions.version + 1
+    ''', (name,))
+
+
+class CatalogueCache:
+    '''
+    Кэш каталога услуг в памяти экземпляра. В пределах TTL отдается без запросов;
+    по истечении TTL сверяется версия из cache_versions и данные перечитываются,
+    только если каталог меняли.
+    '''
+
+    def __init__(self, ttl: float = SERVICES_CACHE_TTL):
+        self.ttl = ttl
+        self.version: Optional[int] = None
+        self.data: Optional[Dict[str, Any]] = None
+        self.expires = 0.0
+        self._lock = threading.Lock()
+
+    def fresh(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if self.data is not None and self.expires > time.monotonic():
+                return self.data
+            return None
+
+    def revalidate(self, version: Optional[int]) -> Optional[Dict[str, Any]]:
+        '''Продлевает TTL, если версия в БД совпадает с закэшированной'''
+        with self._lock:
+            if self.data is not None and version is not None and version == self.version:
+                self.expires = time.monotonic() + self.ttl
+                return self.data
+            return None
+
+    def store(self, version: Optional[int], data: Dict[str, Any]) -> None:
+        with self._lock:
+            self.version = version
+            self.data = data
+            self.expires = time.monotonic() + self.ttl
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.data = None
+            self.expires = 0.0
+
+
+services_cache = CatalogueCache()
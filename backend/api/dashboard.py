@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+DASHBOARD_CACHE_TTL = float(os.environ.get('DASHBOARD_CACHE_TTL', '5'))
+DASHBOARD_RECENT_ITEMS = int(os.environ.get('DASHBOARD_RECENT_ITEMS', '5'))
+
+# Все счетчики и последние записи одним запросом. Условия совпадают с индексами
+# idx_bookings_date_start_time_id (booking_date, затем порядок ближайших записей),
+# частичными idx_feedback_unread_created_at (is_read = FALSE) и
+# idx_reviews_pending_created_at (approved = FALSE).
+SUMMARY_QUERY = '''
+    SELECT
+        (SELECT count(*) FROM bookings WHERE booking_date = CURRENT_DATE) AS bookings_today,
+        (SELECT count(*) FROM bookings
+          WHERE booking_date >= CURRENT_DATE AND booking_date < CURRENT_DATE + 7) AS bookings_week,
+        (SELECT count(*) FROM feedback WHERE is_read = FALSE) AS unread_feedback,
+        (SELECT count(*) FROM reviews WHERE approved = FALSE) AS pending_reviews,
+        (SELECT COALESCE(json_agg(b), '[]') FROM (
+            SELECT b.id, COALESCE(b.client_name, u.full_name) AS client_name, b.service,
+                   b.booking_date, COALESCE(to_char(b.start_time, 'HH24:MI'), b.booking_time) AS booking_time,
+                   b.status
+            FROM bookings b
+            LEFT JOIN users u ON b.user_id = u.id
+            WHERE b.booking_date >= CURRENT_DATE
+            ORDER BY b.booking_date, COALESCE(b.start_time, TIME '24:00'), b.id
+            LIMIT %(limit)s
+        ) b) AS upcoming_bookings,
+        (SELECT COALESCE(json_agg(f), '[]') FROM (
+            SELECT id, name, phone, message, created_at
+            FROM feedback
+            WHERE is_read = FALSE
+            ORDER BY created_at DESC
+            LIMIT %(limit)s
+        ) f) AS recent_feedback,
+        (SELECT COALESCE(json_agg(r), '[]') FROM (
+            SELECT id, author, rating, comment, created_at
+            FROM reviews
+            WHERE approved = FALSE
+            ORDER BY created_at DESC
+            LIMIT %(limit)s
+        ) r) AS pending_reviews_list
+'''
+
+
+def load_summary(cursor) -> Dict[str, Any]:
+    cursor.execute(SUMMARY_QUERY, {'limit': DASHBOARD_RECENT_ITEMS})
+    row = cursor.fetchone()
+    return {
+        'counters': {
+            'bookings_today': row['bookings_today'],
+            'bookings_week': row['bookings_week'],
+            'unread_feedback': row['unread_feedback'],
+            'pending_reviews': row['pending_reviews'],
+        },
+        'upcoming_bookings': row['upcoming_bookings'],
+        'recent_feedback': row['recent_feedback'],
+        'pending_reviews': row['pending_reviews_list'],
+    }
+
+
+class SummaryCache:
+    '''
+    Сводка для панели администратора в памяти экземпляра на несколько секунд:
+    открытые вкладки админки не повторяют агрегаты при каждом обновлении.
+    '''
+
+    def __init__(self, ttl: float = DASHBOARD_CACHE_TTL):
+        self.ttl = ttl
+        self.data: Optional[Dict[str, Any]] = None
+        self.expires = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if self.data is not None and self.expires > time.monotonic():
+                return self.data
+            return None
+
+    def store(self, data: Dict[str, Any]) -> None:
+        with self._lock:
+            self.data = data
+            self.expires = time.monotonic() + self.ttl
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.data = None
+            self.expires = 0.0
+
+
+summary_cache = SummaryCache()
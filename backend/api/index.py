@@ -1,17 +1,135 @@
 import json
 import os
 import psycopg2
+import psycopg2.errors
 from psycopg2.extras import RealDictCursor
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
+from db import get_pool
+from timing import connection_kwargs, instrumented, timed
+from replica import SAFE_METHODS, replicas
+from session import get_session_token, get_user_from_session
+from pagination import CursorError, decode_cursor, get_page_size, paginate
+from projection import FieldsError, joins_for, requested_fields, select_list
+from response import (
+    JSON_HEADERS, cacheable_response, columnar, compressed, dumps, json_response, row_getter, tuple_cursor,
+    wants_columnar
+)
+from catalogue import bump_version, get_version, services_cache
+from dashboard import load_summary, summary_cache
+from prepared import statements
+from availability import (
+    AVAILABILITY_MAX_DAYS, AVAILABILITY_VERSION, availability_cache, day_of_week, format_minutes,
+    slots_in, subtract_intervals, to_minutes
+)
 
-def get_db_connection():
-    """Создает подключение к базе данных"""
-    return psycopg2.connect(
+ALTERNATIVE_SLOTS = 3
+CACHEABLE_PATHS = ('services', 'schedule')
+REPLICA_PATHS = ('services', 'reviews', 'schedule', 'availability')
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', '500'))
+BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', '10'))
+BATCH_PATHS = ('services', 'schedule', 'reviews', 'availability', 'me')
+
+ACTIVE_SERVICES = statements.register(
+    'active_services', 'SELECT * FROM services WHERE is_active = TRUE ORDER BY category, name'
+)
+ACTIVE_CATEGORIES = statements.register(
+    'active_categories', 'SELECT DISTINCT category FROM services WHERE is_active = TRUE ORDER BY category'
+)
+BOOKING_REQUIRED_FIELDS = ('user_id', 'employee_id', 'service_id', 'booking_date', 'start_time', 'end_time')
+
+# Идентификаторы выделяются до вставки: по ним RETURNING сопоставляется
+# с номером строки во входных массивах (WITH ORDINALITY), даже если у двух
+# элементов совпадают сотрудник, дата и время. Более ранний элемент пачки
+# выигрывает пересечение с более поздним.
+BULK_INSERT_BOOKINGS = '''
+    WITH item AS (
+        SELECT nextval(pg_get_serial_sequence('bookings', 'id')) AS id, t.*
+        FROM unnest(%s::int[], %s::int[], %s::int[], %s::date[], %s::time[], %s::time[], %s::text[], %s::text[])
+            WITH ORDINALITY AS t(user_id, employee_id, service_id, booking_date, start_time, end_time, notes, status, ordinal)
+    ), inserted AS (
+        INSERT INTO bookings
+        (id, user_id, employee_id, service_id, booking_date, start_time, end_time, notes, status)
+        SELECT id, user_id, employee_id, service_id, booking_date, start_time, end_time, notes, status
+        FROM item ORDER BY ordinal
+        ON CONFLICT DO NOTHING
+        RETURNING id
+    )
+    SELECT item.ordinal, inserted.id FROM item JOIN inserted USING (id)
+'''
+# Запись по id: booking_ids (V0014) дает дату, и запрос идет в одну секцию
+BOOKING_BY_ID = "id = %s AND booking_date = (SELECT booking_date FROM booking_ids WHERE id = %s)"
+BOOKING_BY_IDS = "id = ANY(%s) AND booking_date = ANY(ARRAY(SELECT booking_date FROM booking_ids WHERE id = ANY(%s)))"
+BULK_REFERENCES = (
+    ('user_id', 'SELECT id FROM users WHERE id = ANY(%s)'),
+    ('employee_id', 'SELECT id FROM users WHERE id = ANY(%s)'),
+    ('service_id', 'SELECT id FROM services WHERE id = ANY(%s)'),
+)
+
+# Поля списка записей для ?fields=: имя поля -> выражение; JOIN подключается,
+# только если запрошена колонка его таблицы
+BOOKING_FIELDS = {
+    'id': 'b.id', 'user_id': 'b.user_id', 'employee_id': 'b.employee_id', 'service_id': 'b.service_id',
+    'booking_date': 'b.booking_date', 'start_time': 'b.start_time', 'end_time': 'b.end_time',
+    'status': 'b.status', 'notes': 'b.notes', 'created_at': 'b.created_at', 'updated_at': 'b.updated_at',
+    'service_name': 's.name', 'price': 's.price',
+    'client_name': 'u1.full_name', 'client_phone': 'u1.phone', 'employee_name': 'u2.full_name'
+}
+BOOKING_JOINS = {
+    's': 'LEFT JOIN services s ON b.service_id = s.id',
+    'u1': 'LEFT JOIN users u1 ON b.user_id = u1.id',
+    'u2': 'LEFT JOIN users u2 ON b.employee_id = u2.id'
+}
+BOOKING_KEY_FIELDS = ('booking_date', 'start_time', 'id')
+REVIEW_FIELDS = {
+    'id': 'r.id', 'client_id': 'r.client_id', 'booking_id': 'r.booking_id', 'rating': 'r.rating',
+    'comment': 'r.comment', 'status': 'r.status', 'created_at': 'r.created_at', 'client_name': 'u.full_name'
+}
+REVIEW_JOINS = {'u': 'LEFT JOIN users u ON r.client_id = u.id'}
+
+class BookingConflict(Exception):
+    """Запись пересекается с другой записью того же сотрудника"""
+    def __init__(self, alternatives: list):
+        super().__init__('Time slot is already booked')
+        self.alternatives = alternatives
+
+class AccessDenied(Exception):
+    """Нет сессии (401) или у пользователя нет нужной роли (403)"""
+    def __init__(self, message: str, status: int = 403):
+        super().__init__(message)
+        self.status = status
+
+def get_db_pool():
+    """Пул подключений к базе данных, общий для теплых вызовов"""
+    return get_pool(
         os.environ['DATABASE_URL'],
+        schema=os.environ['MAIN_DB_SCHEMA'],
         cursor_factory=RealDictCursor,
-        options=f"-c search_path={os.environ['MAIN_DB_SCHEMA']}"
+        **connection_kwargs()
     )
 
+def get_replica_pool(dsn: str):
+    """Пул подключений к реплике из DATABASE_REPLICA_URL"""
+    return get_pool(dsn, schema=os.environ['MAIN_DB_SCHEMA'], cursor_factory=RealDictCursor, **connection_kwargs())
+
+@timed('connect')
+def get_db_connection(read_event: dict = None):
+    """Берет подключение к базе данных из пула; для чтения (read_event) — к реплике, если она не отстает"""
+    if read_event is not None:
+        return replicas.getconn(read_event, get_db_pool(), get_replica_pool)
+    return get_db_pool().getconn()
+
+def release_db_connection(conn):
+    """Возвращает подключение в пул, из которого оно выдано"""
+    replicas.pool_of(conn, get_db_pool()).putconn(conn)
+
+def is_write(event: dict) -> bool:
+    """Запрос меняет данные: все, кроме GET и пакета подзапросов на чтение"""
+    params = event.get('queryStringParameters') or {}
+    return event.get('httpMethod', 'GET') not in SAFE_METHODS and params.get('path') != 'batch'
+
+@instrumented('api')
+@compressed
+@replicas.sticky_after_writes(is_write)
 def handler(event: dict, context) -> dict:
     """
     API для работы с данными салона красоты
@@ -25,7 +143,7 @@ def handler(event: dict, context) -> dict:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id, X-Authorization'
+                'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-User-Id, X-Authorization, X-Session-Token, X-Read-Primary-Until'
             },
             'body': '',
             'isBase64Encoded': False
@@ -33,44 +151,87 @@ def handler(event: dict, context) -> dict:
     
     path = event.get('queryStringParameters', {}).get('path', '')
     
+    conn = None
     try:
-        conn = get_db_connection()
+        result = get_cached_result(path, method, event)
+        if result is None:
+            reads_only = (method == 'GET' and path in REPLICA_PATHS) or path == 'batch'
+            conn = get_db_connection(event if reads_only else None)
+            result = route(conn, path, method, event)
         
-        if path == 'services':
-            result = handle_services(conn, method, event)
-        elif path == 'bookings':
-            result = handle_bookings(conn, method, event)
-        elif path == 'reviews':
-            result = handle_reviews(conn, method, event)
-        elif path == 'users':
-            result = handle_users(conn, method, event)
-        elif path == 'schedule':
-            result = handle_schedule(conn, method, event)
-        else:
-            result = {'error': 'Invalid path'}
-            
-        conn.close()
+        if is_write(event) and 'error' not in result:
+            # Сводка админки этого экземпляра не ждет DASHBOARD_CACHE_TTL после
+            # записи через api; записи в других функциях видны по истечении TTL
+            summary_cache.invalidate()
         
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps(result, default=str),
-            'isBase64Encoded': False
-        }
+        if method == 'GET' and path in CACHEABLE_PATHS and 'error' not in result:
+            return cacheable_response(event, dumps(result), JSON_HEADERS)
+        
+        return json_response(result)
+        
+    except BookingConflict as e:
+        return json_response({'error': str(e), 'alternatives': e.alternatives}, 409)
+        
+    except AccessDenied as e:
+        return json_response({'error': str(e)}, e.status)
         
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'error': str(e)}),
-            'isBase64Encoded': False
-        }
+        return json_response({'error': str(e)}, 500)
+    finally:
+        if conn is not None:
+            release_db_connection(conn)
+
+def route(conn, path: str, method: str, event: dict) -> dict:
+    """Выбирает обработчик по параметру path"""
+    if path == 'services':
+        return handle_services(conn, method, event)
+    elif path == 'bookings':
+        return handle_bookings(conn, method, event)
+    elif path == 'reviews':
+        return handle_reviews(conn, method, event)
+    elif path == 'users':
+        return handle_users(conn, method, event)
+    elif path == 'schedule':
+        return handle_schedule(conn, method, event)
+    elif path == 'availability':
+        return handle_availability(conn, method, event)
+    elif path == 'batch':
+        return handle_batch(conn, method, event)
+    elif path == 'dashboard':
+        return handle_dashboard(conn, method, event)
+    return {'error': 'Invalid path'}
+
+def get_cached_result(path: str, method: str, event: dict):
+    """Свежий ответ из кэша экземпляра, без подключения к БД"""
+    if path == 'services' and method == 'GET':
+        catalogue = services_cache.fresh()
+        if catalogue is not None:
+            return services_response(catalogue, event.get('queryStringParameters', {}).get('action', 'list'))
+    return None
+
+def load_catalogue(cursor) -> dict:
+    """Каталог активных услуг и категорий: из кэша, после сверки версии или из БД"""
+    catalogue = services_cache.fresh()
+    if catalogue is not None:
+        return catalogue
+    version = get_version(cursor, 'services')
+    catalogue = services_cache.revalidate(version)
+    if catalogue is not None:
+        return catalogue
+    statements.execute(cursor, ACTIVE_SERVICES)
+    services = cursor.fetchall()
+    statements.execute(cursor, ACTIVE_CATEGORIES)
+    categories = [row['category'] for row in cursor.fetchall()]
+    catalogue = {'services': services, 'categories': categories, 'version': version}
+    services_cache.store(version, catalogue)
+    return catalogue
+
+def services_response(catalogue: dict, action: str):
+    if action == 'list':
+        return {'services': catalogue['services'], 'version': catalogue['version']}
+    elif action == 'categories':
+        return {'categories': catalogue['categories'], 'version': catalogue['version']}
+    return None
 
 def handle_services(conn, method: str, event: dict) -> dict:
     """Управление услугами"""
@@ -78,15 +239,9 @@ def handle_services(conn, method: str, event: dict) -> dict:
     
     if method == 'GET':
         action = event.get('queryStringParameters', {}).get('action', 'list')
-        
-        if action == 'list':
-            cursor.execute('SELECT * FROM services WHERE is_active = TRUE ORDER BY category, name')
-            services = cursor.fetchall()
-            return {'services': services}
-        elif action == 'categories':
-            cursor.execute('SELECT DISTINCT category FROM services WHERE is_active = TRUE ORDER BY category')
-            categories = [row['category'] for row in cursor.fetchall()]
-            return {'categories': categories}
+        result = services_response(load_catalogue(cursor), action)
+        if result is not None:
+            return result
     
     elif method == 'POST':
         data = json.loads(event.get('body', '{}'))
@@ -95,8 +250,11 @@ def handle_services(conn, method: str, event: dict) -> dict:
             VALUES (%s, %s, %s, %s, %s)
             RETURNING id
         ''', (data['name'], data.get('description'), data['duration'], data['price'], data.get('category')))
+        service_id = cursor.fetchone()['id']
+        bump_version(cursor, 'services')
         conn.commit()
-        return {'id': cursor.fetchone()['id'], 'status': 'created'}
+        services_cache.invalidate()
+        return {'id': service_id, 'status': 'created'}
     
     elif method == 'PUT':
         data = json.loads(event.get('body', '{}'))
@@ -106,7 +264,9 @@ def handle_services(conn, method: str, event: dict) -> dict:
             WHERE id=%s
         ''', (data['name'], data.get('description'), data['duration'], data['price'], 
               data.get('category'), data.get('is_active', True), data['id']))
+        bump_version(cursor, 'services')
         conn.commit()
+        services_cache.invalidate()
         return {'status': 'updated'}
     
     elif method == 'DELETE':
@@ -114,7 +274,9 @@ def handle_services(conn, method: str, event: dict) -> dict:
         if not service_id:
             return {'error': 'Service ID required'}
         cursor.execute('DELETE FROM services WHERE id = %s', (service_id,))
+        bump_version(cursor, 'services')
         conn.commit()
+        services_cache.invalidate()
         return {'status': 'deleted'}
     
     return {'error': 'Method not allowed'}
@@ -127,17 +289,32 @@ def handle_bookings(conn, method: str, event: dict) -> dict:
         user_id = event.get('queryStringParameters', {}).get('user_id')
         employee_id = event.get('queryStringParameters', {}).get('employee_id')
         status = event.get('queryStringParameters', {}).get('status')
+        cursor_param = event.get('queryStringParameters', {}).get('cursor')
+        
+        try:
+            limit = get_page_size(event.get('queryStringParameters', {}))
+            page_cursor = decode_cursor(cursor_param, ('date', 'time', 'int')) if cursor_param else None
+            fields = requested_fields(event.get('queryStringParameters', {}), BOOKING_FIELDS, BOOKING_KEY_FIELDS)
+        except (CursorError, FieldsError) as e:
+            return {'error': str(e)}
         
-        query = '''
-            SELECT b.*, s.name as service_name, s.price,
-                   u1.full_name as client_name, u1.phone as client_phone,
-                   u2.full_name as employee_name
-            FROM bookings b
-            LEFT JOIN services s ON b.service_id = s.id
-            LEFT JOIN users u1 ON b.user_id = u1.id
-            LEFT JOIN users u2 ON b.employee_id = u2.id
-            WHERE 1=1
-        '''
+        if fields:
+            query = f'''
+                SELECT {select_list(fields, BOOKING_FIELDS)}
+                FROM bookings b {joins_for(fields, BOOKING_FIELDS, BOOKING_JOINS)}
+                WHERE 1=1
+            '''
+        else:
+            query = '''
+                SELECT b.*, s.name as service_name, s.price,
+                       u1.full_name as client_name, u1.phone as client_phone,
+                       u2.full_name as employee_name
+                FROM bookings b
+                LEFT JOIN services s ON b.service_id = s.id
+                LEFT JOIN users u1 ON b.user_id = u1.id
+                LEFT JOIN users u2 ON b.employee_id = u2.id
+                WHERE 1=1
+            '''
         params = []
         
         if user_id:
@@ -149,53 +326,210 @@ def handle_bookings(conn, method: str, event: dict) -> dict:
         if status:
             query += ' AND b.status = %s'
             params.append(status)
+        if page_cursor:
+            query += " AND (b.booking_date, COALESCE(b.start_time, TIME '24:00'), b.id) < (%s::date, %s::time, %s::int)"
+            params.extend(page_cursor)
             
-        query += ' ORDER BY b.booking_date DESC, b.start_time DESC'
+        query += " ORDER BY b.booking_date DESC, COALESCE(b.start_time, TIME '24:00') DESC, b.id DESC LIMIT %s"
+        params.append(limit + 1)
         
-        cursor.execute(query, params)
-        bookings = cursor.fetchall()
-        return {'bookings': bookings}
+        list_cursor = tuple_cursor(conn) if wants_columnar(event) else cursor
+        list_cursor.execute(query, params)
+        get_key = row_getter(list_cursor, 'booking_date', 'start_time', 'id')
+        
+        def page_key(row):
+            booking_date, start_time, booking_id = get_key(row)
+            return booking_date, start_time or '24:00', booking_id
+        
+        bookings, next_cursor = paginate(list_cursor.fetchall(), limit, page_key)
+        if list_cursor is not cursor:
+            return dict(columnar(list_cursor, bookings), next_cursor=next_cursor)
+        return {'bookings': bookings, 'next_cursor': next_cursor}
     
     elif method == 'POST':
         data = json.loads(event.get('body', '{}'))
-        cursor.execute('''
-            INSERT INTO bookings 
-            (user_id, employee_id, service_id, booking_date, start_time, end_time, notes, status)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id
-        ''', (data['user_id'], data['employee_id'], data['service_id'], 
-              data['booking_date'], data['start_time'], data['end_time'], 
-              data.get('notes'), data.get('status', 'pending')))
+        if isinstance(data, list):
+            return bulk_create_bookings(conn, cursor, data)
+        try:
+            cursor.execute('''
+                INSERT INTO bookings 
+                (user_id, employee_id, service_id, booking_date, start_time, end_time, notes, status)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING id
+            ''', (data['user_id'], data['employee_id'], data['service_id'], 
+                  data['booking_date'], data['start_time'], data['end_time'], 
+                  data.get('notes'), data.get('status', 'pending')))
+        except psycopg2.errors.ExclusionViolation:
+            conn.rollback()
+            raise BookingConflict(nearby_slots(
+                cursor, data['employee_id'], data['booking_date'], data['start_time'], data['end_time']
+            ))
         conn.commit()
+        availability_cache.invalidate(int(data['employee_id']), date.fromisoformat(str(data['booking_date'])))
         return {'id': cursor.fetchone()['id'], 'status': 'created'}
     
     elif method == 'PUT':
         data = json.loads(event.get('body', '{}'))
-        cursor.execute('''
-            UPDATE bookings 
-            SET status=%s, booking_date=%s, start_time=%s, end_time=%s, notes=%s, updated_at=CURRENT_TIMESTAMP
-            WHERE id=%s
-        ''', (data.get('status'), data.get('booking_date'), data.get('start_time'), 
-              data.get('end_time'), data.get('notes'), data['id']))
+        if 'ids' in data:
+            return bulk_update_booking_status(conn, cursor, data.get('ids'), data.get('status'))
+        try:
+            cursor.execute('''
+                UPDATE bookings 
+                SET status=%s, booking_date=%s, start_time=%s, end_time=%s, notes=%s, updated_at=CURRENT_TIMESTAMP
+                WHERE ''' + BOOKING_BY_ID, (data.get('status'), data.get('booking_date'), data.get('start_time'), 
+                  data.get('end_time'), data.get('notes'), data['id'], data['id']))
+        except psycopg2.errors.ExclusionViolation:
+            conn.rollback()
+            cursor.execute('SELECT employee_id FROM bookings WHERE ' + BOOKING_BY_ID, (data['id'], data['id']))
+            booking = cursor.fetchone()
+            raise BookingConflict(nearby_slots(
+                cursor, booking['employee_id'], data['booking_date'], data['start_time'], data['end_time']
+            ) if booking else [])
         conn.commit()
+        availability_cache.invalidate()
         return {'status': 'updated'}
     
     return {'error': 'Method not allowed'}
 
+def bulk_create_bookings(conn, cursor, items: list) -> dict:
+    """Создает пачку записей одним INSERT в одной транзакции; пересечения и неизвестные ссылки — ошибки элементов"""
+    if len(items) > BULK_MAX_ITEMS:
+        return {'error': f'Too many items, max {BULK_MAX_ITEMS}'}
+    
+    results = [None] * len(items)
+    rows = {}
+    for index, item in enumerate(items):
+        missing = [field for field in BOOKING_REQUIRED_FIELDS if not isinstance(item, dict) or item.get(field) in (None, '')]
+        if missing:
+            results[index] = {'index': index, 'status': 'error', 'error': f"Missing fields: {', '.join(missing)}"}
+            continue
+        try:
+            user_id, employee_id, service_id = int(item['user_id']), int(item['employee_id']), int(item['service_id'])
+        except (TypeError, ValueError):
+            results[index] = {'index': index, 'status': 'error', 'error': 'Invalid user_id, employee_id or service_id'}
+            continue
+        try:
+            day = date.fromisoformat(str(item['booking_date']))
+            start, end = to_minutes(item['start_time']), to_minutes(item['end_time'])
+        except ValueError:
+            results[index] = {'index': index, 'status': 'error', 'error': 'Invalid date or time'}
+            continue
+        if end <= start:
+            results[index] = {'index': index, 'status': 'error', 'error': 'Invalid time range'}
+            continue
+        rows[index] = (
+            user_id, employee_id, service_id, day,
+            format_minutes(start), format_minutes(end), item.get('notes'), item.get('status', 'pending')
+        )
+    
+    # Ссылки проверяются заранее: ошибка внешнего ключа в INSERT отменила бы всю пачку
+    for position, (field, query) in enumerate(BULK_REFERENCES):
+        if not rows:
+            break
+        cursor.execute(query, (sorted({values[position] for values in rows.values()}),))
+        known = {row['id'] for row in cursor.fetchall()}
+        for index in [index for index, values in rows.items() if values[position] not in known]:
+            results[index] = {'index': index, 'status': 'error', 'error': f'Unknown {field}'}
+            del rows[index]
+    
+    created = {}
+    if rows:
+        indexes = list(rows)
+        try:
+            cursor.execute(BULK_INSERT_BOOKINGS, [list(column) for column in zip(*rows.values())])
+            created = {indexes[row['ordinal'] - 1]: row['id'] for row in cursor.fetchall()}
+        except psycopg2.errors.ForeignKeyViolation:
+            # Пользователь удален между проверкой и вставкой
+            conn.rollback()
+            for index in rows:
+                results[index] = {'index': index, 'status': 'error', 'error': 'Referenced user no longer exists'}
+            return {'results': results, 'created': 0}
+        conn.commit()
+        for employee_id, day in {(values[1], values[3]) for values in rows.values()}:
+            availability_cache.invalidate(employee_id, day)
+    
+    for index in rows:
+        booking_id = created.get(index)
+        if booking_id is None:
+            results[index] = {'index': index, 'status': 'conflict', 'error': 'Time slot is already booked'}
+        else:
+            results[index] = {'index': index, 'status': 'created', 'id': booking_id}
+    return {'results': results, 'created': sum(1 for r in results if r['status'] == 'created')}
+
+def bulk_update_booking_status(conn, cursor, ids, status) -> dict:
+    """Меняет статус пачки записей одним UPDATE ... WHERE id = ANY(...); пересечения — ошибки элементов"""
+    if not status or not isinstance(ids, list) or not ids:
+        return {'error': 'ids and status required'}
+    if len(ids) > BULK_MAX_ITEMS:
+        return {'error': f'Too many items, max {BULK_MAX_ITEMS}'}
+    try:
+        ids = [int(booking_id) for booking_id in ids]
+    except (TypeError, ValueError):
+        return {'error': 'Invalid ids'}
+    conflicts = set()
+    try:
+        cursor.execute('''
+            UPDATE bookings SET status=%s, updated_at=CURRENT_TIMESTAMP
+            WHERE ''' + BOOKING_BY_IDS + '''
+            RETURNING id
+        ''', (status, ids, ids))
+        updated = {row['id'] for row in cursor.fetchall()}
+    except psycopg2.errors.ExclusionViolation:
+        # Пачка пересекается с другими записями: по одной под SAVEPOINT,
+        # отказ получают только пересекающиеся
+        conn.rollback()
+        updated = set()
+        for booking_id in ids:
+            cursor.execute('SAVEPOINT booking_status')
+            try:
+                cursor.execute('''
+                    UPDATE bookings SET status=%s, updated_at=CURRENT_TIMESTAMP
+                    WHERE ''' + BOOKING_BY_ID + '''
+                    RETURNING id
+                ''', (status, booking_id, booking_id))
+            except psycopg2.errors.ExclusionViolation:
+                cursor.execute('ROLLBACK TO SAVEPOINT booking_status')
+                conflicts.add(booking_id)
+                continue
+            if cursor.fetchone():
+                updated.add(booking_id)
+            cursor.execute('RELEASE SAVEPOINT booking_status')
+    conn.commit()
+    availability_cache.invalidate()
+    results = []
+    for booking_id in ids:
+        if booking_id in conflicts:
+            results.append({'id': booking_id, 'status': 'conflict', 'error': 'Time slot is already booked'})
+        else:
+            results.append({'id': booking_id, 'status': 'updated' if booking_id in updated else 'not_found'})
+    return {'results': results, 'updated': len(updated)}
+
 def handle_reviews(conn, method: str, event: dict) -> dict:
     """Управление отзывами"""
     cursor = conn.cursor()
     
     if method == 'GET':
         status_param = event.get('queryStringParameters', {}).get('status', 'approved')
+        try:
+            fields = requested_fields(event.get('queryStringParameters', {}), REVIEW_FIELDS)
+        except FieldsError as e:
+            return {'error': str(e)}
         
-        cursor.execute('''
-            SELECT r.*, u.full_name as client_name
-            FROM reviews r
-            LEFT JOIN users u ON r.client_id = u.id
-            WHERE r.status = %s
-            ORDER BY r.created_at DESC
-        ''', (status_param,))
+        if fields:
+            cursor.execute(f'''
+                SELECT {select_list(fields, REVIEW_FIELDS)}
+                FROM reviews r {joins_for(fields, REVIEW_FIELDS, REVIEW_JOINS)}
+                WHERE r.status = %s
+                ORDER BY r.created_at DESC
+            ''', (status_param,))
+        else:
+            cursor.execute('''
+                SELECT r.*, u.full_name as client_name
+                FROM reviews r
+                LEFT JOIN users u ON r.client_id = u.id
+                WHERE r.status = %s
+                ORDER BY r.created_at DESC
+            ''', (status_param,))
         reviews = cursor.fetchall()
         return {'reviews': reviews}
     
@@ -234,14 +568,16 @@ def handle_users(conn, method: str, event: dict) -> dict:
             cursor.execute('SELECT id, email, full_name, phone, role, created_at FROM users WHERE id = %s', (user_id,))
             user = cursor.fetchone()
             return {'user': user}
-        elif role:
-            cursor.execute('SELECT id, email, full_name, phone, role, created_at FROM users WHERE role = %s', (role,))
-            users = cursor.fetchall()
-            return {'users': users}
+        
+        list_cursor = tuple_cursor(conn) if wants_columnar(event) else cursor
+        if role:
+            list_cursor.execute('SELECT id, email, full_name, phone, role, created_at FROM users WHERE role = %s', (role,))
         else:
-            cursor.execute('SELECT id, email, full_name, phone, role, created_at FROM users')
-            users = cursor.fetchall()
-            return {'users': users}
+            list_cursor.execute('SELECT id, email, full_name, phone, role, created_at FROM users')
+        users = list_cursor.fetchall()
+        if list_cursor is not cursor:
+            return columnar(list_cursor, users)
+        return {'users': users}
     
     elif method == 'POST':
         data = json.loads(event.get('body', '{}'))
@@ -350,6 +686,193 @@ def handle_schedule(conn, method: str, event: dict) -> dict:
         ''', (data['employee_id'], data['day_of_week'], data['start_time'], 
               data['end_time'], data['start_time'], data['end_time']))
         conn.commit()
+        availability_cache.invalidate(int(data['employee_id']))
         return {'id': cursor.fetchone()['id'], 'status': 'created'}
     
-    return {'error': 'Method not allowed'}
\ No newline at end of file
+    return {'error': 'Method not allowed'}
+
+def handle_availability(conn, method: str, event: dict) -> dict:
+    """Свободные слоты под услугу по расписанию сотрудников за вычетом записей"""
+    if method != 'GET':
+        return {'error': 'Method not allowed'}
+    
+    params = event.get('queryStringParameters', {})
+    if not params.get('service_id'):
+        return {'error': 'Service ID required'}
+    try:
+        service_id = int(params['service_id'])
+        date_from = date.fromisoformat(params.get('date_from') or date.today().isoformat())
+        date_to = date.fromisoformat(params.get('date_to') or date_from.isoformat())
+        employee_id = int(params['employee_id']) if params.get('employee_id') else None
+    except ValueError:
+        return {'error': 'Invalid parameters'}
+    if date_to < date_from:
+        return {'error': 'Invalid date range'}
+    date_to = min(date_to, date_from + timedelta(days=AVAILABILITY_MAX_DAYS - 1))
+    
+    cursor = conn.cursor()
+    cursor.execute('SELECT duration FROM services WHERE id = %s AND is_active = TRUE', (service_id,))
+    service = cursor.fetchone()
+    if not service:
+        return {'error': 'Service not found'}
+    duration = int(service['duration'])
+    
+    slots = find_free_slots(cursor, duration, date_from, date_to, employee_id)
+    return {'service_id': service_id, 'duration': duration, 'slots': slots}
+
+def find_free_slots(cursor, duration: int, date_from: date, date_to: date, employee_id=None) -> list:
+    """Слоты длительностью duration минут по сотрудникам и дням диапазона"""
+    query = 'SELECT employee_id, day_of_week, start_time, end_time FROM employee_schedule WHERE is_active = TRUE'
+    query_params = []
+    if employee_id:
+        query += ' AND employee_id = %s'
+        query_params.append(employee_id)
+    cursor.execute(query, query_params)
+    working_hours = {}
+    for row in cursor.fetchall():
+        working_hours[(row['employee_id'], row['day_of_week'])] = (to_minutes(row['start_time']), to_minutes(row['end_time']))
+    
+    version = get_version(cursor, AVAILABILITY_VERSION)
+    days = [date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+    free_by_day = {}
+    missing = []
+    for (emp_id, dow), working in working_hours.items():
+        for day in days:
+            if day_of_week(day) != dow:
+                continue
+            free = availability_cache.get(emp_id, day, version)
+            if free is None:
+                missing.append((emp_id, day))
+            else:
+                free_by_day[(emp_id, day)] = free
+    
+    if missing:
+        busy = {key: [] for key in missing}
+        cursor.execute('''
+            SELECT employee_id, booking_date, start_time, end_time
+            FROM bookings
+            WHERE employee_id = ANY(%s) AND booking_date BETWEEN %s AND %s
+              AND status <> 'cancelled' AND start_time IS NOT NULL AND end_time IS NOT NULL
+        ''', (list({emp_id for emp_id, _ in missing}), min(d for _, d in missing), max(d for _, d in missing)))
+        for row in cursor.fetchall():
+            key = (row['employee_id'], row['booking_date'])
+            if key in busy:
+                busy[key].append((to_minutes(row['start_time']), to_minutes(row['end_time'])))
+        for emp_id, day in missing:
+            free = subtract_intervals(working_hours[(emp_id, day_of_week(day))], busy[(emp_id, day)])
+            availability_cache.put(emp_id, day, version, free)
+            free_by_day[(emp_id, day)] = free
+    
+    slots = []
+    for (emp_id, day), free in sorted(free_by_day.items()):
+        for start, end in slots_in(free, duration):
+            slots.append({
+                'employee_id': emp_id,
+                'date': day.isoformat(),
+                'start_time': format_minutes(start),
+                'end_time': format_minutes(end)
+            })
+    return slots
+
+def nearby_slots(cursor, employee_id, booking_date, start_time, end_time) -> list:
+    """Ближайшие к запрошенному свободные слоты того же сотрудника в тот же день"""
+    day = date.fromisoformat(str(booking_date))
+    requested = to_minutes(start_time)
+    duration = to_minutes(end_time) - requested
+    if duration <= 0:
+        return []
+    availability_cache.invalidate(int(employee_id), day)
+    slots = find_free_slots(cursor, duration, day, day, int(employee_id))
+    slots.sort(key=lambda slot: abs(to_minutes(slot['start_time']) - requested))
+    return slots[:ALTERNATIVE_SLOTS]
+
+def handle_batch(conn, method: str, event: dict) -> dict:
+    """
+    Несколько GET-подзапросов за один вызов: сессия проверяется один раз,
+    все подзапросы выполняются на одном подключении в транзакции только для чтения
+    """
+    if method != 'POST':
+        return {'error': 'Method not allowed'}
+    
+    data = json.loads(event.get('body') or '[]')
+    items = data.get('requests') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items or len(items) > BATCH_MAX_ITEMS:
+        return {'error': f'Expected 1..{BATCH_MAX_ITEMS} sub-requests'}
+    
+    conn.readonly = True
+    session = {}
+    
+    def current_user():
+        if 'user' not in session:
+            token = get_session_token(event)
+            session['user'] = get_user_from_session(token, conn.cursor()) if token else None
+        return session['user']
+    
+    results = []
+    for item in items:
+        if not isinstance(item, dict) or item.get('path') not in BATCH_PATHS:
+            results.append({'status': 400, 'body': {'error': 'Invalid path'}})
+            continue
+        if item.get('method', 'GET') != 'GET':
+            results.append({'path': item['path'], 'status': 405, 'body': {'error': 'Only GET sub-requests are allowed'}})
+            continue
+        path = item['path']
+        sub_event = {
+            'httpMethod': 'GET',
+            'queryStringParameters': dict(item.get('params') or {}, path=path),
+            'headers': event.get('headers') or {}
+        }
+        try:
+            if path == 'me':
+                body, status = handle_me(conn, current_user())
+                if status == 401 and get_session_token(event) and replicas.is_replica(conn):
+                    body, status = me_from_primary(event)
+            else:
+                body = get_cached_result(path, 'GET', sub_event) or route(conn, path, 'GET', sub_event)
+                status = 400 if 'error' in body else 200
+        except Exception as e:
+            conn.rollback()
+            body, status = {'error': str(e)}, 500
+        results.append({'path': path, 'status': status, 'body': body})
+    
+    return {'results': results}
+
+def handle_me(conn, user) -> tuple:
+    """Текущий пользователь по сессии, как GET в функции auth"""
+    if user is None:
+        return {'error': 'Не авторизован'}, 401
+    if 'email' not in user:
+        cursor = conn.cursor()
+        cursor.execute('SELECT id, email, full_name, phone, role FROM users WHERE id = %s', (user['id'],))
+        user = cursor.fetchone()
+        if user is None:
+            return {'error': 'Сессия истекла'}, 401
+    return {'user': dict(user)}, 200
+
+def me_from_primary(event: dict) -> tuple:
+    """handle_me по основной базе: только что выданной сессии на реплике может еще не быть"""
+    conn = get_db_pool().getconn()
+    try:
+        token = get_session_token(event)
+        return handle_me(conn, get_user_from_session(token, conn.cursor()) if token else None)
+    finally:
+        get_db_pool().putconn(conn)
+
+def handle_dashboard(conn, method: str, event: dict) -> dict:
+    """Сводка для панели администратора: счетчики и последние записи, кэш на несколько секунд"""
+    if method != 'GET':
+        return {'error': 'Method not allowed'}
+    
+    cursor = conn.cursor()
+    session_token = get_session_token(event)
+    user = get_user_from_session(session_token, cursor) if session_token else None
+    if user is None:
+        raise AccessDenied('Требуется авторизация', 401)
+    if user['role'] != 'admin':
+        raise AccessDenied('Доступ запрещен')
+    
+    summary = summary_cache.get()
+    if summary is None:
+        summary = load_summary(cursor)
+        summary_cache.store(summary)
+    return summary
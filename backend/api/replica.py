@@ -0,0 +1,182 @@
+import functools
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import psycopg2
+from psycopg2 import extensions
+
+REPLICA_URLS = [url for url in re.split(r'[\s,]+', os.environ.get('DATABASE_REPLICA_URL', '')) if url]
+REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '5'))
+REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get('REPLICA_LAG_CHECK_INTERVAL', '2'))
+REPLICA_STICKY_SECONDS = float(os.environ.get('REPLICA_STICKY_SECONDS', str(REPLICA_MAX_LAG)))
+REPLICA_STICKY_CLIENTS = 4096
+STICKY_HEADER = 'X-Read-Primary-Until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Отставание реплики в секундах; 0, если все полученное уже применено
+# или сервер не в режиме восстановления (не реплика)
+LAG_QUERY = '''
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+'''
+
+
+def _header(event: Dict[str, Any], name: str) -> Optional[str]:
+    headers = event.get('headers') or {}
+    return headers.get(name) or headers.get(name.lower())
+
+
+def _client_key(event: Dict[str, Any]) -> Optional[str]:
+    '''Клиент для «чтения своих записей»: хэш токена сессии, если он есть'''
+    token = _header(event, 'X-Session-Token')
+    authorization = _header(event, 'Authorization') or ''
+    if not token and authorization.startswith('Bearer '):
+        token = authorization[len('Bearer '):].strip()
+    return hashlib.sha256(token.encode()).hexdigest() if token else None
+
+
+class ReplicaRouter:
+    '''
+    Выбор подключения для безопасных GET: реплика из DATABASE_REPLICA_URL
+    (по кругу), если ее отставание не больше REPLICA_MAX_LAG_SECONDS, иначе
+    основная база. Отставание проверяется на выданном подключении не чаще
+    раза в REPLICA_LAG_CHECK_INTERVAL. Клиент, который только что писал,
+    читает из основной базы REPLICA_STICKY_SECONDS: срок приходит от клиента
+    в заголовке X-Read-Primary-Until, а для сессий еще и запоминается в экземпляре.
+    '''
+
+    def __init__(self, urls: List[str] = REPLICA_URLS, max_lag: float = REPLICA_MAX_LAG,
+                 check_interval: float = REPLICA_LAG_CHECK_INTERVAL,
+                 sticky_seconds: float = REPLICA_STICKY_SECONDS):
+        self.urls = urls
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.sticky_seconds = sticky_seconds
+        self._lag: Dict[str, Tuple[float, Optional[float]]] = {}
+        self._writers: 'OrderedDict[str, float]' = OrderedDict()
+        self._owners: Dict[int, Any] = {}
+        self._next = 0
+        self._lock = threading.Lock()
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.urls)
+
+    def is_sticky(self, event: Dict[str, Any]) -> bool:
+        now = time.time()
+        try:
+            if float(_header(event, STICKY_HEADER) or 0) > now:
+                return True
+        except ValueError:
+            pass
+        key = _client_key(event)
+        if key is None:
+            return False
+        with self._lock:
+            return self._writers.get(key, 0.0) > now
+
+    def mark_write(self, event: Dict[str, Any]) -> Dict[str, str]:
+        '''Запоминает пишущего клиента и возвращает заголовок со сроком чтения из основной базы'''
+        until = time.time() + self.sticky_seconds
+        key = _client_key(event)
+        if key is not None:
+            with self._lock:
+                self._writers[key] = until
+                self._writers.move_to_end(key)
+                while len(self._writers) > REPLICA_STICKY_CLIENTS:
+                    self._writers.popitem(last=False)
+        return {STICKY_HEADER: f'{until:.3f}', 'Access-Control-Expose-Headers': STICKY_HEADER}
+
+    def _candidates(self) -> List[str]:
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.urls)
+        return self.urls[start:] + self.urls[:start]
+
+    def _lag_ok(self, url: str, conn) -> bool:
+        checked, lag = self._lag.get(url, (0.0, None))
+        if time.monotonic() - checked > self.check_interval:
+            with extensions.cursor(conn) as cur:
+                cur.execute(LAG_QUERY)
+                lag = float(cur.fetchone()[0])
+            conn.rollback()
+            self._lag[url] = (time.monotonic(), lag)
+        return lag is not None and lag <= self.max_lag
+
+    def getconn(self, event: Dict[str, Any], primary_pool, replica_pool: Callable[[str], Any]):
+        '''Подключение к подходящей реплике или к основной базе'''
+        if self.enabled and not self.is_sticky(event):
+            for url in self._candidates():
+                checked, lag = self._lag.get(url, (0.0, None))
+                if lag is None and time.monotonic() - checked <= self.check_interval:
+                    continue
+                pool = replica_pool(url)
+                try:
+                    conn = pool.getconn()
+                except (psycopg2.Error, OSError):
+                    self._lag[url] = (time.monotonic(), None)
+                    continue
+                try:
+                    healthy = self._lag_ok(url, conn)
+                except psycopg2.Error:
+                    self._lag[url] = (time.monotonic(), None)
+                    pool.putconn(conn, discard=True)
+                    continue
+                if healthy:
+                    with self._lock:
+                        self._owners[id(conn)] = pool
+                        self.replica_reads += 1
+                    return conn
+                pool.putconn(conn)
+        with self._lock:
+            self.primary_reads += 1
+        return primary_pool.getconn()
+
+    def is_replica(self, conn) -> bool:
+        '''Выдано ли подключение из пула реплики'''
+        with self._lock:
+            return id(conn) in self._owners
+
+    def pool_of(self, conn, primary_pool):
+        '''Пул, из которого выдано подключение'''
+        with self._lock:
+            return self._owners.pop(id(conn), primary_pool)
+
+    def sticky_after_writes(self, is_write: Callable[[Dict[str, Any]], bool]) -> Callable:
+        '''Декоратор handler: к успешному ответу на запись добавляет X-Read-Primary-Until'''
+        def decorate(handler: Callable) -> Callable:
+            if not self.enabled:
+                return handler
+
+            @functools.wraps(handler)
+            def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+                response = handler(event, context)
+                if is_write(event) and response.get('statusCode', 500) < 400:
+                    response['headers'] = dict(response.get('headers') or {}, **self.mark_write(event))
+                return response
+            return wrapper
+        return decorate
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'replica_reads': self.replica_reads,
+            'primary_reads': self.primary_reads,
+            'lag': {url.rsplit('@', 1)[-1]: lag for url, (_, lag) in self._lag.items()},
+        }
+
+
+def is_write_request(event: Dict[str, Any]) -> bool:
+    return event.get('httpMethod', 'GET') not in SAFE_METHODS
+
+
+replicas = ReplicaRouter()
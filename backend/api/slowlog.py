@@ -0,0 +1,152 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from typing import Any, List, Optional
+
+from psycopg2 import extensions
+
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '0'))
+SLOW_QUERY_ENABLED = SLOW_QUERY_MS > 0
+SLOW_QUERY_SAMPLE_RATE = float(os.environ.get('SLOW_QUERY_SAMPLE_RATE', '1'))
+SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', '/tmp/slow_queries.log')
+SLOW_QUERY_LOG_BYTES = int(os.environ.get('SLOW_QUERY_LOG_BYTES', str(5 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.environ.get('SLOW_QUERY_LOG_BACKUPS', '3'))
+SLOW_QUERY_MAX_SQL = 4000
+
+_READ_ONLY = re.compile(r'^\s*(SELECT|WITH|VALUES|TABLE)\b', re.IGNORECASE)
+_WRITES = re.compile(r'\b(INSERT|UPDATE|DELETE|MERGE)\b|\bFOR\s+(UPDATE|SHARE|NO KEY UPDATE|KEY SHARE)\b', re.IGNORECASE)
+# Вызов функции: name( или schema.name(. Ключевые слова перед скобкой и
+# встроенные функции без побочных эффектов ниже не считаются вызовом.
+_FUNCTION_CALL = re.compile(r'\b([a-z_][\w$]*(?:\.[a-z_][\w$]*)?)\s*\(', re.IGNORECASE)
+_PURE_CALLS = frozenset((
+    'in', 'any', 'all', 'some', 'exists', 'values', 'array', 'row', 'as', 'from', 'join', 'on', 'and', 'or',
+    'not', 'where', 'over', 'filter', 'using', 'select', 'with', 'cast', 'case', 'when', 'then', 'else',
+    'is', 'between', 'like', 'ilike', 'group', 'by', 'order', 'having', 'lateral', 'limit', 'offset',
+    'count', 'sum', 'min', 'max', 'avg', 'bool_and', 'bool_or', 'array_agg', 'json_agg', 'jsonb_agg',
+    'json_build_object', 'jsonb_build_object', 'string_agg', 'row_number', 'rank', 'coalesce', 'nullif',
+    'greatest', 'least', 'lower', 'upper', 'trim', 'length', 'substring', 'concat', 'lpad', 'rpad',
+    'abs', 'round', 'floor', 'ceil', 'now', 'date_trunc', 'extract', 'date_part', 'to_char', 'to_date',
+    'to_timestamp', 'age', 'tsrange', 'daterange', 'int4range', 'unnest', 'generate_series',
+))
+_EXPLAINABLE = re.compile(r'^\s*(SELECT|WITH|VALUES|TABLE|INSERT|UPDATE|DELETE|EXECUTE)\b', re.IGNORECASE)
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'(?<![\w$])-?\d+(?:\.\d+)?\b')
+_VALUES_LIST = re.compile(r'\(\?(?:\s*,\s*\?)*\)(?:\s*,\s*\(\?(?:\s*,\s*\?)*\))+')
+
+_logger: Optional[logging.Logger] = None
+
+
+def get_logger() -> logging.Logger:
+    '''Логгер с ротацией файла; создается при первом медленном запросе'''
+    global _logger
+    if _logger is None:
+        logger = logging.getLogger('slow_queries')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        handler = RotatingFileHandler(
+            SLOW_QUERY_LOG, maxBytes=SLOW_QUERY_LOG_BYTES, backupCount=SLOW_QUERY_LOG_BACKUPS, encoding='utf-8'
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        _logger = logger
+    return _logger
+
+
+def query_text(cursor, query: Any) -> str:
+    if hasattr(query, 'as_string'):
+        query = query.as_string(cursor.connection)
+    if isinstance(query, bytes):
+        query = query.decode(errors='replace')
+    return query
+
+
+def normalize_sql(query: str) -> str:
+    '''SQL без литералов и лишних пробелов: одинаковые запросы с разными значениями совпадают'''
+    query = _STRING_LITERAL.sub('?', query)
+    query = _NUMBER_LITERAL.sub('?', query)
+    query = _VALUES_LIST.sub('(?), ...', query)
+    return ' '.join(query.split())[:SLOW_QUERY_MAX_SQL]
+
+
+def params_shape(params: Any) -> Any:
+    '''Типы параметров вместо значений: в лог не попадают персональные данные'''
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    return [type(value).__name__ for value in params]
+
+
+def has_side_effect_calls(query: str) -> bool:
+    '''Есть вызов функции не из списка чистых (pg_advisory_lock, bookings_create_partition, nextval...)'''
+    return any(name.lower() not in _PURE_CALLS for name in _FUNCTION_CALL.findall(_STRING_LITERAL.sub("''", query)))
+
+
+def is_read_only(query: str) -> bool:
+    '''
+    Можно ли повторить запрос через EXPLAIN ANALYZE: чтение без записи и без
+    вызовов функций с возможными побочными эффектами (повтор pg_advisory_lock
+    взял бы блокировку второй раз).
+    '''
+    return bool(_READ_ONLY.match(query)) and not _WRITES.search(query) and not has_side_effect_calls(query)
+
+
+def explain(cursor, query: str, params: Any, analyze: bool) -> List[str]:
+    '''
+    План запроса на том же подключении. EXPLAIN ANALYZE повторно выполняет
+    запрос, поэтому используется только для чтения; ошибка плана откатывается
+    до точки сохранения и не влияет на транзакцию обработчика. Курсор создается
+    в обход conn.cursor(), чтобы сам EXPLAIN не замерялся.
+    '''
+    conn = cursor.connection
+    savepoint = not conn.autocommit and conn.info.transaction_status == extensions.TRANSACTION_STATUS_INTRANS
+    prefix = 'EXPLAIN (ANALYZE, BUFFERS) ' if analyze else 'EXPLAIN '
+    with extensions.cursor(conn) as cur:
+        if savepoint:
+            cur.execute('SAVEPOINT slow_query_explain')
+        try:
+            cur.execute(prefix + query, params)
+            plan = [row[0] for row in cur.fetchall()]
+        except Exception as e:
+            if savepoint:
+                cur.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+            return [f'EXPLAIN failed: {e}'.strip()]
+        if savepoint:
+            cur.execute('RELEASE SAVEPOINT slow_query_explain')
+    return plan
+
+
+def capture(cursor, query: Any, params: Any, elapsed: float,
+            request_id: Optional[str] = None, function: Optional[str] = None) -> None:
+    '''Записывает медленный запрос с планом в лог; вызывается после успешного execute'''
+    if getattr(cursor, 'name', None) or random.random() >= SLOW_QUERY_SAMPLE_RATE:
+        return
+    conn = cursor.connection
+    if conn.info.transaction_status not in (extensions.TRANSACTION_STATUS_IDLE, extensions.TRANSACTION_STATUS_INTRANS):
+        return
+    text = query_text(cursor, query)
+    if not _EXPLAINABLE.match(text):
+        return
+    normalized = normalize_sql(text)
+    analyze = is_read_only(text)
+    try:
+        plan = explain(cursor, text, params, analyze)
+    except Exception as e:
+        plan = [f'EXPLAIN failed: {e}'.strip()]
+    get_logger().info(json.dumps({
+        'ts': datetime.now(timezone.utc).isoformat(),
+        'request_id': request_id,
+        'function': function,
+        'ms': round(elapsed * 1000, 2),
+        'rows': max(cursor.rowcount, 0),
+        'fingerprint': hashlib.sha1(normalized.encode()).hexdigest()[:16],
+        'sql': normalized,
+        'params': params_shape(params),
+        'explain': 'analyze' if analyze else 'plan',
+        'plan': plan,
+    }, ensure_ascii=False))
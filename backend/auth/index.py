@@ -6,9 +6,37 @@ from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from db import get_pool
+from timing import connection_kwargs, instrumented, timed
+from replica import is_write_request, replicas
+from response import json_response
+from rate_limit import client_ip, limiter, normalize_email, request_body
+from session import (
+    get_session_token, get_user_from_session, issue_signed_token, revoke_session, signed_tokens_enabled
+)
 
-def get_db_connection():
-    return psycopg2.connect(os.environ['DATABASE_URL'])
+def get_db_pool():
+    return get_pool(os.environ['DATABASE_URL'], **connection_kwargs())
+
+def get_replica_pool(dsn: str):
+    return get_pool(dsn, **connection_kwargs())
+
+@timed('connect')
+def get_db_connection(read_event: Optional[Dict[str, Any]] = None):
+    '''Подключение к основной базе; для чтения (read_event) — к реплике, если она не отстает'''
+    if read_event is not None:
+        return replicas.getconn(read_event, get_db_pool(), get_replica_pool)
+    return get_db_pool().getconn()
+
+def release_db_connection(conn):
+    replicas.pool_of(conn, get_db_pool()).putconn(conn)
+
+def session_user(session_token: str, cur) -> Optional[Dict[str, Any]]:
+    user = get_user_from_session(session_token, cur)
+    if user and 'email' not in user:
+        cur.execute("SELECT id, email, full_name, phone, role FROM users WHERE id = %s", (user['id'],))
+        user = cur.fetchone()
+    return user
 
 def hash_password(password: str) -> str:
     return hashlib.sha256(password.encode()).hexdigest()
@@ -16,6 +44,31 @@ def hash_password(password: str) -> str:
 def generate_session_token() -> str:
     return secrets.token_urlsafe(32)
 
+def create_session(cur, user_id: int, role: str) -> str:
+    if signed_tokens_enabled():
+        session_token, _ = issue_signed_token(user_id, role)
+        return session_token
+    session_token = generate_session_token()
+    expires_at = datetime.now() + timedelta(days=30)
+    cur.execute(
+        "INSERT INTO sessions (user_id, session_token, expires_at) VALUES (%s, %s, %s)",
+        (user_id, session_token, expires_at)
+    )
+    return session_token
+
+def rate_limit_keys(event: Dict[str, Any]) -> list:
+    '''Вход и регистрация ограничиваются по IP клиента и по email'''
+    if event.get('httpMethod') != 'POST':
+        return []
+    body = request_body(event)
+    action = body.get('action')
+    if action not in ('login', 'register'):
+        return []
+    return [(f'{action}_ip', client_ip(event)), (f'{action}_email', normalize_email(body.get('email')))]
+
+@instrumented('auth')
+@replicas.sticky_after_writes(is_write_request)
+@limiter.guard(rate_limit_keys, get_db_pool)
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     Business: User authentication and session management
@@ -31,14 +84,14 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Session-Token',
+                'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Session-Token, X-Read-Primary-Until',
                 'Access-Control-Max-Age': '86400'
             },
             'body': '',
             'isBase64Encoded': False
         }
     
-    conn = get_db_connection()
+    conn = get_db_connection(event if method == 'GET' else None)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     
     try:
@@ -54,39 +107,24 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 
                 cur.execute("SELECT id FROM users WHERE email = %s", (email,))
                 if cur.fetchone():
-                    return {
-                        'statusCode': 400,
-                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                        'body': json.dumps({'error': 'Пользователь с таким email уже существует'}),
-                        'isBase64Encoded': False
-                    }
+                    return json_response({'error': 'Пользователь с таким email уже существует'}, 400)
                 
                 password_hash = hash_password(password)
                 cur.execute(
-                    "INSERT INTO users (email, password_hash, full_name, phone) VALUES (%s, %s, %s, %s) RETURNING id",
+                    "INSERT INTO users (email, password_hash, full_name, phone) VALUES (%s, %s, %s, %s) RETURNING id, role",
                     (email, password_hash, full_name, phone)
                 )
                 user = cur.fetchone()
                 conn.commit()
                 
-                session_token = generate_session_token()
-                expires_at = datetime.now() + timedelta(days=30)
-                cur.execute(
-                    "INSERT INTO sessions (user_id, session_token, expires_at) VALUES (%s, %s, %s)",
-                    (user['id'], session_token, expires_at)
-                )
+                session_token = create_session(cur, user['id'], user['role'])
                 conn.commit()
                 
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({
-                        'success': True,
-                        'session_token': session_token,
-                        'user_id': user['id']
-                    }),
-                    'isBase64Encoded': False
-                }
+                return json_response({
+                    'success': True,
+                    'session_token': session_token,
+                    'user_id': user['id']
+                })
             
             elif action == 'login':
                 email = body.get('email')
@@ -100,91 +138,52 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 user = cur.fetchone()
                 
                 if not user:
-                    return {
-                        'statusCode': 401,
-                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                        'body': json.dumps({'error': 'Неверный email или пароль'}),
-                        'isBase64Encoded': False
-                    }
+                    return json_response({'error': 'Неверный email или пароль'}, 401)
                 
-                session_token = generate_session_token()
-                expires_at = datetime.now() + timedelta(days=30)
-                cur.execute(
-                    "INSERT INTO sessions (user_id, session_token, expires_at) VALUES (%s, %s, %s)",
-                    (user['id'], session_token, expires_at)
-                )
+                session_token = create_session(cur, user['id'], user['role'])
                 conn.commit()
                 
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({
-                        'success': True,
-                        'session_token': session_token,
-                        'user': {
-                            'id': user['id'],
-                            'full_name': user['full_name'],
-                            'role': user['role']
-                        }
-                    }),
-                    'isBase64Encoded': False
-                }
+                return json_response({
+                    'success': True,
+                    'session_token': session_token,
+                    'user': {
+                        'id': user['id'],
+                        'full_name': user['full_name'],
+                        'role': user['role']
+                    }
+                })
             
             elif action == 'logout':
-                session_token = event.get('headers', {}).get('x-session-token') or event.get('headers', {}).get('X-Session-Token')
+                session_token = get_session_token(event)
                 if session_token:
-                    cur.execute("UPDATE sessions SET expires_at = NOW() WHERE session_token = %s", (session_token,))
+                    revoke_session(session_token, cur)
                     conn.commit()
                 
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'success': True}),
-                    'isBase64Encoded': False
-                }
+                return json_response({'success': True})
         
         elif method == 'GET':
-            session_token = event.get('headers', {}).get('x-session-token') or event.get('headers', {}).get('X-Session-Token')
+            session_token = get_session_token(event)
             
             if not session_token:
-                return {
-                    'statusCode': 401,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Не авторизован'}),
-                    'isBase64Encoded': False
-                }
+                return json_response({'error': 'Не авторизован'}, 401)
             
-            cur.execute(
-                """SELECT u.id, u.email, u.full_name, u.phone, u.role 
-                   FROM users u 
-                   JOIN sessions s ON u.id = s.user_id 
-                   WHERE s.session_token = %s AND s.expires_at > NOW()""",
-                (session_token,)
-            )
-            user = cur.fetchone()
+            user = session_user(session_token, cur)
+            if not user and replicas.is_replica(conn):
+                # Только что выданная сессия могла еще не дойти до реплики —
+                # отказ подтверждается по основной базе
+                primary = get_db_connection()
+                cur.close()
+                release_db_connection(conn)
+                conn, cur = primary, primary.cursor(cursor_factory=RealDictCursor)
+                user = session_user(session_token, cur)
             
             if not user:
-                return {
-                    'statusCode': 401,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Сессия истекла'}),
-                    'isBase64Encoded': False
-                }
+                return json_response({'error': 'Сессия истекла'}, 401)
             
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'user': dict(user)}),
-                'isBase64Encoded': False
-            }
+            return json_response({'user': dict(user)})
     
     finally:
         cur.close()
-        conn.close()
+        release_db_connection(conn)
     
-    return {
-        'statusCode': 405,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'error': 'Метод не поддерживается'}),
-        'isBase64Encoded': False
-    }
+    return json_response({'error': 'Метод не поддерживается'}, 405)
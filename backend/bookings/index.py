@@ -1,23 +1,117 @@
 import json
 import os
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from datetime import datetime
 import psycopg2
+import psycopg2.errors
 from psycopg2.extras import RealDictCursor
+from db import get_pool
+from timing import connection_kwargs, instrumented, timed
+from response import columnar, compressed, json_response, row_getter, tuple_cursor, wants_columnar
+from prepared import statements
+from session import get_session_token, get_user_from_session
+from export import ExportError, date_range_filter, export_response, export_rows
+from pagination import CursorError, decode_cursor, get_page_size, paginate
+from projection import FieldsError, requested_fields, select_list
+from maintenance import MaintenanceError, run_maintenance
+from idempotency import idempotency, is_replay
+from rate_limit import client_ip, limiter, normalize_phone, request_body
 
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', '500'))
+BOOKING_FIELDS = {name: name for name in (
+    'id', 'user_id', 'client_name', 'phone', 'service', 'master', 'booking_date', 'booking_time',
+    'status', 'notes', 'employee_id', 'service_id', 'start_time', 'end_time', 'created_at', 'updated_at'
+)}
+BOOKING_KEY_FIELDS = ('booking_date', 'booking_time', 'id')
+# Записи без времени идут в ключе сортировки как '24:00' — так же, как
+# COALESCE(start_time, TIME '24:00') в api
+EMPTY_BOOKING_TIME = '24:00'
+# Тот же ответ на пересечение, что и в api (409)
+TIME_SLOT_TAKEN = 'Time slot is already booked'
+# Запись по id: booking_ids (V0014) дает дату, и запрос идет в одну секцию
+BOOKING_BY_ID = "id = %s AND booking_date = (SELECT booking_date FROM booking_ids WHERE id = %s)"
+BOOKING_BY_IDS = "id = ANY(%s) AND booking_date = ANY(ARRAY(SELECT booking_date FROM booking_ids WHERE id = ANY(%s)))"
+
+USER_BOOKINGS = statements.register('user_bookings', '''
+    SELECT * FROM bookings WHERE user_id = %s
+    ORDER BY booking_date DESC, COALESCE(booking_time, '24:00') DESC, id DESC LIMIT %s
+''')
+USER_BOOKINGS_AFTER = statements.register('user_bookings_after', '''
+    SELECT * FROM bookings
+    WHERE user_id = %s AND (booking_date, COALESCE(booking_time, '24:00'), id) < (%s::date, %s, %s::int)
+    ORDER BY booking_date DESC, COALESCE(booking_time, '24:00') DESC, id DESC LIMIT %s
+''')
+
+def get_db_pool():
+    return get_pool(os.environ['DATABASE_URL'], **connection_kwargs())
+
+@timed('connect')
 def get_db_connection():
-    return psycopg2.connect(os.environ['DATABASE_URL'])
+    return get_db_pool().getconn()
+
+def release_db_connection(conn):
+    get_db_pool().putconn(conn)
 
-def get_user_from_session(session_token: str, cur) -> Dict[str, Any]:
+def create_booking(conn, cur, body: Dict[str, Any], user_id) -> Dict[str, Any]:
+    client_name = body.get('client_name')
+    phone = body.get('phone')
+    service = body.get('service')
+    master = body.get('master')
+    booking_date = body.get('booking_date')
+    booking_time = body.get('booking_time')
+    
     cur.execute(
-        """SELECT u.id, u.role 
-           FROM users u 
-           JOIN sessions s ON u.id = s.user_id 
-           WHERE s.session_token = %s AND s.expires_at > NOW()""",
-        (session_token,)
+        """INSERT INTO bookings (client_name, phone, service, master, booking_date, booking_time, user_id)
+           VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id""",
+        (client_name, phone, service, master, booking_date, booking_time, user_id)
     )
-    return cur.fetchone()
+    booking = cur.fetchone()
+    
+    return json_response({'success': True, 'booking_id': booking['id']})
 
+def update_statuses(conn, cur, ids: list, status: str, owner_id=None) -> Dict[int, Optional[str]]:
+    '''
+    Меняет статус записей ids (только записей owner_id, если он задан): id -> None
+    или текст ошибки. Пачка обновляется одним UPDATE; если он упирается в
+    bookings_employee_no_overlap, записи обновляются по одной под SAVEPOINT,
+    и отказ получают только пересекающиеся с другими.
+    '''
+    owner = ' AND user_id = %s' if owner_id is not None else ''
+    try:
+        cur.execute(
+            "UPDATE bookings SET status = %s WHERE " + BOOKING_BY_IDS + owner + " RETURNING id",
+            (status, ids, ids, *([owner_id] if owner_id is not None else []))
+        )
+        updated = {row['id']: None for row in cur.fetchall()}
+    except psycopg2.errors.ExclusionViolation:
+        conn.rollback()
+        updated = {}
+        for booking_id in ids:
+            cur.execute("SAVEPOINT booking_status")
+            try:
+                cur.execute(
+                    "UPDATE bookings SET status = %s WHERE " + BOOKING_BY_ID + owner + " RETURNING id",
+                    (status, booking_id, booking_id, *([owner_id] if owner_id is not None else []))
+                )
+            except psycopg2.errors.ExclusionViolation:
+                cur.execute("ROLLBACK TO SAVEPOINT booking_status")
+                updated[booking_id] = TIME_SLOT_TAKEN
+                continue
+            if cur.fetchone():
+                updated[booking_id] = None
+            cur.execute("RELEASE SAVEPOINT booking_status")
+    conn.commit()
+    return updated
+
+def rate_limit_keys(event: Dict[str, Any]) -> list:
+    '''Создание записи (POST без action) ограничивается по IP клиента и по телефону'''
+    if event.get('httpMethod') != 'POST' or (event.get('queryStringParameters') or {}).get('action'):
+        return []
+    return [('bookings_ip', client_ip(event)), ('bookings_phone', normalize_phone(request_body(event).get('phone')))]
+
+@instrumented('bookings')
+@compressed
+@limiter.guard(rate_limit_keys, get_db_pool, refund_if=is_replay)
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     Business: Manage client bookings - create, view, update, delete
@@ -33,7 +127,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Session-Token',
+                'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Session-Token, X-Read-Primary-Until, Idempotency-Key',
                 'Access-Control-Max-Age': '86400'
             },
             'body': '',
@@ -44,7 +138,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     cur = conn.cursor(cursor_factory=RealDictCursor)
     
     try:
-        session_token = event.get('headers', {}).get('x-session-token') or event.get('headers', {}).get('X-Session-Token')
+        session_token = get_session_token(event)
         user = None
         if session_token:
             user = get_user_from_session(session_token, cur)
@@ -53,133 +147,157 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             params = event.get('queryStringParameters') or {}
             booking_id = params.get('id')
             
+            try:
+                fields = requested_fields(params, BOOKING_FIELDS, () if booking_id else BOOKING_KEY_FIELDS)
+            except FieldsError as e:
+                return json_response({'error': str(e)}, 400)
+            projection = select_list(fields, BOOKING_FIELDS) if fields else '*'
+            
             if booking_id:
-                cur.execute("SELECT * FROM bookings WHERE id = %s", (booking_id,))
+                cur.execute(f"SELECT {projection} FROM bookings WHERE {BOOKING_BY_ID}", (booking_id, booking_id))
                 booking = cur.fetchone()
                 if not booking:
-                    return {
-                        'statusCode': 404,
-                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                        'body': json.dumps({'error': 'Запись не найдена'}),
-                        'isBase64Encoded': False
-                    }
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'booking': dict(booking)}, default=str),
-                    'isBase64Encoded': False
-                }
-            
-            if user:
-                if user['role'] == 'admin':
-                    cur.execute("SELECT * FROM bookings ORDER BY booking_date DESC, booking_time DESC")
-                else:
-                    cur.execute("SELECT * FROM bookings WHERE user_id = %s ORDER BY booking_date DESC, booking_time DESC", (user['id'],))
+                    return json_response({'error': 'Запись не найдена'}, 404)
+                return json_response({'booking': booking})
+            
+            if not user:
+                return json_response({'error': 'Требуется авторизация'}, 401)
+            
+            if params.get('format'):
+                if user['role'] != 'admin':
+                    return json_response({'error': 'Доступ запрещен'}, 403)
+                try:
+                    where, values = date_range_filter(params, 'booking_date')
+                    if params.get('cursor'):
+                        values.extend(decode_cursor(params['cursor'], ('date', 'str', 'int')))
+                        where = (where + ' AND ' if where else 'WHERE ') + \
+                            "(booking_date, COALESCE(booking_time, '24:00'), id) > (%s::date, %s, %s::int)"
+                    body, next_cursor = export_rows(
+                        conn, 'bookings',
+                        "SELECT * FROM bookings " + where +
+                        " ORDER BY booking_date, COALESCE(booking_time, '24:00'), id",
+                        values, params['format'],
+                        (('booking_date', None), ('booking_time', EMPTY_BOOKING_TIME), ('id', None))
+                    )
+                except (ExportError, CursorError) as e:
+                    return json_response({'error': str(e)}, 400)
+                return export_response(body, 'bookings', params['format'], next_cursor)
+            
+            try:
+                limit = get_page_size(params)
+                cursor = decode_cursor(params['cursor'], ('date', 'str', 'int')) if params.get('cursor') else None
+            except CursorError as e:
+                return json_response({'error': str(e)}, 400)
+            
+            list_cur = tuple_cursor(conn) if wants_columnar(event) else cur
+            if user['role'] != 'admin' and not fields:
+                statements.execute(
+                    list_cur,
+                    USER_BOOKINGS_AFTER if cursor else USER_BOOKINGS,
+                    [user['id'], *(cursor or ()), limit + 1]
+                )
             else:
-                return {
-                    'statusCode': 401,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Требуется авторизация'}),
-                    'isBase64Encoded': False
-                }
-            
-            bookings = cur.fetchall()
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'bookings': [dict(b) for b in bookings]}, default=str),
-                'isBase64Encoded': False
-            }
+                conditions = []
+                query_params = []
+                if user['role'] != 'admin':
+                    conditions.append("user_id = %s")
+                    query_params.append(user['id'])
+                if cursor:
+                    conditions.append("(booking_date, COALESCE(booking_time, '24:00'), id) < (%s::date, %s, %s::int)")
+                    query_params.extend(cursor)
+                where = f"WHERE {' AND '.join(conditions)} " if conditions else ''
+                query_params.append(limit + 1)
+                list_cur.execute(
+                    f"SELECT {projection} FROM bookings {where}ORDER BY booking_date DESC, COALESCE(booking_time, '24:00') DESC, id DESC LIMIT %s",
+                    query_params
+                )
+            get_key = row_getter(list_cur, 'booking_date', 'booking_time', 'id')
+            
+            def page_key(row):
+                booking_date, booking_time, booking_id = get_key(row)
+                return booking_date, booking_time or EMPTY_BOOKING_TIME, booking_id
+            
+            bookings, next_cursor = paginate(list_cur.fetchall(), limit, page_key)
+            if list_cur is not cur:
+                return json_response(dict(columnar(list_cur, bookings), next_cursor=next_cursor))
+            return json_response({'bookings': bookings, 'next_cursor': next_cursor})
         
         elif method == 'POST':
             body = json.loads(event.get('body', '{}'))
-            client_name = body.get('client_name')
-            phone = body.get('phone')
-            service = body.get('service')
-            master = body.get('master')
-            booking_date = body.get('booking_date')
-            booking_time = body.get('booking_time')
             
-            user_id = user['id'] if user else None
-            
-            cur.execute(
-                """INSERT INTO bookings (client_name, phone, service, master, booking_date, booking_time, user_id)
-                   VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id""",
-                (client_name, phone, service, master, booking_date, booking_time, user_id)
-            )
-            booking = cur.fetchone()
-            conn.commit()
+            if (event.get('queryStringParameters') or {}).get('action') == 'maintenance':
+                if not user or user['role'] != 'admin':
+                    return json_response({'error': 'Доступ запрещен'}, 403)
+                if not isinstance(body, dict):
+                    return json_response({'error': 'Тело запроса — объект JSON'}, 400)
+                try:
+                    result = run_maintenance(conn, **{
+                        key: body[key] for key in ('ahead', 'retention', 'mode') if key in body
+                    })
+                except MaintenanceError as e:
+                    return json_response({'error': str(e)}, 400)
+                return json_response(result)
             
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'success': True, 'booking_id': booking['id']}),
-                'isBase64Encoded': False
-            }
+            user_id = user['id'] if user else None
+            # Анонимные ключи не общие: у каждого клиента свое пространство
+            owner = user_id if user_id is not None else f'ip:{client_ip(event)}'
+            return idempotency.run(conn, 'bookings', event, owner, lambda: create_booking(conn, cur, body, user_id))
         
         elif method == 'PUT':
             if not user:
-                return {
-                    'statusCode': 401,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Требуется авторизация'}),
-                    'isBase64Encoded': False
-                }
+                return json_response({'error': 'Требуется авторизация'}, 401)
             
             body = json.loads(event.get('body', '{}'))
             booking_id = body.get('id')
             status = body.get('status')
             
+            if 'ids' in body:
+                ids = body.get('ids')
+                if (not isinstance(ids, list) or not ids or len(ids) > BULK_MAX_ITEMS or not status
+                        or not all(isinstance(i, int) for i in ids)):
+                    return json_response({'error': f'Нужны ids (не более {BULK_MAX_ITEMS}) и status'}, 400)
+                updated = update_statuses(conn, cur, ids, status, None if user['role'] == 'admin' else user['id'])
+                results = [
+                    dict({'id': i, 'success': i in updated and not updated[i]},
+                         **({'error': updated[i]} if updated.get(i) else {}))
+                    for i in ids
+                ]
+                
+                return json_response({
+                    'success': True,
+                    'updated': sum(1 for result in results if result['success']),
+                    'results': results
+                })
+            
             if user['role'] != 'admin':
-                cur.execute("SELECT user_id FROM bookings WHERE id = %s", (booking_id,))
+                cur.execute("SELECT user_id FROM bookings WHERE " + BOOKING_BY_ID, (booking_id, booking_id))
                 booking = cur.fetchone()
                 if not booking or booking['user_id'] != user['id']:
-                    return {
-                        'statusCode': 403,
-                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                        'body': json.dumps({'error': 'Доступ запрещен'}),
-                        'isBase64Encoded': False
-                    }
-            
-            cur.execute("UPDATE bookings SET status = %s WHERE id = %s", (status, booking_id))
+                    return json_response({'error': 'Доступ запрещен'}, 403)
+            
+            try:
+                cur.execute("UPDATE bookings SET status = %s WHERE " + BOOKING_BY_ID, (status, booking_id, booking_id))
+            except psycopg2.errors.ExclusionViolation:
+                conn.rollback()
+                return json_response({'error': TIME_SLOT_TAKEN, 'alternatives': []}, 409)
             conn.commit()
             
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'success': True}),
-                'isBase64Encoded': False
-            }
+            return json_response({'success': True})
         
         elif method == 'DELETE':
             if not user or user['role'] != 'admin':
-                return {
-                    'statusCode': 403,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Доступ запрещен'}),
-                    'isBase64Encoded': False
-                }
+                return json_response({'error': 'Доступ запрещен'}, 403)
             
             params = event.get('queryStringParameters') or {}
             booking_id = params.get('id')
             
-            cur.execute("UPDATE bookings SET status = %s WHERE id = %s", ('cancelled', booking_id))
+            cur.execute("UPDATE bookings SET status = %s WHERE " + BOOKING_BY_ID, ('cancelled', booking_id, booking_id))
             conn.commit()
             
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'success': True}),
-                'isBase64Encoded': False
-            }
+            return json_response({'success': True})
     
     finally:
         cur.close()
-        conn.close()
+        release_db_connection(conn)
     
-    return {
-        'statusCode': 405,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'error': 'Метод не поддерживается'}),
-        'isBase64Encoded': False
-    }
+    return json_response({'error': 'Метод не поддерживается'}, 405)
@@ -0,0 +1,118 @@
+import os
+import re
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from psycopg2 import extensions, sql
+
+PARTITIONS_AHEAD = int(os.environ.get('BOOKINGS_PARTITIONS_AHEAD', '3'))
+RETENTION_MONTHS = int(os.environ.get('BOOKINGS_RETENTION_MONTHS', '24'))
+# archive — перенос строк в bookings_archive и удаление секции;
+# detach — только отсоединение (таблица остается для выгрузки и удаления вручную)
+ARCHIVE_MODE = os.environ.get('BOOKINGS_ARCHIVE_MODE', 'archive')
+MAX_PARTITIONS_AHEAD = 24
+MAX_RETENTION_MONTHS = 1200
+
+_PARTITION_NAME = re.compile(r'^bookings_p(\d{4})(\d{2})$')
+
+PARTITIONS_QUERY = '''
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'bookings'::regclass
+    ORDER BY c.relname
+'''
+
+
+class MaintenanceError(ValueError):
+    pass
+
+
+def add_months(day: date, months: int) -> date:
+    '''Первое число месяца, отстоящего от day на months'''
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_months(cursor) -> Dict[str, date]:
+    '''Помесячные секции bookings: имя -> первое число месяца (bookings_default не входит)'''
+    cursor.execute(PARTITIONS_QUERY)
+    months = {}
+    for (name,) in cursor.fetchall():
+        match = _PARTITION_NAME.match(name)
+        if match:
+            months[name] = date(int(match.group(1)), int(match.group(2)), 1)
+    return months
+
+
+def run_maintenance(conn, today: Optional[date] = None, ahead: int = PARTITIONS_AHEAD,
+                    retention: int = RETENTION_MONTHS, mode: str = ARCHIVE_MODE) -> Dict[str, Any]:
+    '''
+    Создает секции bookings на текущий и ahead следующих месяцев и убирает
+    секции старше retention месяцев: переносит в bookings_archive или только
+    отсоединяет (mode=detach). Заодно удаляет истекшие ключи идемпотентности
+    и давно не обновлявшиеся счетчики rate_limits.
+    Все в одной транзакции.
+    '''
+    if not isinstance(mode, str) or mode not in ('archive', 'detach'):
+        raise MaintenanceError(f'Неизвестный режим архивации: {mode}')
+    # Значения приходят и из тела запроса: bool — тоже int, но не число месяцев
+    if not isinstance(ahead, int) or isinstance(ahead, bool) or not 0 <= ahead <= MAX_PARTITIONS_AHEAD:
+        raise MaintenanceError(f'ahead — целое число месяцев от 0 до {MAX_PARTITIONS_AHEAD}')
+    if not isinstance(retention, int) or isinstance(retention, bool) or not 1 <= retention <= MAX_RETENTION_MONTHS:
+        raise MaintenanceError(f'retention — целое число месяцев от 1 до {MAX_RETENTION_MONTHS}')
+    current = (today or date.today()).replace(day=1)
+    cutoff = add_months(current, -retention)
+    created: List[str] = []
+    archived: Dict[str, int] = {}
+    detached: List[str] = []
+    with conn.cursor(cursor_factory=extensions.cursor) as cursor:
+        for offset in range(ahead + 1):
+            cursor.execute('SELECT bookings_create_partition(%s)', (add_months(current, offset),))
+            name = cursor.fetchone()[0]
+            if name:
+                created.append(name)
+        for name, month in sorted(partition_months(cursor).items()):
+            if month >= cutoff:
+                continue
+            if mode == 'archive':
+                cursor.execute('SELECT bookings_archive_partition(%s)', (month,))
+                archived[name] = cursor.fetchone()[0]
+            else:
+                cursor.execute(sql.SQL('ALTER TABLE bookings DETACH PARTITION {}').format(sql.Identifier(name)))
+                # Строки отсоединенной секции больше не в bookings (см. V0014)
+                cursor.execute(
+                    'DELETE FROM booking_ids WHERE booking_date >= %s AND booking_date < %s',
+                    (month, add_months(month, 1))
+                )
+                detached.append(name)
+        cursor.execute('DELETE FROM idempotency_keys WHERE expires_at <= NOW()')
+        expired_keys = cursor.rowcount
+        # За сутки любой bucket пополняется до полного, строка ничего не хранит
+        cursor.execute("DELETE FROM rate_limits WHERE updated_at < NOW() - INTERVAL '1 day'")
+        stale_buckets = cursor.rowcount
+    conn.commit()
+    return {
+        'created': created,
+        'archived': archived,
+        'detached': detached,
+        'cutoff': cutoff.isoformat(),
+        'expired_idempotency_keys': expired_keys,
+        'stale_rate_limits': stale_buckets,
+    }
+
+
+if __name__ == '__main__':
+    # Запуск по расписанию вне функции: DATABASE_URL=... python maintenance.py
+    import json
+
+    import psycopg2
+
+    schema = os.environ.get('MAIN_DB_SCHEMA')
+    connection = psycopg2.connect(
+        os.environ['DATABASE_URL'], **({'options': f'-c search_path={schema}'} if schema else {})
+    )
+    try:
+        print(json.dumps(run_maintenance(connection), ensure_ascii=False))
+    finally:
+        connection.close()
@@ -0,0 +1,100 @@
+import base64
+import binascii
+import json
+import os
+import re
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+PAGE_SIZE_DEFAULT = int(os.environ.get('PAGE_SIZE_DEFAULT', '100'))
+PAGE_SIZE_MAX = int(os.environ.get('PAGE_SIZE_MAX', '500'))
+
+
+class CursorError(ValueError):
+    pass
+
+
+_TIME = re.compile(r'^(?:[01]\d|2[0-3]):[0-5]\d(?::[0-5]\d(?:\.\d{1,6})?)?$|^24:00(?::00)?$')
+
+
+def _parse_date(value: str) -> date:
+    return date.fromisoformat(value)
+
+
+def _parse_time(value: str) -> str:
+    '''HH:MM[:SS] или 24:00 (так в ключе сортировки заменяется пустое время)'''
+    if not _TIME.match(value):
+        raise ValueError(value)
+    return value
+
+
+def _parse_timestamp(value: str) -> Any:
+    '''ISO 8601 или infinity (так в ключе сортировки заменяется пустая метка времени)'''
+    if value == 'infinity':
+        return value
+    return datetime.fromisoformat(value)
+
+
+def _parse_int(value: str) -> int:
+    if not value.lstrip('-').isdigit():
+        raise ValueError(value)
+    return int(value)
+
+
+# Типы значений ключа сортировки в курсоре
+CURSOR_PARSERS: Dict[str, Callable[[str], Any]] = {
+    'date': _parse_date,
+    'time': _parse_time,
+    'timestamp': _parse_timestamp,
+    'int': _parse_int,
+    'str': str,
+}
+
+
+def get_page_size(params: Dict[str, Any]) -> int:
+    '''Размер страницы из ?limit=, ограниченный PAGE_SIZE_MAX'''
+    try:
+        limit = int(params.get('limit') or PAGE_SIZE_DEFAULT)
+    except (TypeError, ValueError):
+        raise CursorError('Некорректный limit')
+    return max(1, min(limit, PAGE_SIZE_MAX))
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    '''Значения ключа строками; None в ключе недопустим — его заменяют в SQL через COALESCE'''
+    if any(value is None for value in values):
+        raise ValueError('Пустое значение в ключе сортировки')
+    raw = json.dumps([str(v) for v in values], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor: str, kinds: Sequence[str]) -> List[Any]:
+    '''
+    Разбирает непрозрачный токен продолжения в значения ключа сортировки;
+    kinds — типы значений из CURSOR_PARSERS ('date', 'time', 'timestamp', 'int', 'str').
+    Любое несоответствие — CursorError, а не ошибка приведения типов в SQL.
+    '''
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise CursorError('Некорректный cursor')
+    if not isinstance(values, list) or len(values) != len(kinds):
+        raise CursorError('Некорректный cursor')
+    parsed = []
+    for value, kind in zip(values, kinds):
+        if not isinstance(value, str):
+            raise CursorError('Некорректный cursor')
+        try:
+            parsed.append(CURSOR_PARSERS[kind](value))
+        except ValueError:
+            raise CursorError('Некорректный cursor')
+    return parsed
+
+
+def paginate(rows: List[Any], limit: int, key: Callable[[Any], Sequence[Any]]) -> Tuple[List[Any], Optional[str]]:
+    '''Отрезает лишнюю строку (запрос делается с LIMIT limit + 1) и строит курсор следующей страницы'''
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(key(page[-1]))
@@ -0,0 +1,107 @@
+import os
+import re
+import threading
+import weakref
+from typing import Any, Dict, Sequence, Set, Tuple
+
+import psycopg2.errors
+from psycopg2 import extensions
+
+PREPARED_STATEMENTS_ENABLED = os.environ.get('PREPARED_STATEMENTS', '1').lower() not in ('0', 'false', 'off')
+
+_PLACEHOLDER = re.compile(r'%s|%%')
+
+# Подготовленный оператор потерян (DEALLOCATE/DISCARD ALL), уже существует под
+# этим именем или его план больше не подходит после изменения таблицы
+# ("cached plan must not change result type").
+_STALE_ERRORS = (
+    psycopg2.errors.InvalidSqlStatementName,
+    psycopg2.errors.DuplicatePreparedStatement,
+    psycopg2.errors.FeatureNotSupported,
+)
+
+
+def to_server_placeholders(sql: str) -> Tuple[str, int]:
+    '''Заменяет %s на $1..$n для PREPARE и возвращает число параметров'''
+    count = 0
+
+    def replace(match):
+        nonlocal count
+        if match.group() == '%%':
+            return '%'
+        count += 1
+        return f'${count}'
+
+    return _PLACEHOLDER.sub(replace, sql), count
+
+
+class StatementRegistry:
+    '''
+    Реестр «горячих» запросов. Каждый запрос подготавливается (PREPARE) один раз
+    на подключение из пула и дальше выполняется по имени (EXECUTE) без разбора
+    и планирования с нуля. Новое подключение после переподключения получает
+    операторы заново при первом обращении; если сервер потерял оператор или
+    таблица изменилась, оператор подготавливается повторно.
+    '''
+
+    def __init__(self, enabled: bool = PREPARED_STATEMENTS_ENABLED):
+        self.enabled = enabled
+        self._statements: Dict[str, Tuple[str, str, str]] = {}
+        self._prepared: 'weakref.WeakKeyDictionary[Any, Set[str]]' = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.prepares = 0
+        self.executes = 0
+        self.reprepares = 0
+
+    def register(self, name: str, sql: str) -> str:
+        body, count = to_server_placeholders(sql)
+        execute = f'EXECUTE {name}' + (f" ({', '.join(['%s'] * count)})" if count else '')
+        self._statements[name] = (sql, f'PREPARE {name} AS {body}', execute)
+        return name
+
+    def _prepared_on(self, conn) -> Set[str]:
+        with self._lock:
+            prepared = self._prepared.get(conn)
+            if prepared is None:
+                prepared = self._prepared[conn] = set()
+            return prepared
+
+    def _run(self, cursor, name: str, params: Sequence[Any], prepared: Set[str]) -> None:
+        _, prepare, execute = self._statements[name]
+        if name not in prepared:
+            cursor.execute(prepare)
+            prepared.add(name)
+            self.prepares += 1
+        cursor.execute(execute, params)
+        self.executes += 1
+
+    def execute(self, cursor, name: str, params: Sequence[Any] = ()) -> None:
+        '''Выполняет зарегистрированный запрос на курсоре, подготавливая его при необходимости'''
+        if not self.enabled:
+            cursor.execute(self._statements[name][0], params)
+            return
+        conn = cursor.connection
+        prepared = self._prepared_on(conn)
+        starts_transaction = conn.info.transaction_status == extensions.TRANSACTION_STATUS_IDLE
+        try:
+            self._run(cursor, name, params, prepared)
+        except _STALE_ERRORS:
+            prepared.clear()
+            if not starts_transaction:
+                # Откат затронул бы уже выполненные в транзакции запросы:
+                # ошибка уходит обработчику, следующий вызов подготовит операторы заново
+                raise
+            conn.rollback()
+            cursor.execute('DEALLOCATE ALL')
+            self.reprepares += 1
+            self._run(cursor, name, params, prepared)
+
+    def definitions(self) -> Dict[str, str]:
+        '''Зарегистрированные запросы в исходном виде (с %s), по именам'''
+        return {name: statement[0] for name, statement in self._statements.items()}
+
+    def stats(self) -> Dict[str, int]:
+        return {'prepares': self.prepares, 'executes': self.executes, 'reprepares': self.reprepares}
+
+
+statements = StatementRegistry()
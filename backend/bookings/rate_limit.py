@@ -0,0 +1,236 @@
+import functools
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import psycopg2
+
+from response import json_response
+
+RATE_LIMITS_ENABLED = os.environ.get('RATE_LIMITS', '1').lower() not in ('0', 'false', 'off')
+RATE_LIMIT_SHARED = os.environ.get('RATE_LIMIT_SHARED', '0').lower() in ('1', 'true', 'on')
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '10000'))
+
+# Правило -> "N/секунды": до N запросов подряд, затем N за указанный период.
+# Переопределяется переменной RATE_LIMIT_<ПРАВИЛО>, например
+# RATE_LIMIT_LOGIN_EMAIL=5/300; значение 0 отключает правило.
+DEFAULT_RATE_LIMITS = {
+    'login_ip': '30/300',
+    'login_email': '10/300',
+    'register_ip': '10/3600',
+    'register_email': '3/3600',
+    'bookings_ip': '20/600',
+    'bookings_phone': '5/3600',
+    'feedback_ip': '10/600',
+    'feedback_phone': '5/3600',
+}
+
+# Общий для всех экземпляров bucket в rate_limits: пополнение за прошедшее
+# время и списание одного запроса; ниже -1 не опускается, чтобы отказы
+# не откладывали доступ бесконечно
+SHARED_TAKE = '''
+    INSERT INTO rate_limits AS r (bucket, tokens, updated_at)
+    VALUES (%(bucket)s, %(capacity)s - 1, NOW())
+    ON CONFLICT (bucket) DO UPDATE SET
+        tokens = GREATEST(
+            LEAST(%(capacity)s, r.tokens + EXTRACT(EPOCH FROM NOW() - r.updated_at) * %(rate)s) - 1, -1
+        ),
+        updated_at = NOW()
+    RETURNING tokens
+'''
+SHARED_REFUND = 'UPDATE rate_limits SET tokens = LEAST(%(capacity)s, tokens + 1) WHERE bucket = %(bucket)s'
+# Запросы без адреса из шлюза делят один bucket: без sourceIp клиента не отличить
+UNKNOWN_CLIENT = 'unknown'
+
+Limit = Tuple[float, float]
+
+
+def parse_limit(value: str) -> Optional[Limit]:
+    '''"N/секунды" -> (емкость, пополнение в секунду); None для "0"'''
+    count, _, period = value.partition('/')
+    capacity = float(count)
+    if capacity <= 0:
+        return None
+    return capacity, capacity / float(period or 1)
+
+
+def load_limits() -> Dict[str, Limit]:
+    limits = {}
+    for rule, default in DEFAULT_RATE_LIMITS.items():
+        limit = parse_limit(os.environ.get(f'RATE_LIMIT_{rule.upper()}', default))
+        if limit is not None:
+            limits[rule] = limit
+    return limits
+
+
+def client_ip(event: Dict[str, Any]) -> str:
+    '''
+    Адрес клиента из requestContext шлюза. X-Forwarded-For не читается:
+    его первое значение задает сам клиент. Без sourceIp — общий UNKNOWN_CLIENT.
+    '''
+    identity = (event.get('requestContext') or {}).get('identity') or {}
+    return identity.get('sourceIp') or UNKNOWN_CLIENT
+
+
+def request_body(event: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        body = json.loads(event.get('body') or '{}')
+    except ValueError:
+        return {}
+    return body if isinstance(body, dict) else {}
+
+
+def normalize_email(value: Any) -> Optional[str]:
+    return value.strip().lower() if isinstance(value, str) and value.strip() else None
+
+
+def normalize_phone(value: Any) -> Optional[str]:
+    digits = re.sub(r'\D', '', value) if isinstance(value, str) else ''
+    return digits or None
+
+
+class RateLimiter:
+    '''
+    Token bucket на экземпляр функции по правилам вида "<действие>_<ip|email|phone>".
+    Запрос проходит, только если во всех его bucket есть токен; иначе 429 с
+    Retry-After до открытия подключения к БД. С RATE_LIMIT_SHARED=1 прошедший
+    локальную проверку запрос еще списывает токены в общей таблице rate_limits.
+    '''
+
+    def __init__(self, limits: Optional[Dict[str, Limit]] = None, enabled: bool = RATE_LIMITS_ENABLED,
+                 shared: bool = RATE_LIMIT_SHARED, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.limits = load_limits() if limits is None else limits
+        self.enabled = enabled
+        self.shared = shared
+        self.max_keys = max_keys
+        self._buckets: 'OrderedDict[str, List[float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+
+    def _active(self, keys: List[Tuple[str, Optional[str]]]) -> List[Tuple[str, str]]:
+        return [(rule, key) for rule, key in keys if key and rule in self.limits]
+
+    def take(self, keys: List[Tuple[str, Optional[str]]], now: Optional[float] = None) -> float:
+        '''Списывает по токену из каждого bucket; 0, если можно, иначе секунды до следующей попытки'''
+        now = time.monotonic() if now is None else now
+        wait = 0.0
+        with self._lock:
+            buckets = []
+            for rule, key in self._active(keys):
+                capacity, rate = self.limits[rule]
+                name = f'{rule}:{key}'
+                bucket = self._buckets.get(name)
+                if bucket is None:
+                    bucket = self._buckets[name] = [capacity, now]
+                self._buckets.move_to_end(name)
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+                if bucket[0] < 1:
+                    wait = max(wait, (1 - bucket[0]) / rate)
+                buckets.append(bucket)
+            if not wait:
+                for bucket in buckets:
+                    bucket[0] -= 1
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def refund(self, keys: List[Tuple[str, Optional[str]]]) -> None:
+        '''Возвращает списанные take() токены'''
+        with self._lock:
+            for rule, key in self._active(keys):
+                bucket = self._buckets.get(f'{rule}:{key}')
+                if bucket is not None:
+                    bucket[0] = min(self.limits[rule][0], bucket[0] + 1)
+
+    def refund_shared(self, conn, keys: List[Tuple[str, Optional[str]]]) -> None:
+        try:
+            with conn.cursor() as cur:
+                for rule, key in self._active(keys):
+                    bucket = hashlib.sha256(f'{rule}:{key}'.encode()).digest()
+                    cur.execute(SHARED_REFUND, {'bucket': bucket, 'capacity': self.limits[rule][0]})
+            conn.commit()
+        except psycopg2.Error:
+            conn.rollback()
+
+    def take_shared(self, conn, keys: List[Tuple[str, Optional[str]]]) -> float:
+        '''То же по общей таблице rate_limits; ошибка БД запрос не блокирует'''
+        wait = 0.0
+        try:
+            with conn.cursor() as cur:
+                for rule, key in self._active(keys):
+                    capacity, rate = self.limits[rule]
+                    bucket = hashlib.sha256(f'{rule}:{key}'.encode()).digest()
+                    cur.execute(SHARED_TAKE, {'bucket': bucket, 'capacity': capacity, 'rate': rate})
+                    tokens = cur.fetchone()[0]
+                    if tokens < 0:
+                        wait = max(wait, (1 - tokens) / rate)
+            conn.commit()
+        except psycopg2.Error:
+            conn.rollback()
+            return 0.0
+        return wait
+
+    def rejection(self, wait: float) -> Dict[str, Any]:
+        self.rejected += 1
+        return json_response({'error': 'Слишком много запросов, попробуйте позже'}, 429, {
+            'Retry-After': str(max(1, math.ceil(wait))),
+            'Access-Control-Expose-Headers': 'Retry-After'
+        })
+
+    def guard(self, limited_keys: Callable[[Dict[str, Any]], List[Tuple[str, Optional[str]]]],
+              get_pool: Optional[Callable[[], Any]] = None,
+              refund_if: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Callable:
+        '''
+        Декоратор handler: limited_keys(event) возвращает пары (правило, ключ)
+        для запроса (пустой список — без ограничений). Общая таблица проверяется
+        на подключении из пула get_pool, которое сразу возвращается в пул.
+        Если refund_if(ответ) истинно (повтор с сохраненным ответом), токены
+        возвращаются: такой запрос лимит не расходует.
+        '''
+        def decorate(handler: Callable) -> Callable:
+            if not self.enabled or not self.limits:
+                return handler
+
+            @functools.wraps(handler)
+            def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+                keys = limited_keys(event)
+                shared = self.shared and get_pool is not None
+                if keys:
+                    wait = self.take(keys)
+                    if not wait and shared:
+                        pool = get_pool()
+                        conn = pool.getconn()
+                        try:
+                            wait = self.take_shared(conn, keys)
+                        finally:
+                            pool.putconn(conn)
+                    if wait:
+                        return self.rejection(wait)
+                    self.allowed += 1
+                response = handler(event, context)
+                if keys and refund_if is not None and refund_if(response):
+                    self.refund(keys)
+                    if shared:
+                        pool = get_pool()
+                        conn = pool.getconn()
+                        try:
+                            self.refund_shared(conn, keys)
+                        finally:
+                            pool.putconn(conn)
+                return response
+            return wrapper
+        return decorate
+
+    def stats(self) -> Dict[str, Any]:
+        return {'allowed': self.allowed, 'rejected': self.rejected, 'buckets': len(self._buckets)}
+
+
+limiter = RateLimiter()
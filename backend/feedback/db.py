@@ -0,0 +1,185 @@
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '5'))
+POOL_PING_INTERVAL = float(os.environ.get('DB_POOL_PING_INTERVAL', '30'))
+
+
+class ConnectionPool:
+    '''
+    Пул подключений, который живет на уровне модуля и переживает теплые вызовы.
+    Перед выдачей подключение проверяется и приводится в исходное состояние
+    (нет открытой транзакции); search_path задается при подключении.
+    '''
+
+    def __init__(self, dsn: str, schema: Optional[str] = None, max_size: int = POOL_MAX_SIZE,
+                 timeout: float = POOL_TIMEOUT, ping_interval: float = POOL_PING_INTERVAL,
+                 **connect_kwargs: Any):
+        self.dsn = dsn
+        self.schema = schema
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.connect_kwargs = connect_kwargs
+        self._idle: List[Any] = []
+        self._last_used: Dict[int, float] = {}
+        self._in_use: Dict[int, Any] = {}
+        self._opening = 0
+        self._cond = threading.Condition()
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.discarded = 0
+
+    def _connect(self):
+        kwargs = dict(self.connect_kwargs)
+        if self.schema:
+            kwargs['options'] = f'-c search_path={self.schema}'
+        return psycopg2.connect(self.dsn, **kwargs)
+
+    def _reset(self, conn) -> None:
+        '''Откатывает незавершенную транзакцию и восстанавливает параметры сессии'''
+        if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        if conn.autocommit:
+            conn.autocommit = False
+        if conn.readonly is not None:
+            conn.readonly = None
+
+    def _is_healthy(self, conn, idle_for: float) -> bool:
+        '''
+        Проверяет подключение вне блокировки пула; запросом к серверу — только
+        простаивавшее дольше ping_interval. search_path задан при подключении
+        (options) и не меняется, поэтому на каждой выдаче не восстанавливается.
+        '''
+        if conn.closed or conn.info.transaction_status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        try:
+            self._reset(conn)
+            if idle_for > self.ping_interval:
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute('SELECT 1')
+                conn.autocommit = False
+        except psycopg2.Error:
+            return False
+        return True
+
+    def _discard(self, conn) -> None:
+        self.discarded += 1
+        self._last_used.pop(id(conn), None)
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def getconn(self):
+        '''Выдает подключение: свободное из пула, новое или ждет освобождения'''
+        started = time.monotonic()
+        waited = False
+        while True:
+            with self._cond:
+                while not self._idle and len(self._in_use) + self._opening >= self.max_size:
+                    remaining = self.timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        self.wait_time += time.monotonic() - started
+                        raise PoolError('connection pool exhausted')
+                    if not waited:
+                        waited = True
+                        self.waits += 1
+                    self._cond.wait(remaining)
+                if self._idle:
+                    # Подключение занимает место в пуле, пока проверяется без блокировки
+                    conn = self._idle.pop()
+                    idle_for = time.monotonic() - self._last_used.pop(id(conn), 0.0)
+                    self._in_use[id(conn)] = conn
+                else:
+                    conn = None
+                    self.misses += 1
+                    self._opening += 1
+                    if waited:
+                        self.wait_time += time.monotonic() - started
+            if conn is None:
+                break
+            if self._is_healthy(conn, idle_for):
+                with self._cond:
+                    self.hits += 1
+                    if waited:
+                        self.wait_time += time.monotonic() - started
+                return conn
+            with self._cond:
+                self._in_use.pop(id(conn), None)
+                self._discard(conn)
+                self._cond.notify()
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._opening -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._opening -= 1
+            self._in_use[id(conn)] = conn
+        return conn
+
+    def putconn(self, conn, discard: bool = False) -> None:
+        '''Возвращает подключение в пул; сломанные подключения закрываются'''
+        if not (discard or conn.closed):
+            try:
+                # Откат — запрос к серверу, он выполняется до захвата блокировки пула
+                self._reset(conn)
+            except psycopg2.Error:
+                discard = True
+        with self._cond:
+            self._in_use.pop(id(conn), None)
+            if discard or conn.closed:
+                self._discard(conn)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def closeall(self) -> None:
+        with self._cond:
+            while self._idle:
+                self._discard(self._idle.pop())
+
+    def stats(self) -> Dict[str, Any]:
+        '''Счетчики пула: попадания, промахи, ожидания'''
+        with self._cond:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'waits': self.waits,
+                'wait_time_ms': round(self.wait_time * 1000, 2),
+                'discarded': self.discarded,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'max_size': self.max_size,
+            }
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(dsn: str, schema: Optional[str] = None, **connect_kwargs: Any) -> ConnectionPool:
+    '''Возвращает пул для DSN, создавая его при первом обращении'''
+    key = f'{dsn}|{schema or ""}'
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(dsn, schema=schema, **connect_kwargs)
+                _pools[key] = pool
+    return pool
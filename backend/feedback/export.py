@@ -0,0 +1,105 @@
+import csv
+import io
+import os
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from pagination import encode_cursor
+from response import encode_json, plain_value
+
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '2000'))
+# Тело ответа функции собирается в памяти целиком, поэтому одна выгрузка
+# ограничена этим числом строк; продолжение — по X-Export-Next-Cursor
+EXPORT_MAX_ROWS = int(os.environ.get('EXPORT_MAX_ROWS', '50000'))
+NEXT_CURSOR_HEADER = 'X-Export-Next-Cursor'
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def date_range_filter(params: Dict[str, Any], column: str) -> Tuple[str, List[Any]]:
+    '''Условие по date_from/date_to (включительно) для выгрузки'''
+    conditions = []
+    values: List[Any] = []
+    try:
+        if params.get('date_from'):
+            values.append(date.fromisoformat(params['date_from']))
+            conditions.append(f'{column} >= %s')
+        if params.get('date_to'):
+            values.append(date.fromisoformat(params['date_to']))
+            conditions.append(f'{column} < %s::date + 1')
+    except ValueError:
+        raise ExportError('Некорректный диапазон дат')
+    return (f"WHERE {' AND '.join(conditions)}" if conditions else ''), values
+
+
+def export_rows(conn, name: str, query: str, params: List[Any], fmt: str,
+                key_columns: Sequence[Tuple[str, Any]],
+                max_rows: int = EXPORT_MAX_ROWS) -> Tuple[str, Optional[str]]:
+    '''
+    Выгружает результат запроса через именованный (серверный) курсор пачками
+    по EXPORT_BATCH_SIZE строк, кодируя каждую строку сразу в выходной буфер —
+    без fetchall() и промежуточных словарей. Значения кодируются так же, как
+    в JSON-ответах (response.encode_json: даты в ISO 8601, Decimal числом);
+    для NDJSON ключи объекта кодируются один раз на выгрузку.
+
+    Запрос дополняется LIMIT max_rows + 1: если строк больше, возвращается
+    курсор по key_columns последней выгруженной строки — пары (колонка,
+    значение вместо NULL) в порядке ORDER BY запроса.
+    '''
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError('Формат выгрузки: csv или ndjson')
+    out = io.StringIO()
+    writer = csv.writer(out) if fmt == 'csv' else None
+    columns: Optional[List[str]] = None
+    keys: List[str] = []
+    last_row: Optional[Tuple[Any, ...]] = None
+    next_cursor = None
+    with conn.cursor(name=f'{name}_export') as cur:
+        cur.itersize = min(EXPORT_BATCH_SIZE, max_rows + 1)
+        cur.execute(query + ' LIMIT %s', [*params, max_rows + 1])
+        for count, row in enumerate(cur):
+            if columns is None:
+                columns = [column[0] for column in cur.description]
+                keys = [encode_json(column) + ':' for column in columns]
+                if writer:
+                    writer.writerow(columns)
+            if count == max_rows:
+                last_key = [last_row[columns.index(column)] for column, _ in key_columns]
+                next_cursor = encode_cursor([
+                    default if value is None else value for value, (_, default) in zip(last_key, key_columns)
+                ])
+                break
+            last_row = row
+            if writer:
+                writer.writerow([plain_value(value) for value in row])
+            else:
+                out.write('{')
+                out.write(','.join([key + encode_json(value) for key, value in zip(keys, row)]))
+                out.write('}\n')
+        if columns is None and writer and cur.description:
+            writer.writerow([column[0] for column in cur.description])
+    return out.getvalue(), next_cursor
+
+
+def export_response(body: str, name: str, fmt: str, next_cursor: Optional[str] = None) -> Dict[str, Any]:
+    '''Файл выгрузки; если она обрезана по EXPORT_MAX_ROWS — с курсором продолжения в заголовке'''
+    headers = {
+        'Content-Type': EXPORT_FORMATS[fmt],
+        'Content-Disposition': f'attachment; filename="{name}.{"csv" if fmt == "csv" else "ndjson"}"',
+        'Access-Control-Allow-Origin': '*'
+    }
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+        headers['Access-Control-Expose-Headers'] = NEXT_CURSOR_HEADER
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': body,
+        'isBase64Encoded': False
+    }
@@ -0,0 +1,160 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import psycopg2
+from psycopg2 import extensions
+
+from response import JSON_HEADERS, get_header, json_response
+
+IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', str(24 * 3600)))
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', '512'))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+KEY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+SELECT_KEY = '''
+    SELECT request_hash, status_code, response FROM idempotency_keys
+    WHERE scope = %s AND key_hash = %s AND expires_at > NOW()
+'''
+# Живой строки с этим ключом нет (проверено под блокировкой), поэтому
+# конфликт возможен только с истекшей — она перезаписывается. Ключ пишется
+# вместе с ответом в транзакции самой вставки: либо зафиксировано и то и
+# другое, либо ничего
+STORE_KEY = '''
+    INSERT INTO idempotency_keys (scope, key_hash, request_hash, status_code, response, expires_at)
+    VALUES (%s, %s, %s, %s, %s, NOW() + %s * INTERVAL '1 second')
+    ON CONFLICT (scope, key_hash) DO UPDATE
+    SET request_hash = EXCLUDED.request_hash, status_code = EXCLUDED.status_code,
+        response = EXCLUDED.response, created_at = NOW(), expires_at = EXCLUDED.expires_at
+'''
+
+Stored = Tuple[bytes, int, str]
+
+
+def is_replay(response: Dict[str, Any]) -> bool:
+    '''Ответ отдан из сохраненного, create() не выполнялся'''
+    return (response.get('headers') or {}).get(REPLAYED_HEADER) == 'true'
+
+
+def _digest(*parts: Any) -> bytes:
+    return hashlib.sha256('\0'.join(str(part) for part in parts).encode()).digest()
+
+
+class IdempotencyStore:
+    '''
+    Повтор POST с тем же заголовком Idempotency-Key возвращает сохраненный
+    ответ первого запроса, не выполняя вставку заново. Ответы хранятся
+    в idempotency_keys IDEMPOTENCY_TTL_SECONDS и в LRU экземпляра. Ключ
+    с ответом фиксируется той же транзакцией, что и вставка, а одновременные
+    дубли ждут первый запрос на advisory-блокировке ключа.
+
+    create() не фиксирует транзакцию сам: это делает run() — вместе
+    с ключом или, без заголовка, сразу после create().
+    '''
+
+    def __init__(self, ttl: int = IDEMPOTENCY_TTL, cache_size: int = IDEMPOTENCY_CACHE_SIZE):
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self._cache: 'OrderedDict[bytes, Tuple[float, Stored]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.replays = 0
+        self.executions = 0
+
+    def _cached(self, key_hash: bytes) -> Optional[Stored]:
+        with self._lock:
+            item = self._cache.get(key_hash)
+            if item is None:
+                return None
+            if item[0] <= time.monotonic():
+                del self._cache[key_hash]
+                return None
+            self._cache.move_to_end(key_hash)
+            return item[1]
+
+    def _remember(self, key_hash: bytes, stored: Stored) -> None:
+        with self._lock:
+            self._cache[key_hash] = (time.monotonic() + self.ttl, stored)
+            self._cache.move_to_end(key_hash)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _replay(self, stored: Stored, request_hash: bytes) -> Dict[str, Any]:
+        stored_request, status, body = stored
+        if stored_request != request_hash:
+            return json_response({'error': 'Idempotency-Key уже использован с другим запросом'}, 422)
+        self.replays += 1
+        return {
+            'statusCode': status,
+            'headers': dict(JSON_HEADERS, **{REPLAYED_HEADER: 'true'}),
+            'body': body,
+            'isBase64Encoded': False
+        }
+
+    def run(self, conn, scope: str, event: Dict[str, Any], owner: Any,
+            create: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        '''
+        Выполняет create() один раз на ключ: без заголовка — как обычно,
+        при повторе — сохраненный ответ. Запоминаются только ответы 2xx,
+        после ошибки запрос с тем же ключом можно повторить.
+        '''
+        key = get_header(event, KEY_HEADER)
+        if not key:
+            try:
+                response = create()
+            except Exception:
+                conn.rollback()
+                raise
+            if 200 <= response.get('statusCode', 500) < 300:
+                conn.commit()
+            else:
+                conn.rollback()
+            return response
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return json_response({'error': f'{KEY_HEADER} длиннее {IDEMPOTENCY_KEY_MAX_LENGTH} символов'}, 400)
+        key_hash = _digest(scope, owner, key)
+        request_hash = _digest(event.get('body') or '')
+        cached = self._cached(key_hash)
+        if cached is not None:
+            return self._replay(cached, request_hash)
+
+        lock_id = int.from_bytes(key_hash[:8], 'big', signed=True)
+        cur = conn.cursor(cursor_factory=extensions.cursor)
+        cur.execute('SELECT pg_advisory_lock(%s)', (lock_id,))
+        try:
+            cur.execute(SELECT_KEY, (scope, key_hash))
+            row = cur.fetchone()
+            if row is not None and row[1] is not None:
+                stored = (bytes(row[0]), row[1], row[2])
+                self._remember(key_hash, stored)
+                return self._replay(stored, request_hash)
+
+            response = create()
+            self.executions += 1
+            status = response.get('statusCode', 500)
+            if 200 <= status < 300:
+                cur.execute(STORE_KEY, (scope, key_hash, request_hash, status, response['body'], self.ttl))
+                conn.commit()
+                self._remember(key_hash, (request_hash, status, response['body']))
+            else:
+                conn.rollback()
+            return response
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            try:
+                cur.execute('SELECT pg_advisory_unlock(%s)', (lock_id,))
+                conn.commit()
+            except psycopg2.Error:
+                # Подключение оборвалось: блокировка снята вместе с сессией
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        return {'replays': self.replays, 'executions': self.executions, 'cached': len(self._cache)}
+
+
+idempotency = IdempotencyStore()
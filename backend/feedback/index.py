@@ -3,20 +3,53 @@ import os
 from typing import Dict, Any
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from db import get_pool
+from timing import connection_kwargs, instrumented, timed
+from response import columnar, compressed, json_response, tuple_cursor, wants_columnar
+from session import get_session_token, get_user_from_session
+from export import ExportError, date_range_filter, export_response, export_rows
+from pagination import CursorError, decode_cursor
+from idempotency import idempotency, is_replay
+from rate_limit import client_ip, limiter, normalize_phone, request_body
 
+# Обращения без created_at идут в конце выгрузки (ORDER BY created_at — NULLS LAST);
+# в курсоре их метка времени — 'infinity'
+EMPTY_CREATED_AT = 'infinity'
+
+def get_db_pool():
+    return get_pool(os.environ['DATABASE_URL'], **connection_kwargs())
+
+@timed('connect')
 def get_db_connection():
-    return psycopg2.connect(os.environ['DATABASE_URL'])
+    return get_db_pool().getconn()
+
+def release_db_connection(conn):
+    get_db_pool().putconn(conn)
 
-def get_user_from_session(session_token: str, cur) -> Dict[str, Any]:
+def create_feedback(conn, cur, event: Dict[str, Any]) -> Dict[str, Any]:
+    body = json.loads(event.get('body', '{}'))
+    name = body.get('name')
+    phone = body.get('phone')
+    message = body.get('message')
+    
     cur.execute(
-        """SELECT u.id, u.role 
-           FROM users u 
-           JOIN sessions s ON u.id = s.user_id 
-           WHERE s.session_token = %s AND s.expires_at > NOW()""",
-        (session_token,)
+        """INSERT INTO feedback (name, phone, message)
+           VALUES (%s, %s, %s) RETURNING id""",
+        (name, phone, message)
     )
-    return cur.fetchone()
+    feedback = cur.fetchone()
+    
+    return json_response({'success': True, 'feedback_id': feedback['id']})
+
+def rate_limit_keys(event: Dict[str, Any]) -> list:
+    '''Новые обращения ограничиваются по IP клиента и по телефону'''
+    if event.get('httpMethod') != 'POST':
+        return []
+    return [('feedback_ip', client_ip(event)), ('feedback_phone', normalize_phone(request_body(event).get('phone')))]
 
+@instrumented('feedback')
+@compressed
+@limiter.guard(rate_limit_keys, get_db_pool, refund_if=is_replay)
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     Business: Manage feedback messages from contact form
@@ -32,7 +65,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, PUT, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Session-Token',
+                'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Session-Token, X-Read-Primary-Until, Idempotency-Key',
                 'Access-Control-Max-Age': '86400'
             },
             'body': '',
@@ -43,59 +76,56 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     cur = conn.cursor(cursor_factory=RealDictCursor)
     
     try:
-        session_token = event.get('headers', {}).get('x-session-token') or event.get('headers', {}).get('X-Session-Token')
+        session_token = get_session_token(event)
         user = None
         if session_token:
             user = get_user_from_session(session_token, cur)
         
         if method == 'GET':
             if not user or user['role'] != 'admin':
-                return {
-                    'statusCode': 403,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Доступ запрещен'}),
-                    'isBase64Encoded': False
-                }
+                return json_response({'error': 'Доступ запрещен'}, 403)
+            
+            params = event.get('queryStringParameters') or {}
+            if params.get('format'):
+                try:
+                    where, values = date_range_filter(params, 'created_at')
+                    if params.get('cursor'):
+                        created_at, last_id = decode_cursor(params['cursor'], ('timestamp', 'int'))
+                        if created_at == EMPTY_CREATED_AT:
+                            after = "created_at IS NULL AND id > %s"
+                            values.append(last_id)
+                        else:
+                            after = "((created_at, id) > (%s, %s) OR created_at IS NULL)"
+                            values.extend((created_at, last_id))
+                        where = (where + ' AND ' if where else 'WHERE ') + after
+                    body, next_cursor = export_rows(
+                        conn, 'feedback',
+                        f"SELECT * FROM feedback {where} ORDER BY created_at, id",
+                        values, params['format'],
+                        (('created_at', EMPTY_CREATED_AT), ('id', None))
+                    )
+                except (ExportError, CursorError) as e:
+                    return json_response({'error': str(e)}, 400)
+                return export_response(body, 'feedback', params['format'], next_cursor)
+            
+            if wants_columnar(event):
+                list_cur = tuple_cursor(conn)
+                list_cur.execute("SELECT * FROM feedback ORDER BY created_at DESC")
+                return json_response(columnar(list_cur, list_cur.fetchall()))
             
             cur.execute("SELECT * FROM feedback ORDER BY created_at DESC")
             feedback = cur.fetchall()
             
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'feedback': [dict(f) for f in feedback]}, default=str),
-                'isBase64Encoded': False
-            }
+            return json_response({'feedback': feedback})
         
         elif method == 'POST':
-            body = json.loads(event.get('body', '{}'))
-            name = body.get('name')
-            phone = body.get('phone')
-            message = body.get('message')
-            
-            cur.execute(
-                """INSERT INTO feedback (name, phone, message)
-                   VALUES (%s, %s, %s) RETURNING id""",
-                (name, phone, message)
-            )
-            feedback = cur.fetchone()
-            conn.commit()
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'success': True, 'feedback_id': feedback['id']}),
-                'isBase64Encoded': False
-            }
+            # Форма анонимная: ключи разделены по адресу клиента
+            owner = f'ip:{client_ip(event)}'
+            return idempotency.run(conn, 'feedback', event, owner, lambda: create_feedback(conn, cur, event))
         
         elif method == 'PUT':
             if not user or user['role'] != 'admin':
-                return {
-                    'statusCode': 403,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Доступ запрещен'}),
-                    'isBase64Encoded': False
-                }
+                return json_response({'error': 'Доступ запрещен'}, 403)
             
             body = json.loads(event.get('body', '{}'))
             feedback_id = body.get('id')
@@ -104,20 +134,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             cur.execute("UPDATE feedback SET is_read = %s WHERE id = %s", (is_read, feedback_id))
             conn.commit()
             
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'success': True}),
-                'isBase64Encoded': False
-            }
+            return json_response({'success': True})
     
     finally:
         cur.close()
-        conn.close()
+        release_db_connection(conn)
     
-    return {
-        'statusCode': 405,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'error': 'Метод не поддерживается'}),
-        'isBase64Encoded': False
-    }
+    return json_response({'error': 'Метод не поддерживается'}, 405)
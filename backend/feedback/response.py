@@ -0,0 +1,233 @@
+import base64
+import functools
+import gzip
+import hashlib
+import json
+import os
+import re
+from datetime import date, datetime, time
+from decimal import Decimal
+from operator import itemgetter
+from typing import Any, Callable, Dict, List, Optional
+
+from psycopg2 import extensions
+from psycopg2.extras import RealDictCursor
+
+from timing import timed
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+PUBLIC_CACHE_CONTROL = 'public, max-age=60, must-revalidate'
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+
+COMPRESSION_ENABLED = os.environ.get('COMPRESSION', '1').lower() not in ('0', 'false', 'off')
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '5'))
+
+# ETag сжатого ответа: "<хэш>-gzip" / "<хэш>-br"
+_ENCODED_ETAG = re.compile(r'-(?:gzip|br)"$')
+
+
+_CONVERTERS = {
+    datetime: datetime.isoformat,
+    date: date.isoformat,
+    time: time.isoformat,
+    Decimal: float,
+}
+
+
+def _default(value: Any) -> Any:
+    '''Типы из строк БД: даты и время в ISO 8601, Decimal (price) — числом'''
+    return _CONVERTERS.get(type(value), str)(value)
+
+
+if orjson is not None:
+    def encode_json(value: Any) -> str:
+        return orjson.dumps(value, default=_default).decode()
+else:
+    def encode_json(value: Any) -> str:
+        return json.dumps(value, default=_default, separators=(',', ':'))
+
+
+@timed('serialize')
+def dumps(payload: Any) -> str:
+    '''
+    JSON-строка ответа. Заметное ускорение дает только orjson (requirements.txt);
+    без него это обычный json.dumps с компактными разделителями.
+    '''
+    return encode_json(payload)
+
+
+def plain_value(value: Any) -> Any:
+    '''Значение для текстовых форматов (CSV): даты, время и Decimal — как в JSON-ответах'''
+    converter = _CONVERTERS.get(type(value))
+    return converter(value) if converter else value
+
+
+def json_response(payload: Any, status: int = 200, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    return {
+        'statusCode': status,
+        'headers': dict(JSON_HEADERS, **headers) if headers else dict(JSON_HEADERS),
+        'body': dumps(payload),
+        'isBase64Encoded': False
+    }
+
+
+def wants_columnar(event: Dict[str, Any]) -> bool:
+    '''Клиент запросил компактный столбцовый вид списка: ?shape=columnar'''
+    return (event.get('queryStringParameters') or {}).get('shape') == 'columnar'
+
+
+def tuple_cursor(conn):
+    '''Курсор, возвращающий кортежи, даже если у подключения RealDictCursor по умолчанию'''
+    return conn.cursor(cursor_factory=extensions.cursor)
+
+
+def columnar(cursor, rows: List[Any]) -> Dict[str, Any]:
+    '''{"columns": [...], "rows": [[...], ...]} — имена колонок один раз на весь список'''
+    return {'columns': [column[0] for column in cursor.description], 'rows': rows}
+
+
+def row_getter(cursor, *names: str) -> Callable[[Any], Any]:
+    '''Доступ к колонкам по именам и для строк-словарей, и для строк-кортежей'''
+    if isinstance(cursor, RealDictCursor):
+        return itemgetter(*names)
+    columns = [column[0] for column in cursor.description]
+    return itemgetter(*(columns.index(name) for name in names))
+
+
+def get_header(event: Dict[str, Any], name: str) -> Optional[str]:
+    '''Заголовок запроса без учета регистра имени'''
+    headers = event.get('headers') or {}
+    value = headers.get(name)
+    if value is not None:
+        return value
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def make_etag(body: str) -> str:
+    '''Сильный ETag по содержимому тела ответа'''
+    return '"' + hashlib.sha256(body.encode()).hexdigest()[:32] + '"'
+
+
+def etag_matches(event: Dict[str, Any], etag: str) -> bool:
+    if_none_match = get_header(event, 'If-None-Match')
+    if not if_none_match:
+        return False
+    candidates = [_ENCODED_ETAG.sub('"', tag.strip()) for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+
+def cacheable_response(event: Dict[str, Any], body: str, headers: Dict[str, str],
+                       cache_control: str = PUBLIC_CACHE_CONTROL) -> Dict[str, Any]:
+    '''
+    Ответ 200 с ETag и Cache-Control или 304 с пустым телом, если If-None-Match
+    совпал. У 304 те же ETag (с суффиксом кодировки) и Vary, что получил бы 200
+    после compressed: пустое тело compress_response не трогает.
+    '''
+    etag = make_etag(body)
+    headers = dict(headers, **{'ETag': etag, 'Cache-Control': cache_control})
+    if etag_matches(event, etag):
+        headers.pop('Content-Type', None)
+        if COMPRESSION_ENABLED and len(body.encode()) >= COMPRESSION_MIN_BYTES:
+            negotiate_encoding(headers, event)
+        return {'statusCode': 304, 'headers': headers, 'body': '', 'isBase64Encoded': False}
+    return {'statusCode': 200, 'headers': headers, 'body': body, 'isBase64Encoded': False}
+
+
+def accepted_encodings(event: Dict[str, Any]) -> Dict[str, float]:
+    '''Кодировки из Accept-Encoding с их q (gzip;q=0 — явный отказ)'''
+    accepted: Dict[str, float] = {}
+    for item in (get_header(event, 'Accept-Encoding') or '').split(','):
+        name, _, params = item.strip().partition(';')
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    return accepted
+
+
+def choose_encoding(event: Dict[str, Any]) -> Optional[str]:
+    '''br, если клиент его принимает и модуль brotli установлен, иначе gzip или None'''
+    accepted = accepted_encodings(event)
+    wildcard = accepted.get('*', 0.0)
+    for encoding in (('br', 'gzip') if brotli is not None else ('gzip',)):
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+def negotiate_encoding(headers: Dict[str, str], event: Dict[str, Any]) -> Optional[str]:
+    '''Vary: Accept-Encoding и суффикс кодировки у ETag; возвращает выбранную кодировку'''
+    vary = headers.get('Vary')
+    headers['Vary'] = f'{vary}, Accept-Encoding' if vary else 'Accept-Encoding'
+    encoding = choose_encoding(event)
+    etag = headers.get('ETag')
+    if encoding is not None and etag:
+        headers['ETag'] = f'{etag[:-1]}-{encoding}"'
+    return encoding
+
+
+@timed('compress')
+def compress(body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY if level is None else level)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL if level is None else level, mtime=0)
+
+
+def compress_response(response: Dict[str, Any], event: Dict[str, Any],
+                      min_bytes: int = COMPRESSION_MIN_BYTES) -> Dict[str, Any]:
+    '''
+    Сжимает текстовое тело ответа не меньше min_bytes по Accept-Encoding:
+    тело в base64, isBase64Encoded=True, Content-Encoding и Vary. ETag
+    получает суффикс кодировки, If-None-Match с ним сравнивается без суффикса.
+    '''
+    body = response.get('body')
+    if response.get('isBase64Encoded') or not isinstance(body, str) or len(body) < min_bytes:
+        return response
+    raw = body.encode()
+    if len(raw) < min_bytes:
+        return response
+    headers = dict(response.get('headers') or {})
+    if 'Content-Encoding' in headers:
+        return response
+    encoding = negotiate_encoding(headers, event)
+    if encoding is None:
+        return dict(response, headers=headers)
+    headers['Content-Encoding'] = encoding
+    return dict(
+        response,
+        headers=headers,
+        body=base64.b64encode(compress(raw, encoding)).decode('ascii'),
+        isBase64Encoded=True,
+    )
+
+
+def compressed(handler: Callable) -> Callable:
+    '''Декоратор handler: сжатие больших ответов (compress_response); COMPRESSION=0 отключает'''
+    if not COMPRESSION_ENABLED:
+        return handler
+
+    @functools.wraps(handler)
+    def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        return compress_response(handler(event, context), event)
+    return wrapper
@@ -0,0 +1,164 @@
+import functools
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from psycopg2 import extensions
+
+import slowlog
+
+TIMING_ENABLED = os.environ.get('SERVER_TIMING', '').lower() in ('1', 'true', 'on')
+TIMING_MAX_STATEMENTS = int(os.environ.get('SERVER_TIMING_MAX_STATEMENTS', '10'))
+INSTRUMENTED = TIMING_ENABLED or slowlog.SLOW_QUERY_ENABLED
+
+_local = threading.local()
+
+
+class RequestTimer:
+    '''
+    Замеры одного вызова: фазы (подключение, сессия, сериализация) и каждый
+    SQL-запрос с длительностью и числом строк.
+    '''
+
+    def __init__(self, request_id: Optional[str], function: str):
+        self.request_id = request_id
+        self.function = function
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.statements: List[Tuple[float, int, str]] = []
+
+    def add_phase(self, name: str, elapsed: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def add_statement(self, elapsed: float, rows: int, query: Any) -> None:
+        if isinstance(query, bytes):
+            query = query.decode(errors='replace')
+        self.statements.append((elapsed, rows, ' '.join(str(query).split())[:120]))
+
+    def server_timing(self, total: float) -> str:
+        '''Значение заголовка Server-Timing; время сессии включает ее SQL-запросы'''
+        parts = [f'{name};dur={elapsed * 1000:.2f}' for name, elapsed in self.phases.items()]
+        db_time = sum(statement[0] for statement in self.statements)
+        rows = sum(statement[1] for statement in self.statements)
+        parts.append(f'db;dur={db_time * 1000:.2f};desc="{len(self.statements)} queries, {rows} rows"')
+        for number, (elapsed, rows, _) in enumerate(self.statements[:TIMING_MAX_STATEMENTS], 1):
+            parts.append(f'q{number};dur={elapsed * 1000:.2f};desc="{rows} rows"')
+        parts.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(parts)
+
+    def log_line(self, status: Any, total: float) -> str:
+        return json.dumps({
+            'request_id': self.request_id,
+            'function': self.function,
+            'status': status,
+            'total_ms': round(total * 1000, 2),
+            'phases_ms': {name: round(elapsed * 1000, 2) for name, elapsed in self.phases.items()},
+            'statements': len(self.statements),
+            'rows': sum(statement[1] for statement in self.statements),
+            'queries': [
+                {'ms': round(elapsed * 1000, 2), 'rows': rows, 'sql': sql}
+                for elapsed, rows, sql in self.statements
+            ],
+        }, ensure_ascii=False)
+
+    def finish(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        total = time.perf_counter() - self.started
+        headers = dict(response.get('headers') or {})
+        headers['Server-Timing'] = self.server_timing(total)
+        response['headers'] = headers
+        print(self.log_line(response.get('statusCode'), total))
+        return response
+
+
+def current_timer() -> Optional[RequestTimer]:
+    return getattr(_local, 'timer', None)
+
+
+def instrumented(function: str) -> Callable:
+    '''
+    Декоратор handler: собирает замеры вызова, добавляет Server-Timing и пишет
+    одну строку лога с request_id; для журнала медленных запросов (SLOW_QUERY_MS)
+    запоминает request_id вызова. Если ни то, ни другое не включено, возвращает
+    handler как есть.
+    '''
+    def decorate(handler: Callable) -> Callable:
+        if not INSTRUMENTED:
+            return handler
+
+        @functools.wraps(handler)
+        def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+            _local.request = (getattr(context, 'request_id', None), function)
+            timer = RequestTimer(*_local.request) if TIMING_ENABLED else None
+            _local.timer = timer
+            try:
+                response = handler(event, context)
+            finally:
+                _local.timer = None
+                _local.request = (None, None)
+            return timer.finish(response) if timer else response
+        return wrapper
+    return decorate
+
+
+def timed(phase: str) -> Callable:
+    '''Декоратор фазы вызова (connect, session, serialize); без SERVER_TIMING=1 ничего не меняет'''
+    def decorate(func: Callable) -> Callable:
+        if not TIMING_ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            timer = current_timer()
+            if timer is None:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timer.add_phase(phase, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+
+_timed_cursor_classes: Dict[type, type] = {}
+
+
+def timed_cursor_class(base: type) -> type:
+    '''Подкласс курсора (RealDictCursor и т.п.), замеряющий каждый execute и передающий медленные в slowlog'''
+    cls = _timed_cursor_classes.get(base)
+    if cls is not None:
+        return cls
+
+    class TimedCursor(base):
+        def execute(self, query, vars=None):
+            timer = current_timer()
+            if timer is None and not slowlog.SLOW_QUERY_ENABLED:
+                return super().execute(query, vars)
+            started = time.perf_counter()
+            try:
+                result = super().execute(query, vars)
+            finally:
+                elapsed = time.perf_counter() - started
+                if timer is not None:
+                    timer.add_statement(elapsed, max(self.rowcount, 0), query)
+            if slowlog.SLOW_QUERY_ENABLED and elapsed * 1000 >= slowlog.SLOW_QUERY_MS:
+                slowlog.capture(self, query, vars, elapsed, *getattr(_local, 'request', (None, None)))
+            return result
+
+    TimedCursor.__name__ = f'Timed{base.__name__}'
+    _timed_cursor_classes[base] = cls = TimedCursor
+    return cls
+
+
+class TimedConnection(extensions.connection):
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.pop('cursor_factory', None) or self.cursor_factory or extensions.cursor
+        kwargs['cursor_factory'] = timed_cursor_class(factory)
+        return super().cursor(*args, **kwargs)
+
+
+def connection_kwargs() -> Dict[str, Any]:
+    '''Аргументы psycopg2.connect для пула: подключения с замером запросов, если включено'''
+    return {'connection_factory': TimedConnection} if INSTRUMENTED else {}
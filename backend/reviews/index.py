@@ -1,22 +1,60 @@
 import json
 import os
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from db import get_pool
+from timing import connection_kwargs, instrumented, timed
+from replica import is_write_request, replicas
+from prepared import statements
+from projection import FieldsError, requested_fields, select_list
+from session import get_session_token, get_user_from_session
+from idempotency import idempotency
+from response import JSON_HEADERS, cacheable_response, columnar, compressed, dumps, json_response, tuple_cursor, wants_columnar
 
-def get_db_connection():
-    return psycopg2.connect(os.environ['DATABASE_URL'])
+ALL_REVIEWS = statements.register('all_reviews', 'SELECT * FROM reviews ORDER BY created_at DESC')
+APPROVED_REVIEWS = statements.register(
+    'approved_reviews', 'SELECT * FROM reviews WHERE approved = true ORDER BY created_at DESC'
+)
+REVIEW_FIELDS = {name: name for name in (
+    'id', 'author', 'rating', 'comment', 'approved', 'status', 'created_at', 'updated_at',
+    'user_id', 'client_id', 'booking_id'
+)}
 
-def get_user_from_session(session_token: str, cur) -> Dict[str, Any]:
+def get_db_pool():
+    return get_pool(os.environ['DATABASE_URL'], **connection_kwargs())
+
+def get_replica_pool(dsn: str):
+    return get_pool(dsn, **connection_kwargs())
+
+@timed('connect')
+def get_db_connection(read_event: Optional[Dict[str, Any]] = None):
+    '''Подключение к основной базе; для чтения (read_event) — к реплике, если она не отстает'''
+    if read_event is not None:
+        return replicas.getconn(read_event, get_db_pool(), get_replica_pool)
+    return get_db_pool().getconn()
+
+def release_db_connection(conn):
+    replicas.pool_of(conn, get_db_pool()).putconn(conn)
+
+def create_review(conn, cur, event: Dict[str, Any], user: Dict[str, Any]) -> Dict[str, Any]:
+    body = json.loads(event.get('body', '{}'))
+    author = body.get('author')
+    rating = body.get('rating')
+    comment = body.get('comment')
+    
     cur.execute(
-        """SELECT u.id, u.role 
-           FROM users u 
-           JOIN sessions s ON u.id = s.user_id 
-           WHERE s.session_token = %s AND s.expires_at > NOW()""",
-        (session_token,)
+        """INSERT INTO reviews (author, rating, comment, user_id)
+           VALUES (%s, %s, %s, %s) RETURNING id""",
+        (author, rating, comment, user['id'])
     )
-    return cur.fetchone()
+    review = cur.fetchone()
+    
+    return json_response({'success': True, 'review_id': review['id']})
 
+@instrumented('reviews')
+@compressed
+@replicas.sticky_after_writes(is_write_request)
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     Business: Manage reviews - create, view, approve, delete
@@ -32,73 +70,51 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Session-Token',
+                'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Session-Token, X-Read-Primary-Until, Idempotency-Key',
                 'Access-Control-Max-Age': '86400'
             },
             'body': '',
             'isBase64Encoded': False
         }
     
-    conn = get_db_connection()
+    conn = get_db_connection(event if method == 'GET' else None)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     
     try:
-        session_token = event.get('headers', {}).get('x-session-token') or event.get('headers', {}).get('X-Session-Token')
+        session_token = get_session_token(event)
         user = None
         if session_token:
             user = get_user_from_session(session_token, cur)
         
         if method == 'GET':
-            if user and user['role'] == 'admin':
-                cur.execute("SELECT * FROM reviews ORDER BY created_at DESC")
+            is_admin = user and user['role'] == 'admin'
+            try:
+                fields = requested_fields(event.get('queryStringParameters') or {}, REVIEW_FIELDS)
+            except FieldsError as e:
+                return json_response({'error': str(e)}, 400)
+            list_cur = tuple_cursor(conn) if wants_columnar(event) else cur
+            if fields:
+                where = '' if is_admin else 'WHERE approved = true '
+                list_cur.execute(f"SELECT {select_list(fields, REVIEW_FIELDS)} FROM reviews {where}ORDER BY created_at DESC")
             else:
-                cur.execute("SELECT * FROM reviews WHERE approved = true ORDER BY created_at DESC")
+                statements.execute(list_cur, ALL_REVIEWS if is_admin else APPROVED_REVIEWS)
             
-            reviews = cur.fetchall()
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'reviews': [dict(r) for r in reviews]}, default=str),
-                'isBase64Encoded': False
-            }
+            reviews = list_cur.fetchall()
+            payload = columnar(list_cur, reviews) if list_cur is not cur else {'reviews': reviews}
+            if is_admin:
+                return json_response(payload)
+            body = dumps(payload)
+            return cacheable_response(event, body, dict(JSON_HEADERS, Vary='X-Session-Token, Authorization'))
         
         elif method == 'POST':
             if not user:
-                return {
-                    'statusCode': 401,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Требуется авторизация'}),
-                    'isBase64Encoded': False
-                }
-            
-            body = json.loads(event.get('body', '{}'))
-            author = body.get('author')
-            rating = body.get('rating')
-            comment = body.get('comment')
-            
-            cur.execute(
-                """INSERT INTO reviews (author, rating, comment, user_id)
-                   VALUES (%s, %s, %s, %s) RETURNING id""",
-                (author, rating, comment, user['id'])
-            )
-            review = cur.fetchone()
-            conn.commit()
+                return json_response({'error': 'Требуется авторизация'}, 401)
             
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'success': True, 'review_id': review['id']}),
-                'isBase64Encoded': False
-            }
+            return idempotency.run(conn, 'reviews', event, user['id'], lambda: create_review(conn, cur, event, user))
         
         elif method == 'PUT':
             if not user or user['role'] != 'admin':
-                return {
-                    'statusCode': 403,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Доступ запрещен'}),
-                    'isBase64Encoded': False
-                }
+                return json_response({'error': 'Доступ запрещен'}, 403)
             
             body = json.loads(event.get('body', '{}'))
             review_id = body.get('id')
@@ -107,21 +123,11 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             cur.execute("UPDATE reviews SET approved = %s WHERE id = %s", (approved, review_id))
             conn.commit()
             
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'success': True}),
-                'isBase64Encoded': False
-            }
+            return json_response({'success': True})
         
         elif method == 'DELETE':
             if not user or user['role'] != 'admin':
-                return {
-                    'statusCode': 403,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Доступ запрещен'}),
-                    'isBase64Encoded': False
-                }
+                return json_response({'error': 'Доступ запрещен'}, 403)
             
             params = event.get('queryStringParameters') or {}
             review_id = params.get('id')
@@ -129,20 +135,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             cur.execute("UPDATE reviews SET approved = false WHERE id = %s", (review_id,))
             conn.commit()
             
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'success': True}),
-                'isBase64Encoded': False
-            }
+            return json_response({'success': True})
     
     finally:
         cur.close()
-        conn.close()
+        release_db_connection(conn)
     
-    return {
-        'statusCode': 405,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'error': 'Метод не поддерживается'}),
-        'isBase64Encoded': False
-    }
+    return json_response({'error': 'Метод не поддерживается'}, 405)
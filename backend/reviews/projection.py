@@ -0,0 +1,44 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+
+class FieldsError(ValueError):
+    pass
+
+
+def requested_fields(params: Dict[str, Any], whitelist: Dict[str, str],
+                     required: Sequence[str] = ()) -> Optional[List[str]]:
+    '''
+    Поля из ?fields=a,b,c, проверенные по белому списку ресурса; None, если
+    параметр не задан. Поля из required (ключ сортировки для курсора)
+    добавляются всегда.
+    '''
+    raw = params.get('fields')
+    if not raw:
+        return None
+    fields: List[str] = []
+    for name in raw.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in whitelist:
+            raise FieldsError(f'Неизвестное поле: {name}')
+        if name not in fields:
+            fields.append(name)
+    if not fields:
+        raise FieldsError('Пустой список полей')
+    fields.extend(name for name in required if name not in fields)
+    return fields
+
+
+def select_list(fields: Sequence[str], whitelist: Dict[str, str]) -> str:
+    '''Проекция для SELECT: выражение из белого списка под именем поля'''
+    return ', '.join(
+        whitelist[name] if whitelist[name].rsplit('.', 1)[-1] == name else f'{whitelist[name]} AS {name}'
+        for name in fields
+    )
+
+
+def joins_for(fields: Sequence[str], whitelist: Dict[str, str], joins: Dict[str, str]) -> str:
+    '''JOIN только для псевдонимов таблиц, чьи колонки запрошены'''
+    aliases = {whitelist[name].split('.', 1)[0] for name in fields if '.' in whitelist[name]}
+    return ' '.join(join for alias, join in joins.items() if alias in aliases)
@@ -0,0 +1,271 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from prepared import statements
+from timing import timed
+
+SESSION_CACHE_TTL = float(os.environ.get('SESSION_CACHE_TTL', '60'))
+SESSION_CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE', '1024'))
+SESSION_SYNC_INTERVAL = float(os.environ.get('SESSION_SYNC_INTERVAL', '5'))
+# Синхронизация перечитывает и последние SESSION_SYNC_OVERLAP секунд до прошлой:
+# метка отзыва ставится до COMMIT, и отзыв, зафиксированный уже после прошлой
+# синхронизации, может оказаться датирован раньше нее
+SESSION_SYNC_OVERLAP = float(os.environ.get('SESSION_SYNC_OVERLAP', '60'))
+SESSION_TOKEN_MODE = os.environ.get('SESSION_TOKEN_MODE', 'opaque')
+SESSION_TOKEN_TTL = int(os.environ.get('SESSION_TOKEN_TTL', str(30 * 24 * 3600)))
+SIGNED_TOKEN_PREFIX = 'v1.'
+
+SESSION_USER = statements.register('session_user', """
+    SELECT u.id, u.email, u.full_name, u.phone, u.role,
+           EXTRACT(EPOCH FROM s.expires_at - NOW()) AS ttl, NOW() AS db_now
+    FROM users u
+    JOIN sessions s ON u.id = s.user_id
+    WHERE s.session_token = %s AND s.expires_at > NOW()
+""")
+
+
+def _parse_signing_keys(raw: str) -> 'OrderedDict[str, bytes]':
+    '''SESSION_SIGNING_KEYS="kid2:secret2,kid1:secret1" — первым идет ключ для подписи'''
+    keys: 'OrderedDict[str, bytes]' = OrderedDict()
+    for item in raw.split(','):
+        kid, _, secret = item.strip().partition(':')
+        if kid and secret:
+            keys[kid] = secret.encode()
+    return keys
+
+
+SIGNING_KEYS = _parse_signing_keys(os.environ.get('SESSION_SIGNING_KEYS', ''))
+
+
+def hash_token(session_token: str) -> str:
+    return hashlib.sha256(session_token.encode()).hexdigest()
+
+
+class SessionCache:
+    '''
+    LRU-кэш пользователей по хэшу токена с ограниченным временем жизни.
+    Запись живет не дольше SESSION_CACHE_TTL и не дольше самой сессии.
+    '''
+
+    def __init__(self, max_size: int = SESSION_CACHE_SIZE, ttl: float = SESSION_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            user, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(user)
+
+    def put(self, key: str, user: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (dict(user), time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+session_cache = SessionCache()
+_last_sync: Dict[str, Any] = {'checked': 0.0, 'db_now': None}
+
+
+_revoked: Dict[str, float] = {}
+_revoked_sync: Dict[str, Any] = {'checked': 0.0, 'db_now': None}
+
+
+def signed_tokens_enabled() -> bool:
+    return SESSION_TOKEN_MODE == 'signed' and bool(SIGNING_KEYS)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def _sign(key: bytes, payload: str) -> str:
+    return _b64encode(hmac.new(key, payload.encode(), hashlib.sha256).digest())
+
+
+def issue_signed_token(user_id: int, role: str) -> tuple:
+    '''Подписанный токен (id, роль, срок, kid), проверяемый без запроса к БД'''
+    kid, key = next(iter(SIGNING_KEYS.items()))
+    exp = int(time.time()) + SESSION_TOKEN_TTL
+    claims = {'uid': user_id, 'role': role, 'exp': exp, 'kid': kid, 'jti': secrets.token_urlsafe(12)}
+    payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode())
+    return f'{SIGNED_TOKEN_PREFIX}{payload}.{_sign(key, payload)}', exp
+
+
+def verify_signed_token(session_token: str) -> Optional[Dict[str, Any]]:
+    '''Проверяет подпись и срок; при ротации принимаются все ключи из SESSION_SIGNING_KEYS'''
+    try:
+        payload, signature = session_token[len(SIGNED_TOKEN_PREFIX):].split('.')
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+    if not isinstance(claims, dict) or not isinstance(claims.get('kid'), str):
+        return None
+    key = SIGNING_KEYS.get(claims['kid'])
+    if key is None or not signature.isascii() or not hmac.compare_digest(_sign(key, payload), signature):
+        return None
+    if claims.get('exp', 0) <= time.time():
+        return None
+    return claims
+
+
+def sync_revoked_tokens(cur) -> None:
+    '''Подтягивает отозванные подписанные токены не чаще раза в SESSION_SYNC_INTERVAL секунд'''
+    now = time.monotonic()
+    if _revoked_sync['db_now'] is not None and now - _revoked_sync['checked'] < SESSION_SYNC_INTERVAL:
+        return
+    _revoked_sync['checked'] = now
+    if _revoked_sync['db_now'] is None:
+        cur.execute(
+            """SELECT NOW() AS db_now,
+                      ARRAY(SELECT jti || ':' || EXTRACT(EPOCH FROM expires_at)::bigint
+                            FROM revoked_tokens WHERE expires_at > NOW()) AS revoked"""
+        )
+    else:
+        cur.execute(
+            """SELECT NOW() AS db_now,
+                      ARRAY(SELECT jti || ':' || EXTRACT(EPOCH FROM expires_at)::bigint
+                            FROM revoked_tokens
+                            WHERE revoked_at > %s - %s * INTERVAL '1 second') AS revoked""",
+            (_revoked_sync['db_now'], SESSION_SYNC_OVERLAP)
+        )
+    row = cur.fetchone()
+    _revoked_sync['db_now'] = row['db_now']
+    for item in row['revoked'] or []:
+        jti, _, exp = item.rpartition(':')
+        _revoked[jti] = float(exp)
+    wall = time.time()
+    for jti in [j for j, exp in _revoked.items() if exp <= wall]:
+        del _revoked[jti]
+
+
+def get_session_token(event: Dict[str, Any]) -> Optional[str]:
+    '''Токен из X-Session-Token или из Authorization: Bearer (так его передает src/lib/api.ts)'''
+    headers = event.get('headers') or {}
+    token = headers.get('x-session-token') or headers.get('X-Session-Token')
+    if token:
+        return token
+    authorization = headers.get('authorization') or headers.get('Authorization') or ''
+    if authorization.startswith('Bearer '):
+        return authorization[len('Bearer '):].strip() or None
+    return None
+
+
+def sync_expired_sessions(cur) -> None:
+    '''
+    Убирает из кэша сессии, истекшие с прошлой синхронизации (в том числе
+    завершенные logout в других экземплярах функции). Выполняется не чаще
+    раза в SESSION_SYNC_INTERVAL секунд; как и список отзыва, перечитывает
+    последние SESSION_SYNC_OVERLAP секунд до прошлой синхронизации.
+    '''
+    now = time.monotonic()
+    if _last_sync['db_now'] is None or now - _last_sync['checked'] < SESSION_SYNC_INTERVAL:
+        return
+    _last_sync['checked'] = now
+    cur.execute(
+        """SELECT NOW() AS db_now,
+                  ARRAY(SELECT session_token FROM sessions
+                        WHERE expires_at > %s - %s * INTERVAL '1 second'
+                          AND expires_at <= NOW()) AS expired""",
+        (_last_sync['db_now'], SESSION_SYNC_OVERLAP)
+    )
+    row = cur.fetchone()
+    _last_sync['db_now'] = row['db_now']
+    for token in row['expired'] or []:
+        session_cache.invalidate(hash_token(token))
+
+
+@timed('session')
+def get_user_from_session(session_token: str, cur) -> Optional[Dict[str, Any]]:
+    '''Пользователь по токену сессии; повторные запросы обслуживаются из кэша'''
+    if session_token.startswith(SIGNED_TOKEN_PREFIX):
+        claims = verify_signed_token(session_token)
+        if claims is None:
+            return None
+        sync_revoked_tokens(cur)
+        if claims['jti'] in _revoked:
+            return None
+        return {'id': claims['uid'], 'role': claims['role']}
+    key = hash_token(session_token)
+    if len(session_cache):
+        sync_expired_sessions(cur)
+    else:
+        _last_sync['db_now'] = None
+    user = session_cache.get(key)
+    if user is not None:
+        return user
+    statements.execute(cur, SESSION_USER, (session_token,))
+    row = cur.fetchone()
+    if not row:
+        return None
+    user = dict(row)
+    ttl = float(user.pop('ttl'))
+    db_now = user.pop('db_now')
+    if _last_sync['db_now'] is None:
+        _last_sync['db_now'] = db_now
+        _last_sync['checked'] = time.monotonic()
+    session_cache.put(key, user, ttl)
+    return user
+
+
+def invalidate_session(session_token: str) -> None:
+    session_cache.invalidate(hash_token(session_token))
+
+
+def revoke_session(session_token: str, cur) -> None:
+    '''Завершает сессию: истекает строку в sessions или вносит подписанный токен в список отзыва'''
+    if session_token.startswith(SIGNED_TOKEN_PREFIX):
+        claims = verify_signed_token(session_token)
+        if claims is None:
+            return
+        cur.execute("DELETE FROM revoked_tokens WHERE expires_at <= NOW()")
+        cur.execute(
+            """INSERT INTO revoked_tokens (jti, expires_at, revoked_at)
+               VALUES (%s, TO_TIMESTAMP(%s), clock_timestamp()) ON CONFLICT (jti) DO NOTHING""",
+            (claims['jti'], claims['exp'])
+        )
+        _revoked[claims['jti']] = float(claims['exp'])
+        return
+    cur.execute("UPDATE sessions SET expires_at = clock_timestamp() WHERE session_token = %s", (session_token,))
+    invalidate_session(session_token)
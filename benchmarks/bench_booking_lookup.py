@@ -0,0 +1,100 @@
+"""
+Цена секционирования bookings для запросов по id (V0010, V0014). Первичный
+ключ секционированной таблицы — (id, booking_date), поэтому WHERE id = %s
+проверяет индекс каждой месячной секции; с условием по booking_ids запрос
+сужается до одной. Печатает время на вызов и число просмотренных секций для
+обоих вариантов, а также цену вставки с триггером booking_ids_sync.
+
+    BENCH_DATABASE_URL=postgresql://localhost/sakura_bench python benchmarks/bench_booking_lookup.py [--repeat 2000]
+"""
+import argparse
+import inspect
+import os
+import random
+import sys
+import time
+from datetime import date
+from typing import Any, List
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import harness  # noqa: E402
+
+VARIANTS = {
+    'id only': 'SELECT * FROM bookings WHERE id = %s',
+    'via booking_ids': 'SELECT * FROM bookings WHERE {}',
+}
+TEST_DAY = date(2099, 1, 1)
+
+
+def scanned_partitions(cur, query: str, params: List[Any]) -> int:
+    '''Секции, которые план действительно просматривает (без отсеченных при выполнении)'''
+    cur.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + query, params)
+    nodes = [cur.fetchone()[0][0]['Plan']]
+    scanned = 0
+    while nodes:
+        node = nodes.pop()
+        if node.get('Relation Name', '').startswith('bookings_') and node.get('Actual Loops', 0):
+            scanned += 1
+        nodes.extend(node.get('Plans', ()))
+    return scanned
+
+
+def measure(repeat: int, run) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        run()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    dsn = os.environ['BENCH_DATABASE_URL']
+    harness.configure_env(dsn)
+    by_id = inspect.unwrap(harness.load_handler('bookings')).__globals__['BOOKING_BY_ID']
+
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute('SELECT id FROM bookings ORDER BY random() LIMIT 200')
+    ids = [row[0] for row in cur.fetchall()]
+    cur.execute("SELECT count(*) FROM pg_inherits WHERE inhparent = 'bookings'::regclass")
+    print(f'{cur.fetchone()[0]} partitions, {len(ids)} sample ids')
+    rng = random.Random(1)
+
+    print(f"{'lookup':<18}{'ms/call':>10}{'partitions scanned':>20}")
+    for name, template in VARIANTS.items():
+        query = template.format(by_id)
+        arity = query.count('%s')
+
+        def run():
+            cur.execute(query, [rng.choice(ids)] * arity)
+            cur.fetchall()
+
+        print(f'{name:<18}{measure(args.repeat, run):>10.3f}{scanned_partitions(cur, query, [ids[0]] * arity):>20}')
+
+    # Вставка платит за строку в booking_ids
+    cur.execute('SELECT min(id) FROM users')
+    user_id = cur.fetchone()[0]
+    insert = '''
+        INSERT INTO bookings (client_name, phone, service, master, booking_date, booking_time, user_id)
+        VALUES ('bench', '+7 900 0000000', 'bench', 'bench', %s, '10:00', %s)
+    '''
+    cur.execute('BEGIN')
+    insert_ms = measure(args.repeat, lambda: cur.execute(insert, (TEST_DAY, user_id)))
+    cur.execute('ROLLBACK')
+    cur.execute('BEGIN')
+    cur.execute('ALTER TABLE bookings DISABLE TRIGGER booking_ids_sync')
+    bare_ms = measure(args.repeat, lambda: cur.execute(insert, (TEST_DAY, user_id)))
+    cur.execute('ROLLBACK')
+    print(f'insert ms/row: {insert_ms:.3f} with booking_ids_sync, {bare_ms:.3f} without')
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Сжатие ответа: время и размер тела для gzip и Brotli на разных уровнях
+(GZIP_LEVEL, BROTLI_QUALITY) на списке записей как у админских списков.
+Размер считается после base64 — именно столько уходит через шлюз.
+
+    python benchmarks/bench_compression.py [--rows 10000] [--repeat 10]
+"""
+import argparse
+import base64
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'api'))
+
+import response  # noqa: E402
+from bench_json import make_bookings  # noqa: E402
+
+GZIP_LEVELS = (1, 6, 9)
+BROTLI_QUALITIES = (1, 5, 11)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    body = response.dumps(make_bookings(args.rows)).encode()
+    candidates = [('gzip', level) for level in GZIP_LEVELS]
+    if response.brotli is not None:
+        candidates += [('br', quality) for quality in BROTLI_QUALITIES]
+    else:
+        print('brotli не установлен: только gzip')
+
+    print(f'{args.rows} rows, {len(body) / 1024:.1f} KiB uncompressed, best of {args.repeat}')
+    print(f"{'encoding':<10}{'level':>6}{'ms':>10}{'KiB':>10}{'base64 KiB':>12}{'ratio':>8}")
+    for encoding, level in candidates:
+        best = min(timeit.repeat(lambda: response.compress(body, encoding, level), number=1, repeat=args.repeat))
+        compressed = response.compress(body, encoding, level)
+        encoded = len(base64.b64encode(compressed))
+        print(f'{encoding:<10}{level:>6}{best * 1000:>10.2f}{len(compressed) / 1024:>10.1f}'
+              f'{encoded / 1024:>12.1f}{len(body) / encoded:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
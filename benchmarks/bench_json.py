@@ -0,0 +1,73 @@
+"""
+Микробенчмарк сериализации ответа: 10 000 строк записей (date, time,
+datetime, Decimal) через json.dumps(default=str), как раньше, через
+запасной путь response.encode_json на json.dumps и через orjson, если он
+установлен. Выигрыш по скорости дает только orjson.
+
+    python benchmarks/bench_json.py [--rows 10000] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'api'))
+
+import response  # noqa: E402
+
+
+def make_bookings(rows: int) -> dict:
+    start = date(2024, 1, 1)
+    created = datetime(2023, 12, 1, 9, 30)
+    return {'bookings': [
+        {
+            'id': i,
+            'user_id': 1000 + i % 500,
+            'employee_id': 1 + i % 12,
+            'service_id': 1 + i % 40,
+            'client_name': 'Анна Иванова',
+            'phone': '+7 999 123-45-67',
+            'service': 'Стрижка',
+            'master': 'Мария',
+            'booking_date': start + timedelta(days=i % 365),
+            'booking_time': '14:00',
+            'start_time': time(9 + i % 10, 0),
+            'end_time': time(10 + i % 10, 0),
+            'status': 'confirmed',
+            'notes': None,
+            'service_name': 'Стрижка женская',
+            'price': Decimal('2500.00'),
+            'created_at': created + timedelta(minutes=i),
+        }
+        for i in range(rows)
+    ]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    payload = make_bookings(args.rows)
+    candidates = [
+        ('json.dumps(default=str)', lambda: json.dumps(payload, default=str)),
+        ('json.dumps (fallback)', lambda: json.dumps(payload, default=response._default, separators=(',', ':'))),
+    ]
+    if response.orjson is not None:
+        candidates.append(('orjson', lambda: response.dumps(payload)))
+
+    baseline = None
+    print(f'{args.rows} rows, best of {args.repeat}')
+    for name, func in candidates:
+        best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        size = len(func().encode())
+        baseline = baseline or best
+        print(f'{name:<26} {best * 1000:8.2f} ms  {size / 1024:8.1f} KiB  x{baseline / best:.2f}')
+
+
+if __name__ == '__main__':
+    main()
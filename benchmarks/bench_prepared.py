@@ -0,0 +1,102 @@
+"""
+Сравнение «горячих» запросов из реестра prepared.py: обычный execute (разбор
+и планирование на каждый вызов) против PREPARE один раз + EXECUTE. Кроме
+времени на вызов печатает Planning Time из EXPLAIN ANALYZE для обоих вариантов.
+
+    BENCH_DATABASE_URL=postgresql://localhost/sakura_bench python benchmarks/bench_prepared.py [--repeat 2000]
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import harness  # noqa: E402
+
+REGISTRY_FUNCTIONS = ('api', 'bookings', 'reviews')
+
+
+def collect_statements() -> Tuple[Dict[str, str], Dict[str, Any]]:
+    '''Запросы, зарегистрированные обработчиками при импорте, и реестры, в которых они лежат'''
+    definitions: Dict[str, str] = {}
+    registries: Dict[str, Any] = {}
+    for function in REGISTRY_FUNCTIONS:
+        registry = harness.load_handler(function).__globals__['statements']
+        for name, sql in registry.definitions().items():
+            definitions.setdefault(name, sql)
+            registries.setdefault(name, registry)
+    return definitions, registries
+
+
+def sample_params(cur) -> Dict[str, List[Any]]:
+    cur.execute("SELECT user_id FROM sessions WHERE session_token = 'bench-client-1'")
+    client_id = cur.fetchone()[0]
+    return {
+        'session_user': ['bench-client-1'],
+        'user_bookings': [client_id, 101],
+        'user_bookings_after': [client_id, '2030-01-01', '23:59', 2 ** 31 - 1, 101],
+    }
+
+
+def planning_time(cur, query: str, params: List[Any]) -> float:
+    cur.execute('EXPLAIN (ANALYZE, SUMMARY, FORMAT JSON) ' + query, params)
+    return float(cur.fetchone()[0][0]['Planning Time'])
+
+
+def measure(repeat: int, run) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        run()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    dsn = os.environ['BENCH_DATABASE_URL']
+    harness.configure_env(dsn)
+    definitions, registries = collect_statements()
+
+    plain_conn = psycopg2.connect(dsn)
+    prepared_conn = psycopg2.connect(dsn)
+    plain_conn.autocommit = prepared_conn.autocommit = True
+    plain = plain_conn.cursor()
+    prepared = prepared_conn.cursor()
+    params = sample_params(plain)
+
+    print(f"{'statement':<22}{'plain ms':>10}{'prepared ms':>13}{'saved':>8}{'plan ms':>10}{'plan ms (prep)':>16}")
+    for name, sql in sorted(definitions.items()):
+        values = params.get(name, [])
+        registry = registries[name]
+
+        def run_plain():
+            plain.execute(sql, values)
+            plain.fetchall()
+
+        def run_prepared():
+            registry.execute(prepared, name, values)
+            prepared.fetchall()
+
+        for run in (run_plain, run_prepared):
+            measure(50, run)
+        plain_ms = measure(args.repeat, run_plain)
+        prepared_ms = measure(args.repeat, run_prepared)
+
+        placeholders = f" ({', '.join(['%s'] * len(values))})" if values else ''
+        plan_plain = planning_time(plain, sql, values)
+        plan_prepared = planning_time(prepared, f'EXECUTE {name}{placeholders}', values)
+        saved = (plain_ms - prepared_ms) / plain_ms * 100 if plain_ms else 0.0
+        print(f'{name:<22}{plain_ms:>10.3f}{prepared_ms:>13.3f}{saved:>7.1f}%{plan_plain:>10.3f}{plan_prepared:>16.3f}')
+
+    plain_conn.close()
+    prepared_conn.close()
+
+
+if __name__ == '__main__':
+    main()
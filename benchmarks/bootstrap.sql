@@ -0,0 +1,37 @@
+-- Таблицы и колонки, которые обработчики используют, но которых нет в db_migrations
+-- (в рабочей базе они созданы вне миграций). Применяется только к локальной базе для бенчмарков
+-- между V0002 и V0003.
+CREATE TABLE IF NOT EXISTS services (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    description TEXT,
+    duration INTEGER NOT NULL,
+    price NUMERIC(10, 2) NOT NULL,
+    category VARCHAR(100),
+    is_active BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS employee_schedule (
+    id SERIAL PRIMARY KEY,
+    employee_id INTEGER REFERENCES users(id),
+    day_of_week INTEGER NOT NULL,
+    start_time TIME NOT NULL,
+    end_time TIME NOT NULL,
+    is_active BOOLEAN DEFAULT TRUE,
+    UNIQUE (employee_id, day_of_week)
+);
+
+ALTER TABLE users DROP CONSTRAINT IF EXISTS users_role_check;
+ALTER TABLE bookings ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE reviews ADD COLUMN IF NOT EXISTS client_id INTEGER REFERENCES users(id);
+ALTER TABLE reviews ADD COLUMN IF NOT EXISTS booking_id INTEGER;
+ALTER TABLE reviews ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+-- Записи из api/?path=bookings не заполняют колонки исходной формы записи
+ALTER TABLE bookings ALTER COLUMN client_name DROP NOT NULL;
+ALTER TABLE bookings ALTER COLUMN phone DROP NOT NULL;
+ALTER TABLE bookings ALTER COLUMN service DROP NOT NULL;
+ALTER TABLE bookings ALTER COLUMN master DROP NOT NULL;
+ALTER TABLE bookings ALTER COLUMN booking_time DROP NOT NULL;
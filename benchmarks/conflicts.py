@@ -0,0 +1,106 @@
+"""
+Проверка ограничения bookings_employee_no_overlap под параллельной нагрузкой:
+на каждый слот одновременно отправляется несколько POST api/?path=bookings,
+ровно один должен создать запись, остальные — получить 409.
+
+    BENCH_DATABASE_URL=postgresql://localhost/sakura_bench python benchmarks/conflicts.py --slots 20 --parallel 8
+
+Записи создаются на дату далеко за пределами засеянных данных и удаляются
+после проверки. Без ограничения (миграция V0007 не применена) проверка
+не запускается: одна запись на слот тогда ничего бы не доказывала.
+
+Проверка относится к ограничению из V0007; перед миграцией пересечения
+в данных разбираются скриптом scripts/cancel_overlapping_bookings.sql.
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Any, Dict, List
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import harness  # noqa: E402
+
+TEST_DAY = date(2099, 1, 1)
+
+
+def slot_event(user_id: int, employee_id: int, service_id: int, hour: int) -> Dict[str, Any]:
+    return {
+        'httpMethod': 'POST',
+        'queryStringParameters': {'path': 'bookings'},
+        'headers': {},
+        'body': json.dumps({
+            'user_id': user_id,
+            'employee_id': employee_id,
+            'service_id': service_id,
+            'booking_date': TEST_DAY.isoformat(),
+            'start_time': f'{hour % 24:02d}:00',
+            'end_time': f'{hour % 24:02d}:45',
+        }),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--slots', type=int, default=20)
+    parser.add_argument('--parallel', type=int, default=8)
+    args = parser.parse_args()
+
+    dsn = os.environ['BENCH_DATABASE_URL']
+    harness.configure_env(dsn)
+    handler = harness.load_handler('api')
+
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    cur = conn.cursor()
+    # После V0010 ограничение создано на каждой секции bookings
+    cur.execute("SELECT count(*) FROM pg_constraint WHERE contype = 'x' AND conname LIKE '%no_overlap'")
+    if not cur.fetchone()[0]:
+        sys.exit('bookings_employee_no_overlap not found: apply db_migrations first')
+    cur.execute("SELECT id FROM users WHERE role = 'client' ORDER BY id LIMIT 1")
+    user_id = cur.fetchone()[0]
+    cur.execute("SELECT id FROM users WHERE role = 'employee' ORDER BY id")
+    employees = [row[0] for row in cur.fetchall()]
+    cur.execute('SELECT min(id) FROM services')
+    service_id = cur.fetchone()[0]
+    cur.execute('DELETE FROM bookings WHERE booking_date = %s', (TEST_DAY,))
+
+    slots = [(employees[i % len(employees)], i // len(employees)) for i in range(args.slots)]
+    events = [(slot, slot_event(user_id, slot[0], service_id, slot[1])) for slot in slots for _ in range(args.parallel)]
+
+    def call(item):
+        slot, event = item
+        response = handler(event, harness.make_context())
+        created = response['statusCode'] == 200 and 'id' in json.loads(response['body'])
+        return slot, 'created' if created else response['statusCode']
+
+    outcomes: Dict[Any, List[Any]] = {}
+    with ThreadPoolExecutor(max_workers=args.parallel) as pool:
+        for slot, outcome in pool.map(call, events):
+            outcomes.setdefault(slot, []).append(outcome)
+
+    failures = 0
+    for (employee_id, hour), results in sorted(outcomes.items()):
+        created = results.count('created')
+        conflicts = results.count(409)
+        if created != 1 or conflicts != len(results) - 1:
+            failures += 1
+            print(f'employee {employee_id} {hour:02d}:00 — created {created}, 409 {conflicts}, other {results}')
+
+    cur.execute('SELECT count(*) FROM bookings WHERE booking_date = %s', (TEST_DAY,))
+    stored = cur.fetchone()[0]
+    cur.execute('DELETE FROM bookings WHERE booking_date = %s', (TEST_DAY,))
+    conn.close()
+
+    print(f'{len(slots)} slots x {args.parallel} parallel requests: {failures} slot(s) failed, {stored} booking(s) stored')
+    if failures or stored != len(slots):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
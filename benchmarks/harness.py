@@ -0,0 +1,158 @@
+"""
+Общие части бенчмарков: загрузка обработчиков из backend/*/index.py в один
+процесс и подсчет запросов/строк на каждый вызов обработчика.
+
+Каждая функция разворачивается отдельно и содержит свои копии db.py,
+session.py, response.py и т.д. под одинаковыми именами модулей, поэтому
+обработчики импортируются по очереди с очисткой sys.modules между ними.
+"""
+import importlib
+import os
+import sys
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Any, Callable, Dict
+
+import psycopg2
+from psycopg2 import extensions
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BACKEND = os.path.join(ROOT, 'backend')
+MIGRATIONS = os.path.join(ROOT, 'db_migrations')
+FUNCTIONS = ('api', 'auth', 'bookings', 'feedback', 'reviews')
+
+stats = threading.local()
+
+
+def reset_stats() -> None:
+    stats.queries = 0
+    stats.rows = 0
+
+
+def record_statements() -> list:
+    '''Начинает запись выполненных запросов (с подставленными параметрами) в текущем потоке'''
+    stats.statements = []
+    return stats.statements
+
+
+def _record(cursor, query: Any, vars: Any) -> None:
+    statements = getattr(stats, 'statements', None)
+    if statements is not None:
+        statements.append(cursor.mogrify(query, vars).decode())
+
+
+def _count_rows(rows: Any) -> Any:
+    if rows is None:
+        return rows
+    stats.rows = getattr(stats, 'rows', 0) + (len(rows) if isinstance(rows, list) else 1)
+    return rows
+
+
+_counting_classes: Dict[type, type] = {}
+
+
+def counting_cursor_class(base: type) -> type:
+    '''Подкласс курсора (RealDictCursor и т.п.), считающий запросы и полученные строки'''
+    cls = _counting_classes.get(base)
+    if cls is not None:
+        return cls
+
+    class CountingCursor(base):
+        def execute(self, query, vars=None):
+            stats.queries = getattr(stats, 'queries', 0) + 1
+            _record(self, query, vars)
+            return super().execute(query, vars)
+
+        def executemany(self, query, vars_list):
+            stats.queries = getattr(stats, 'queries', 0) + 1
+            return super().executemany(query, vars_list)
+
+        def fetchone(self):
+            return _count_rows(super().fetchone())
+
+        def fetchmany(self, size=None):
+            return _count_rows(super().fetchmany(size) if size is not None else super().fetchmany())
+
+        def fetchall(self):
+            return _count_rows(super().fetchall())
+
+        def __iter__(self):
+            for row in super().__iter__():
+                stats.rows = getattr(stats, 'rows', 0) + 1
+                yield row
+
+    CountingCursor.__name__ = f'Counting{base.__name__}'
+    _counting_classes[base] = CountingCursor
+    return CountingCursor
+
+
+class CountingConnection(extensions.connection):
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.pop('cursor_factory', None) or self.cursor_factory or extensions.cursor
+        kwargs['cursor_factory'] = counting_cursor_class(factory)
+        return super().cursor(*args, **kwargs)
+
+
+_original_connect = psycopg2.connect
+
+
+def _counting_connect(dsn=None, connection_factory=None, **kwargs):
+    '''Подключение со счетчиками; фабрику подключений из timing.py (SERVER_TIMING=1) сохраняет'''
+    if connection_factory is not None and not issubclass(connection_factory, CountingConnection):
+        connection_factory = type(f'Counting{connection_factory.__name__}', (CountingConnection, connection_factory), {})
+    return _original_connect(dsn, connection_factory=connection_factory or CountingConnection, **kwargs)
+
+
+def install_counting() -> None:
+    psycopg2.connect = _counting_connect
+
+
+def configure_env(dsn: str, schema: str = 'public') -> None:
+    '''Обработчики читают DATABASE_URL/MAIN_DB_SCHEMA из окружения, как в облаке'''
+    os.environ['DATABASE_URL'] = dsn
+    os.environ.setdefault('MAIN_DB_SCHEMA', schema)
+
+
+def load_handler(function: str) -> Callable[[Dict[str, Any], Any], Dict[str, Any]]:
+    '''Импортирует backend/<function>/index.py со своими копиями вспомогательных модулей'''
+    directory = os.path.join(BACKEND, function)
+    local_modules = {name[:-3] for name in os.listdir(directory) if name.endswith('.py')}
+    for name in local_modules:
+        sys.modules.pop(name, None)
+    sys.path.insert(0, directory)
+    try:
+        module = importlib.import_module('index')
+    finally:
+        sys.path.remove(directory)
+        for name in local_modules:
+            sys.modules.pop(name, None)
+    return module.handler
+
+
+def load_handlers() -> Dict[str, Callable[[Dict[str, Any], Any], Dict[str, Any]]]:
+    return {function: load_handler(function) for function in FUNCTIONS}
+
+
+def make_context() -> SimpleNamespace:
+    return SimpleNamespace(request_id=str(uuid.uuid4()))
+
+
+def invoke(handler: Callable, event: Dict[str, Any]) -> Dict[str, Any]:
+    '''Вызов обработчика с замером: статус, время, запросы, строки, размер ответа'''
+    reset_stats()
+    started = time.perf_counter()
+    try:
+        response = handler(event, make_context())
+        status = response.get('statusCode', 0)
+        size = len(response.get('body') or '')
+    except Exception:
+        status, size = 599, 0
+    return {
+        'status': status,
+        'elapsed': time.perf_counter() - started,
+        'queries': stats.queries,
+        'rows': stats.rows,
+        'bytes': size,
+    }
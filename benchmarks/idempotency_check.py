@@ -0,0 +1,86 @@
+"""
+Проверка Idempotency-Key под параллельными повторами: для каждого ключа
+одновременно отправляется несколько одинаковых POST в feedback, обращение
+должно создаться ровно одно, а все ответы — совпасть с первым.
+
+    BENCH_DATABASE_URL=postgresql://localhost/sakura_bench python benchmarks/idempotency_check.py --keys 20 --parallel 8
+
+Созданные обращения и ключи удаляются после проверки.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import harness  # noqa: E402
+
+CLIENT_IP = '198.51.100.7'
+
+
+def submit_event(run_id: str, key: str) -> Dict[str, Any]:
+    return {
+        'httpMethod': 'POST',
+        'queryStringParameters': {},
+        'headers': {'Idempotency-Key': key},
+        'requestContext': {'identity': {'sourceIp': CLIENT_IP}},
+        'body': json.dumps({'name': 'Повтор', 'phone': '+7 900 0000000', 'message': f'{run_id} {key}'}),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--keys', type=int, default=20)
+    parser.add_argument('--parallel', type=int, default=8)
+    args = parser.parse_args()
+
+    dsn = os.environ['BENCH_DATABASE_URL']
+    harness.configure_env(dsn)
+    # Повторы с одним телефоном иначе упрутся в лимит feedback_phone
+    os.environ['RATE_LIMITS'] = '0'
+    handler = harness.load_handler('feedback')
+    run_id = f'idempotency-check-{uuid.uuid4()}'
+    keys = [str(uuid.uuid4()) for _ in range(args.keys)]
+    events = [(key, submit_event(run_id, key)) for key in keys for _ in range(args.parallel)]
+
+    def call(item):
+        key, event = item
+        response = handler(event, harness.make_context())
+        return key, (response['statusCode'], response['body'])
+
+    outcomes: Dict[str, List[Any]] = {}
+    with ThreadPoolExecutor(max_workers=args.parallel) as pool:
+        for key, outcome in pool.map(call, events):
+            outcomes.setdefault(key, []).append(outcome)
+
+    failures = 0
+    for key, results in outcomes.items():
+        if len(set(results)) != 1 or results[0][0] != 200:
+            failures += 1
+            print(f'{key}: {results}')
+
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute('SELECT count(*) FROM feedback WHERE message LIKE %s', (run_id + '%',))
+    stored = cur.fetchone()[0]
+    cur.execute('DELETE FROM feedback WHERE message LIKE %s', (run_id + '%',))
+    # key_hash как в idempotency.py: sha256(функция, клиент, ключ)
+    hashes = [hashlib.sha256(f'feedback\0ip:{CLIENT_IP}\0{key}'.encode()).digest() for key in keys]
+    cur.execute("DELETE FROM idempotency_keys WHERE scope = 'feedback' AND key_hash = ANY(%s)", (hashes,))
+    conn.close()
+
+    print(f'{len(keys)} keys x {args.parallel} parallel requests: {failures} key(s) failed, {stored} feedback row(s) stored')
+    if failures or stored != len(keys):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
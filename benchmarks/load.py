@@ -0,0 +1,171 @@
+"""
+Нагрузочный прогон обработчиков на локальной базе (см. seed.py).
+
+    BENCH_DATABASE_URL=postgresql://localhost/sakura_bench \\
+        python benchmarks/load.py --requests 5000 --concurrency 8 --save benchmarks/baseline.json
+    python benchmarks/load.py --compare benchmarks/baseline.json
+
+Смесь запросов задается в mix.json: функция, метод, query, заголовки, тело и
+вес сценария. Плейсхолдеры {client_token}, {service_id}, {future_day} и {n}
+подставляются случайными значениями из засеянных данных. По каждому
+сценарию печатаются p50/p95/p99, число запросов к БД и строк на вызов и
+размер ответа; --save сохраняет результат в JSON, --compare сравнивает
+с сохраненным ранее.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import harness  # noqa: E402
+
+DEFAULT_MIX = os.path.join(os.path.dirname(__file__), 'mix.json')
+CLIENT_TOKENS = 100
+SERVICES = 40
+COMPARED_METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'queries', 'rows', 'bytes')
+
+
+def placeholders(rng: random.Random) -> Dict[str, str]:
+    return {
+        'client_token': f'bench-client-{rng.randint(1, CLIENT_TOKENS)}',
+        'service_id': str(rng.randint(1, SERVICES)),
+        'future_day': (date.today() + timedelta(days=rng.randint(1, 14))).isoformat(),
+        'n': str(rng.randint(1, 10 ** 6)),
+    }
+
+
+def fill(value: Any, values: Dict[str, str]) -> Any:
+    if isinstance(value, str):
+        return value.format(**values)
+    if isinstance(value, dict):
+        return {key: fill(item, values) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill(item, values) for item in value]
+    return value
+
+
+def build_event(scenario: Dict[str, Any], rng: random.Random) -> Dict[str, Any]:
+    values = placeholders(rng)
+    event = {
+        'httpMethod': scenario.get('method', 'GET'),
+        'queryStringParameters': fill(scenario.get('query', {}), values),
+        'headers': fill(scenario.get('headers', {}), values),
+    }
+    if 'body' in scenario:
+        event['body'] = json.dumps(fill(scenario['body'], values), ensure_ascii=False)
+    return event
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    latencies = sorted(result['elapsed'] * 1000 for result in results)
+    count = len(results)
+    return {
+        'count': count,
+        'errors': sum(1 for result in results if result['status'] >= 500),
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'queries': round(sum(result['queries'] for result in results) / count, 2),
+        'rows': round(sum(result['rows'] for result in results) / count, 1),
+        'bytes': round(sum(result['bytes'] for result in results) / count),
+    }
+
+
+def run(mix: List[Dict[str, Any]], handlers: Dict[str, Any], total: int,
+        concurrency: int, seed: int) -> Dict[str, List[Dict[str, Any]]]:
+    rng = random.Random(seed)
+    scenarios = rng.choices(mix, weights=[scenario.get('weight', 1) for scenario in mix], k=total)
+    events = [(scenario['name'], scenario['function'], build_event(scenario, rng)) for scenario in scenarios]
+
+    def call(item):
+        name, function, event = item
+        return name, harness.invoke(handlers[function], event)
+
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for name, result in pool.map(call, events):
+            results.setdefault(name, []).append(result)
+    return results
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    header = f"{'scenario':<26}{'count':>7}{'err':>5}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}{'rows':>9}{'bytes':>9}"
+    print(header)
+    print('-' * len(header))
+    for name, row in sorted(report['scenarios'].items()):
+        print(f"{name:<26}{row['count']:>7}{row['errors']:>5}{row['p50_ms']:>9}{row['p95_ms']:>9}"
+              f"{row['p99_ms']:>9}{row['queries']:>9}{row['rows']:>9}{row['bytes']:>9}")
+    meta = report['meta']
+    print(f"\n{meta['requests']} requests in {meta['duration_s']} s, {meta['rps']} req/s, concurrency {meta['concurrency']}")
+
+
+def print_comparison(report: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    print(f"\n{'scenario':<26}{'metric':<9}{'baseline':>11}{'current':>11}{'change':>9}")
+    for name, row in sorted(report['scenarios'].items()):
+        before = baseline['scenarios'].get(name)
+        if before is None:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = before[metric], row[metric]
+            change = f'{(new - old) / old * 100:+.1f}%' if old else 'n/a'
+            print(f'{name:<26}{metric:<9}{old:>11}{new:>11}{change:>9}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mix', default=DEFAULT_MIX)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save', help='сохранить результат как baseline (JSON)')
+    parser.add_argument('--compare', help='сравнить с сохраненным baseline (JSON)')
+    args = parser.parse_args()
+
+    harness.configure_env(os.environ['BENCH_DATABASE_URL'])
+    harness.install_counting()
+    handlers = harness.load_handlers()
+    with open(args.mix, encoding='utf-8') as f:
+        mix = json.load(f)
+
+    if args.warmup:
+        run(mix, handlers, args.warmup, args.concurrency, args.seed + 1)
+    started = time.perf_counter()
+    results = run(mix, handlers, args.requests, args.concurrency, args.seed)
+    duration = time.perf_counter() - started
+
+    report = {
+        'meta': {
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'duration_s': round(duration, 2),
+            'rps': round(args.requests / duration, 1),
+            'mix': os.path.basename(args.mix),
+        },
+        'scenarios': {name: summarize(items) for name, items in results.items()},
+    }
+    print_report(report)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print_comparison(report, json.load(f))
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Проверка маршрутизации чтения на реплику с двумя локальными базами.
+
+    BENCH_DATABASE_URL=postgresql://localhost:5432/sakura_bench \\
+    BENCH_REPLICA_URL=postgresql://localhost:5433/sakura_bench \\
+        python benchmarks/replica_check.py
+
+Вторая база может быть настоящей репликой (streaming replication) или
+отдельным экземпляром с той же схемой (seed.py на оба). Проверяется:
+публичные GET идут на реплику, запись — в основную базу, клиент после
+записи читает из основной базы, а при превышении допустимого отставания
+(REPLICA_MAX_LAG_SECONDS) чтение переключается на основную базу.
+"""
+import json
+import os
+import sys
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import harness  # noqa: E402
+
+
+def load_api(max_lag: str):
+    os.environ['REPLICA_MAX_LAG_SECONDS'] = max_lag
+    os.environ['REPLICA_LAG_CHECK_INTERVAL'] = '0'
+    handler = harness.load_handler('api')
+    return handler, handler.__globals__['replicas']
+
+
+def get(handler, path: str, headers=None):
+    return handler({'httpMethod': 'GET', 'queryStringParameters': {'path': path}, 'headers': headers or {}},
+                   harness.make_context())
+
+
+def check(condition: bool, message: str) -> int:
+    print(('ok    ' if condition else 'FAIL  ') + message)
+    return 0 if condition else 1
+
+
+def main() -> None:
+    harness.configure_env(os.environ['BENCH_DATABASE_URL'])
+    os.environ['DATABASE_REPLICA_URL'] = os.environ['BENCH_REPLICA_URL']
+    failures = 0
+
+    handler, replicas = load_api('30')
+    get(handler, 'schedule')
+    failures += check(replicas.replica_reads == 1 and replicas.primary_reads == 0, 'GET schedule served by the replica')
+
+    with psycopg2.connect(os.environ['BENCH_DATABASE_URL']) as conn, conn.cursor() as cur:
+        cur.execute("SELECT id FROM users WHERE role = 'employee' ORDER BY id LIMIT 1")
+        employee_id = cur.fetchone()[0]
+    headers = {'X-Session-Token': 'bench-client-1'}
+    # Повторяет расписание из seed.py: запись без изменения данных
+    response = handler({
+        'httpMethod': 'POST',
+        'queryStringParameters': {'path': 'schedule'},
+        'headers': headers,
+        'body': json.dumps({'employee_id': employee_id, 'day_of_week': 1, 'start_time': '09:00', 'end_time': '21:00'}),
+    }, harness.make_context())
+    sticky = (response.get('headers') or {}).get('X-Read-Primary-Until')
+    failures += check(response['statusCode'] == 200 and sticky is not None, 'write response carries X-Read-Primary-Until')
+
+    if sticky:
+        before = replicas.primary_reads
+        get(handler, 'schedule', {'X-Read-Primary-Until': sticky})
+        failures += check(replicas.primary_reads == before + 1, 'read after write goes to the primary (header)')
+        before = replicas.primary_reads
+        get(handler, 'schedule', headers)
+        failures += check(replicas.primary_reads == before + 1, 'read after write goes to the primary (session)')
+
+    handler, replicas = load_api('-1')
+    get(handler, 'schedule')
+    failures += check(replicas.primary_reads == 1 and replicas.replica_reads == 0,
+                      'replica over the lag bound falls back to the primary')
+    print(json.dumps(replicas.stats()))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
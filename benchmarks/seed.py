@@ -0,0 +1,137 @@
+"""
+Создает схему и синтетические данные в локальной базе для бенчмарков.
+
+    BENCH_DATABASE_URL=postgresql://localhost/sakura_bench python benchmarks/seed.py --reset [--scale 1]
+
+При scale=1: 5 000 клиентов, 12 мастеров, 200 000 записей, 50 000 отзывов,
+50 000 обращений. Токены сессий: bench-admin (администратор) и
+bench-client-1 ... bench-client-100 (клиенты).
+"""
+import argparse
+import os
+import sys
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from harness import MIGRATIONS  # noqa: E402
+
+BOOTSTRAP = os.path.join(os.path.dirname(__file__), 'bootstrap.sql')
+BOOTSTRAP_AFTER = 'V0002'
+EMPLOYEES = 12
+SLOTS_PER_DAY = 12
+
+SEED_SQL = """
+INSERT INTO users (email, password_hash, full_name, phone, role)
+SELECT 'client' || i || '@bench.local', md5('bench'), 'Клиент ' || i,
+       '+7 900 ' || lpad(i::text, 7, '0'), 'client'
+FROM generate_series(1, %(users)s) i;
+
+INSERT INTO users (email, password_hash, full_name, phone, role)
+SELECT 'master' || i || '@bench.local', md5('bench'), 'Мастер ' || i,
+       '+7 901 ' || lpad(i::text, 7, '0'), 'employee'
+FROM generate_series(1, %(employees)s) i;
+
+INSERT INTO sessions (user_id, session_token, expires_at)
+SELECT id, 'bench-admin', NOW() + INTERVAL '365 days' FROM users WHERE email = 'admin@sakura.ru';
+
+INSERT INTO sessions (user_id, session_token, expires_at)
+SELECT id, 'bench-client-' || n, NOW() + INTERVAL '365 days'
+FROM (SELECT id, row_number() OVER (ORDER BY id) AS n FROM users WHERE role = 'client') c
+WHERE n <= 100;
+
+INSERT INTO services (name, description, duration, price, category)
+SELECT 'Услуга ' || i, 'Описание услуги ' || i, 30 * (1 + i %% 4), 1000 + 250 * (i %% 12),
+       'Категория ' || (1 + i %% 5)
+FROM generate_series(1, 40) i;
+
+INSERT INTO employee_schedule (employee_id, day_of_week, start_time, end_time)
+SELECT u.id, d, TIME '09:00', TIME '21:00'
+FROM users u CROSS JOIN generate_series(1, 6) d
+WHERE u.role = 'employee';
+
+SELECT bookings_create_partition(month::date)
+FROM generate_series(DATE '2021-01-01', date_trunc('month', CURRENT_DATE), INTERVAL '1 month') AS month;
+
+WITH ids AS (
+    SELECT (SELECT array_agg(id ORDER BY id) FROM users WHERE role = 'employee') AS employees,
+           (SELECT min(id) FROM users WHERE role = 'client') AS first_client,
+           (SELECT min(id) FROM services) AS first_service
+)
+INSERT INTO bookings (client_name, phone, service, master, booking_date, booking_time,
+                      user_id, employee_id, service_id, start_time, end_time, status, created_at)
+SELECT 'Клиент ' || (i %% %(users)s), '+7 900 ' || lpad((i %% %(users)s)::text, 7, '0'),
+       'Услуга ' || (1 + i %% 40), 'Мастер ' || (1 + i %% %(employees)s),
+       DATE '2021-01-01' + (i / %(employees)s / %(slots)s),
+       to_char(TIME '09:00' + (i / %(employees)s %% %(slots)s) * INTERVAL '1 hour', 'HH24:MI'),
+       ids.first_client + i %% %(users)s,
+       ids.employees[1 + i %% %(employees)s],
+       ids.first_service + i %% 40,
+       TIME '09:00' + (i / %(employees)s %% %(slots)s) * INTERVAL '1 hour',
+       TIME '10:00' + (i / %(employees)s %% %(slots)s) * INTERVAL '1 hour',
+       (ARRAY['confirmed', 'confirmed', 'pending', 'completed', 'cancelled'])[1 + i %% 5],
+       TIMESTAMP '2020-12-01' + i * INTERVAL '5 minutes'
+FROM generate_series(0, %(bookings)s - 1) i, ids;
+
+INSERT INTO reviews (author, rating, comment, approved, status, user_id, client_id, created_at)
+SELECT 'Клиент ' || i, 1 + i %% 5, 'Отзыв о посещении салона номер ' || i,
+       i %% 3 <> 0, CASE WHEN i %% 3 <> 0 THEN 'approved' ELSE 'pending' END,
+       c.first_client + i %% %(users)s, c.first_client + i %% %(users)s,
+       NOW() - i * INTERVAL '10 minutes'
+FROM generate_series(1, %(reviews)s) i,
+     (SELECT min(id) AS first_client FROM users WHERE role = 'client') c;
+
+INSERT INTO feedback (name, phone, message, is_read, created_at)
+SELECT 'Гость ' || i, '+7 902 ' || lpad(i::text, 7, '0'), 'Сообщение обратной связи ' || i,
+       i %% 4 <> 0, NOW() - i * INTERVAL '10 minutes'
+FROM generate_series(1, %(feedback)s) i;
+"""
+
+
+def migration_files() -> list:
+    return sorted(name for name in os.listdir(MIGRATIONS) if name.endswith('.sql'))
+
+
+def apply_schema(cur) -> None:
+    bootstrapped = False
+    for name in migration_files():
+        if not bootstrapped and name[:5] > BOOTSTRAP_AFTER:
+            with open(BOOTSTRAP, encoding='utf-8') as f:
+                cur.execute(f.read())
+            bootstrapped = True
+        with open(os.path.join(MIGRATIONS, name), encoding='utf-8') as f:
+            cur.execute(f.read())
+        print(f'applied {name}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--reset', action='store_true', help='пересоздать схему public')
+    args = parser.parse_args()
+
+    dsn = os.environ['BENCH_DATABASE_URL']
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    cur = conn.cursor()
+    if args.reset:
+        cur.execute('DROP SCHEMA IF EXISTS public CASCADE; CREATE SCHEMA public')
+    apply_schema(cur)
+
+    sizes = {
+        'users': int(5000 * args.scale),
+        'employees': EMPLOYEES,
+        'slots': SLOTS_PER_DAY,
+        'bookings': int(200000 * args.scale),
+        'reviews': int(50000 * args.scale),
+        'feedback': int(50000 * args.scale),
+    }
+    cur.execute(SEED_SQL, sizes)
+    cur.execute('ANALYZE')
+    print('seeded ' + ', '.join(f'{k}={v}' for k, v in sizes.items()))
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,2 @@
+-- Индекс для выборки недавно истекших сессий при синхронизации кэша сессий
+CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions(expires_at);
@@ -0,0 +1,7 @@
+-- Составные индексы под keyset-пагинацию списков записей
+CREATE INDEX IF NOT EXISTS idx_bookings_date_time_id
+    ON bookings(booking_date DESC, booking_time DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_bookings_user_date_time_id
+    ON bookings(user_id, booking_date DESC, booking_time DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_bookings_date_start_time_id
+    ON bookings(booking_date DESC, (COALESCE(start_time, TIME '24:00')) DESC, id DESC);
@@ -0,0 +1,42 @@
+-- Запрет пересекающихся записей к одному сотруднику на уровне БД (без блокировок таблицы)
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+-- С уже пересекающимися записями ограничение не добавить. Миграция данные
+-- не меняет: она останавливается со списком записей, которые начинаются
+-- раньше, чем закончилась предыдущая запись того же сотрудника. Разобрать
+-- их можно скриптом scripts/cancel_overlapping_bookings.sql и повторить
+-- миграцию. Поиск — одна сортировка с оконным максимумом, без самосоединения.
+DO $$
+DECLARE
+    conflicts TEXT;
+    total INTEGER;
+BEGIN
+    SELECT count(*), string_agg(id::text, ', ' ORDER BY id) FILTER (WHERE rn <= 50)
+    INTO total, conflicts
+    FROM (
+        SELECT id, row_number() OVER (ORDER BY id) AS rn
+        FROM (
+            SELECT id, booking_date + start_time AS starts_at,
+                   max(booking_date + end_time) OVER (
+                       PARTITION BY employee_id ORDER BY booking_date + start_time, id
+                       ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                   ) AS previous_end
+            FROM bookings
+            WHERE status <> 'cancelled' AND employee_id IS NOT NULL
+              AND start_time IS NOT NULL AND end_time IS NOT NULL
+        ) ordered
+        WHERE starts_at < previous_end
+    ) overlapping;
+    IF total > 0 THEN
+        RAISE EXCEPTION 'bookings_employee_no_overlap: % overlapping booking(s), ids: %', total, conflicts
+            USING HINT = 'Review and run scripts/cancel_overlapping_bookings.sql, then apply this migration again';
+    END IF;
+END;
+$$;
+
+ALTER TABLE bookings ADD CONSTRAINT bookings_employee_no_overlap
+    EXCLUDE USING gist (
+        employee_id WITH =,
+        tsrange(booking_date + start_time, booking_date + end_time) WITH &&
+    )
+    WHERE (status <> 'cancelled' AND employee_id IS NOT NULL AND start_time IS NOT NULL AND end_time IS NOT NULL);
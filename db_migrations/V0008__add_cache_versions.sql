@@ -0,0 +1,8 @@
+-- Версии закэшированных справочников: экземпляры функций сверяют их вместо перечитывания данных
+CREATE TABLE IF NOT EXISTS cache_versions (
+    name VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO cache_versions (name, version) VALUES ('services', 1)
+ON CONFLICT (name) DO NOTHING;
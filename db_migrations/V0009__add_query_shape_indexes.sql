@@ -0,0 +1,40 @@
+-- Составные и частичные индексы под форму «горячих» запросов: фильтр + сортировка
+-- Отзывы: публичный список, очередь модерации, список по статусу и весь список для админа
+CREATE INDEX IF NOT EXISTS idx_reviews_approved_created_at
+    ON reviews(created_at DESC) WHERE approved = TRUE;
+CREATE INDEX IF NOT EXISTS idx_reviews_pending_created_at
+    ON reviews(created_at DESC) WHERE approved = FALSE;
+CREATE INDEX IF NOT EXISTS idx_reviews_status_created_at
+    ON reviews(status, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_reviews_created_at
+    ON reviews(created_at DESC);
+
+-- Обращения: список (обратный проход), выгрузка по дате и непрочитанные для сводки
+CREATE INDEX IF NOT EXISTS idx_feedback_created_at_id
+    ON feedback(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_feedback_unread_created_at
+    ON feedback(created_at DESC) WHERE is_read = FALSE;
+
+-- Записи клиента и сотрудника в порядке календаря (api?path=bookings);
+-- индекс по сотруднику покрывает и поиск занятости по дням
+CREATE INDEX IF NOT EXISTS idx_bookings_user_date_start_time_id
+    ON bookings(user_id, booking_date DESC, (COALESCE(start_time, TIME '24:00')) DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_bookings_employee_date_start_time_id
+    ON bookings(employee_id, booking_date DESC, (COALESCE(start_time, TIME '24:00')) DESC, id DESC);
+
+-- Расписание и каталог: только активные строки в порядке выдачи
+CREATE INDEX IF NOT EXISTS idx_employee_schedule_active
+    ON employee_schedule(employee_id, day_of_week) WHERE is_active = TRUE;
+CREATE INDEX IF NOT EXISTS idx_services_active_category_name
+    ON services(category, name) WHERE is_active = TRUE;
+
+-- Одноколоночные индексы, ставшие префиксами составных или замененные частичными.
+-- Все условия по approved и is_read в коде — литералы TRUE/FALSE, их покрывают
+-- частичные индексы; сводка панели (api/dashboard.py) идет по ним и по
+-- idx_bookings_date_start_time_id (V0006), см. tests/test_plans.py
+DROP INDEX IF EXISTS idx_bookings_user_id;       -- idx_bookings_user_date_start_time_id
+DROP INDEX IF EXISTS idx_bookings_employee_id;   -- idx_bookings_employee_date_start_time_id
+DROP INDEX IF EXISTS idx_bookings_date;          -- idx_bookings_date_start_time_id
+DROP INDEX IF EXISTS idx_reviews_approved;       -- idx_reviews_approved_created_at, idx_reviews_pending_created_at
+DROP INDEX IF EXISTS idx_reviews_status;         -- idx_reviews_status_created_at
+DROP INDEX IF EXISTS idx_feedback_is_read;       -- idx_feedback_unread_created_at
@@ -0,0 +1,107 @@
+-- Помесячное секционирование bookings по booking_date. Секции создает
+-- bookings_create_partition (ее же вызывает обслуживание, см.
+-- backend/bookings/maintenance.py); строки вне созданных секций попадают
+-- в bookings_default. Старые секции переносятся в bookings_archive.
+
+LOCK TABLE bookings IN ACCESS EXCLUSIVE MODE;
+ALTER TABLE bookings RENAME TO bookings_unpartitioned;
+
+CREATE TABLE bookings (LIKE bookings_unpartitioned INCLUDING DEFAULTS)
+    PARTITION BY RANGE (booking_date);
+ALTER SEQUENCE bookings_id_seq OWNED BY bookings.id;
+
+CREATE TABLE bookings_default PARTITION OF bookings DEFAULT;
+
+-- Запрет пересечений (V0007) задается на каждой секции: запись не выходит
+-- за пределы одного дня, поэтому пересекающиеся записи всегда в одной секции
+CREATE OR REPLACE FUNCTION bookings_add_overlap_exclusion(partition_name TEXT) RETURNS VOID AS $$
+BEGIN
+    EXECUTE format(
+        'ALTER TABLE %I ADD CONSTRAINT %I EXCLUDE USING gist ('
+        '    employee_id WITH =,'
+        '    tsrange(booking_date + start_time, booking_date + end_time) WITH &&'
+        ') WHERE (status <> ''cancelled'' AND employee_id IS NOT NULL'
+        '         AND start_time IS NOT NULL AND end_time IS NOT NULL)',
+        partition_name, partition_name || '_no_overlap'
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT bookings_add_overlap_exclusion('bookings_default');
+
+-- Секция месяца month; NULL, если она уже есть. Строки этого месяца,
+-- успевшие попасть в bookings_default, переносятся в новую секцию.
+CREATE OR REPLACE FUNCTION bookings_create_partition(month DATE) RETURNS TEXT AS $$
+DECLARE
+    start_date DATE := date_trunc('month', month)::date;
+    end_date DATE := (date_trunc('month', month) + INTERVAL '1 month')::date;
+    partition_name TEXT := 'bookings_p' || to_char(month, 'YYYYMM');
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN NULL;
+    END IF;
+    DROP TABLE IF EXISTS pg_temp.bookings_moved;
+    CREATE TEMP TABLE bookings_moved AS
+        SELECT * FROM bookings_default WHERE booking_date >= start_date AND booking_date < end_date;
+    DELETE FROM bookings_default WHERE booking_date >= start_date AND booking_date < end_date;
+    EXECUTE format(
+        'CREATE TABLE %I PARTITION OF bookings FOR VALUES FROM (%L) TO (%L)',
+        partition_name, start_date, end_date
+    );
+    PERFORM bookings_add_overlap_exclusion(partition_name);
+    INSERT INTO bookings SELECT * FROM bookings_moved;
+    DROP TABLE bookings_moved;
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT bookings_create_partition(month::date)
+FROM generate_series(
+    date_trunc('month', COALESCE((SELECT min(booking_date) FROM bookings_unpartitioned), CURRENT_DATE)),
+    date_trunc('month', CURRENT_DATE) + INTERVAL '3 months',
+    INTERVAL '1 month'
+) AS month;
+
+INSERT INTO bookings SELECT * FROM bookings_unpartitioned;
+DROP TABLE bookings_unpartitioned;
+
+-- Первичный ключ секционированной таблицы обязан включать booking_date
+ALTER TABLE bookings ADD CONSTRAINT bookings_pkey PRIMARY KEY (id, booking_date);
+ALTER TABLE bookings ADD CONSTRAINT bookings_user_id_fkey FOREIGN KEY (user_id) REFERENCES users(id);
+
+-- Индексы из V0003/V0006/V0009, теперь на каждой секции
+CREATE INDEX IF NOT EXISTS idx_bookings_service_id ON bookings(service_id);
+CREATE INDEX IF NOT EXISTS idx_bookings_date_time_id
+    ON bookings(booking_date DESC, booking_time DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_bookings_user_date_time_id
+    ON bookings(user_id, booking_date DESC, booking_time DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_bookings_date_start_time_id
+    ON bookings(booking_date DESC, (COALESCE(start_time, TIME '24:00')) DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_bookings_user_date_start_time_id
+    ON bookings(user_id, booking_date DESC, (COALESCE(start_time, TIME '24:00')) DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_bookings_employee_date_start_time_id
+    ON bookings(employee_id, booking_date DESC, (COALESCE(start_time, TIME '24:00')) DESC, id DESC);
+
+-- Холодная история: те же колонки, без ограничений и с компактными индексами.
+-- Новую колонку bookings нужно добавлять и сюда.
+CREATE TABLE IF NOT EXISTS bookings_archive (LIKE bookings);
+CREATE INDEX IF NOT EXISTS idx_bookings_archive_date ON bookings_archive USING brin (booking_date);
+CREATE INDEX IF NOT EXISTS idx_bookings_archive_user_id ON bookings_archive(user_id);
+
+-- Отсоединяет секцию месяца month, переносит ее строки в bookings_archive
+-- и удаляет секцию; возвращает число перенесенных строк
+CREATE OR REPLACE FUNCTION bookings_archive_partition(month DATE) RETURNS BIGINT AS $$
+DECLARE
+    partition_name TEXT := 'bookings_p' || to_char(month, 'YYYYMM');
+    moved BIGINT;
+BEGIN
+    IF to_regclass(partition_name) IS NULL THEN
+        RETURN 0;
+    END IF;
+    EXECUTE format('ALTER TABLE bookings DETACH PARTITION %I', partition_name);
+    EXECUTE format('INSERT INTO bookings_archive SELECT * FROM %I ORDER BY booking_date, id', partition_name);
+    GET DIAGNOSTICS moved = ROW_COUNT;
+    EXECUTE format('DROP TABLE %I', partition_name);
+    RETURN moved;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,16 @@
+-- Ответы на POST с заголовком Idempotency-Key (bookings, feedback, reviews).
+-- key_hash = sha256(функция, пользователь, ключ); status_code IS NULL — ключ
+-- зарезервирован, ответ еще не сохранен. Истекшие строки удаляет обслуживание
+-- bookings (maintenance.py).
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    scope VARCHAR(20) NOT NULL,
+    key_hash BYTEA NOT NULL,
+    request_hash BYTEA NOT NULL,
+    status_code SMALLINT,
+    response TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    expires_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (scope, key_hash)
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at ON idempotency_keys(expires_at);
@@ -0,0 +1,11 @@
+-- Общие для экземпляров функций bucket ограничения частоты (RATE_LIMIT_SHARED=1).
+-- bucket = sha256(правило, ключ); таблица без журнала: счетчики не нужно
+-- восстанавливать после сбоя. Давно не обновлявшиеся строки удаляет
+-- обслуживание bookings (maintenance.py).
+CREATE UNLOGGED TABLE IF NOT EXISTS rate_limits (
+    bucket BYTEA PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_rate_limits_updated_at ON rate_limits(updated_at);
@@ -0,0 +1,9 @@
+-- Ключ keyset-пагинации функции bookings: пустое booking_time сортируется
+-- как '24:00' (COALESCE), поэтому индексы строятся по тому же выражению
+DROP INDEX IF EXISTS idx_bookings_date_time_id;
+DROP INDEX IF EXISTS idx_bookings_user_date_time_id;
+
+CREATE INDEX IF NOT EXISTS idx_bookings_date_time_id
+    ON bookings(booking_date DESC, (COALESCE(booking_time, '24:00')) DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_bookings_user_date_time_id
+    ON bookings(user_id, booking_date DESC, (COALESCE(booking_time, '24:00')) DESC, id DESC);
@@ -0,0 +1,60 @@
+-- Уникальность bookings.id после секционирования (V0010). Первичный ключ
+-- секционированной таблицы обязан включать booking_date, поэтому
+-- PRIMARY KEY (id, booking_date) не запрещает один id в двух секциях, на
+-- bookings(id) нельзя сослаться внешним ключом, а поиск по одному id
+-- проверяет индекс каждой месячной секции.
+--
+-- booking_ids — несекционированный указатель id -> booking_date, который
+-- ведет триггер: его PRIMARY KEY дает глобальную уникальность id и цель для
+-- внешних ключей, а условие booking_date = (SELECT ... FROM booking_ids)
+-- сужает запрос по id до одной секции (run-time pruning). Цена — вставка
+-- в booking_ids на каждую новую запись (benchmarks/bench_booking_lookup.py).
+CREATE TABLE IF NOT EXISTS booking_ids (
+    id INTEGER PRIMARY KEY,
+    booking_date DATE NOT NULL
+);
+
+LOCK TABLE bookings IN SHARE ROW EXCLUSIVE MODE;
+INSERT INTO booking_ids (id, booking_date)
+SELECT id, booking_date FROM bookings;
+
+-- Перенос строки между секциями (смена booking_date) приходит как DELETE
+-- и INSERT; UPDATE без переноса — как UPDATE
+CREATE OR REPLACE FUNCTION booking_ids_sync() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO booking_ids (id, booking_date) VALUES (NEW.id, NEW.booking_date);
+    ELSIF TG_OP = 'DELETE' THEN
+        DELETE FROM booking_ids WHERE id = OLD.id AND booking_date = OLD.booking_date;
+    ELSIF NEW.id IS DISTINCT FROM OLD.id OR NEW.booking_date IS DISTINCT FROM OLD.booking_date THEN
+        UPDATE booking_ids SET id = NEW.id, booking_date = NEW.booking_date WHERE id = OLD.id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS booking_ids_sync ON bookings;
+CREATE TRIGGER booking_ids_sync
+    AFTER INSERT OR DELETE OR UPDATE OF id, booking_date ON bookings
+    FOR EACH ROW EXECUTE FUNCTION booking_ids_sync();
+
+-- Строки архивированной секции уходят из bookings без DELETE — их указатели
+-- удаляются вместе с секцией
+CREATE OR REPLACE FUNCTION bookings_archive_partition(month DATE) RETURNS BIGINT AS $$
+DECLARE
+    partition_name TEXT := 'bookings_p' || to_char(month, 'YYYYMM');
+    moved BIGINT;
+BEGIN
+    IF to_regclass(partition_name) IS NULL THEN
+        RETURN 0;
+    END IF;
+    EXECUTE format('ALTER TABLE bookings DETACH PARTITION %I', partition_name);
+    EXECUTE format('INSERT INTO bookings_archive SELECT * FROM %I ORDER BY booking_date, id', partition_name);
+    GET DIAGNOSTICS moved = ROW_COUNT;
+    EXECUTE format('DROP TABLE %I', partition_name);
+    DELETE FROM booking_ids
+    WHERE booking_date >= date_trunc('month', month)::date
+      AND booking_date < (date_trunc('month', month) + INTERVAL '1 month')::date;
+    RETURN moved;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,26 @@
+-- Версия свободных слотов (api/availability.py) в cache_versions: экземпляры
+-- функций сверяют ее перед выдачей закэшированных интервалов. Версию
+-- увеличивают триггеры уровня оператора на bookings и employee_schedule, так
+-- что ее меняет запись из любой функции (api, bookings, обслуживание секций)
+-- в той же транзакции. Цена — обновление одной строки cache_versions на
+-- каждый изменяющий оператор; пишущие транзакции по записям ждут друг друга
+-- на этой строке до фиксации.
+INSERT INTO cache_versions (name, version) VALUES ('availability', 1)
+ON CONFLICT (name) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_availability_version() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE cache_versions SET version = version + 1 WHERE name = 'availability';
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS bookings_availability_version ON bookings;
+CREATE TRIGGER bookings_availability_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON bookings
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_availability_version();
+
+DROP TRIGGER IF EXISTS employee_schedule_availability_version ON employee_schedule;
+CREATE TRIGGER employee_schedule_availability_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON employee_schedule
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_availability_version();
@@ -0,0 +1,41 @@
+-- Разбор пересекающихся записей перед миграцией V0007 (bookings_employee_no_overlap).
+-- Запускается вручную в psql после проверки списка:
+--
+--     psql "$DATABASE_URL" -f scripts/cancel_overlapping_bookings.sql
+--
+-- Запись, которая начинается раньше, чем закончилась предыдущая (по времени
+-- начала) неотмененная запись того же сотрудника, отменяется с пометкой в notes;
+-- более ранняя остается. Скрипт не фиксирует транзакцию: после проверки
+-- вывода в той же сессии выполните COMMIT (или ROLLBACK). Цепочку A-B-C, где
+-- C пересекается только с B, скрипт отменит целиком — такие случаи лучше
+-- проверить по выводу до COMMIT.
+\set ON_ERROR_STOP on
+BEGIN;
+
+CREATE TEMP TABLE overlapping_bookings ON COMMIT DROP AS
+SELECT id, employee_id, starts_at, previous_end
+FROM (
+    SELECT id, employee_id, booking_date + start_time AS starts_at,
+           max(booking_date + end_time) OVER (
+               PARTITION BY employee_id ORDER BY booking_date + start_time, id
+               ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+           ) AS previous_end
+    FROM bookings
+    WHERE status <> 'cancelled' AND employee_id IS NOT NULL
+      AND start_time IS NOT NULL AND end_time IS NOT NULL
+) ordered
+WHERE starts_at < previous_end;
+
+SELECT b.id, b.employee_id, b.booking_date, b.start_time, b.end_time, b.status, b.user_id, b.client_name
+FROM bookings b
+JOIN overlapping_bookings o USING (id)
+ORDER BY b.employee_id, b.booking_date, b.start_time;
+
+UPDATE bookings b
+SET status = 'cancelled',
+    notes = concat_ws(E'\n', b.notes, 'Отменена перед V0007: пересекается с более ранней записью сотрудника')
+FROM overlapping_bookings o
+WHERE b.id = o.id
+RETURNING b.id;
+
+\echo 'Проверьте список и выполните COMMIT; или ROLLBACK;'
@@ -66,6 +66,29 @@ export interface Feedback {
   created_at: string;
 }
 
+export interface DashboardSummary {
+  counters: {
+    bookings_today: number;
+    bookings_week: number;
+    unread_feedback: number;
+    pending_reviews: number;
+  };
+  upcoming_bookings: Pick<Booking, 'id' | 'client_name' | 'service' | 'booking_date' | 'booking_time' | 'status'>[];
+  recent_feedback: Omit<Feedback, 'is_read'>[];
+  pending_reviews: Omit<Review, 'approved'>[];
+}
+
+interface Columnar {
+  columns: string[];
+  rows: unknown[][];
+}
+
+function fromColumnar<T>(data: Columnar): T[] {
+  return data.rows.map((row) => Object.fromEntries(data.columns.map((column, i) => [column, row[i]])) as T);
+}
+
+const SUBMIT_ATTEMPTS = 3;
+
 class ApiClient {
   private getSessionToken(): string | null {
     return localStorage.getItem('session_token');
@@ -75,11 +98,13 @@ class ApiClient {
     endpoint: string,
     method: string = 'GET',
     body?: any,
-    requiresAuth: boolean = false
+    requiresAuth: boolean = false,
+    extraHeaders: Record<string, string> = {}
   ): Promise<T> {
     const url = `${API_BASE}/${endpoint}`;
     const headers: Record<string, string> = {
       'Content-Type': 'application/json',
+      ...extraHeaders,
     };
 
     const sessionToken = this.getSessionToken();
@@ -87,6 +112,11 @@ class ApiClient {
       headers['Authorization'] = `Bearer ${sessionToken}`;
     }
 
+    const readPrimaryUntil = localStorage.getItem('read_primary_until');
+    if (readPrimaryUntil && Number(readPrimaryUntil) * 1000 > Date.now()) {
+      headers['X-Read-Primary-Until'] = readPrimaryUntil;
+    }
+
     const options: RequestInit = {
       method,
       headers,
@@ -99,6 +129,11 @@ class ApiClient {
     const response = await fetch(url, options);
     const data = await response.json();
 
+    const primaryUntil = response.headers.get('X-Read-Primary-Until');
+    if (primaryUntil) {
+      localStorage.setItem('read_primary_until', primaryUntil);
+    }
+
     if (!response.ok && requiresAuth && response.status === 401) {
       localStorage.removeItem('session_token');
       localStorage.removeItem('user');
@@ -108,6 +143,19 @@ class ApiClient {
     return data;
   }
 
+  // Создание с Idempotency-Key: при обрыве сети запрос повторяется с тем же
+  // ключом, и сервер возвращает первый ответ вместо повторной вставки
+  private async submit<T>(endpoint: string, body: any, requiresAuth: boolean = false): Promise<T> {
+    const headers = { 'Idempotency-Key': crypto.randomUUID() };
+    for (let attempt = 1; ; attempt++) {
+      try {
+        return await this.request<T>(endpoint, 'POST', body, requiresAuth, headers);
+      } catch (error) {
+        if (attempt >= SUBMIT_ATTEMPTS || !(error instanceof TypeError)) throw error;
+      }
+    }
+  }
+
   async register(email: string, password: string, full_name: string, phone: string): Promise<AuthResponse> {
     const response = await this.request<AuthResponse>(ENDPOINTS.auth, 'POST', {
       action: 'register',
@@ -157,17 +205,27 @@ class ApiClient {
     booking_date: string;
     booking_time: string;
   }): Promise<{ success: boolean; booking_id?: number }> {
-    return this.request(ENDPOINTS.bookings, 'POST', data);
+    return this.submit(ENDPOINTS.bookings, data);
   }
 
-  async getBookings(): Promise<{ bookings: Booking[] }> {
-    return this.request<{ bookings: Booking[] }>(ENDPOINTS.bookings, 'GET', undefined, true);
+  async getBookings(cursor?: string): Promise<{ bookings: Booking[]; next_cursor: string | null }> {
+    const params = new URLSearchParams({ shape: 'columnar' });
+    if (cursor) params.append('cursor', cursor);
+    const data = await this.request<Columnar & { next_cursor: string | null }>(
+      `${ENDPOINTS.bookings}?${params}`, 'GET', undefined, true
+    );
+    if (!data.columns) return data as unknown as { bookings: Booking[]; next_cursor: string | null };
+    return { bookings: fromColumnar<Booking>(data), next_cursor: data.next_cursor };
   }
 
   async updateBooking(id: number, status: string): Promise<{ success: boolean }> {
     return this.request(ENDPOINTS.bookings, 'PUT', { id, status }, true);
   }
 
+  async updateBookingsStatus(ids: number[], status: string): Promise<{ success: boolean; updated: number; results: { id: number; success: boolean }[] }> {
+    return this.request(ENDPOINTS.bookings, 'PUT', { ids, status }, true);
+  }
+
   async getReviews(): Promise<{ reviews: Review[] }> {
     return this.request<{ reviews: Review[] }>(ENDPOINTS.reviews, 'GET');
   }
@@ -177,7 +235,7 @@ class ApiClient {
     rating: number;
     comment: string;
   }): Promise<{ success: boolean; review_id?: number }> {
-    return this.request(ENDPOINTS.reviews, 'POST', data, true);
+    return this.submit(ENDPOINTS.reviews, data, true);
   }
 
   async approveReview(id: number, approved: boolean): Promise<{ success: boolean }> {
@@ -189,11 +247,13 @@ class ApiClient {
     phone: string;
     message: string;
   }): Promise<{ success: boolean; feedback_id?: number }> {
-    return this.request(ENDPOINTS.feedback, 'POST', data);
+    return this.submit(ENDPOINTS.feedback, data);
   }
 
   async getFeedback(): Promise<{ feedback: Feedback[] }> {
-    return this.request<{ feedback: Feedback[] }>(ENDPOINTS.feedback, 'GET', undefined, true);
+    const data = await this.request<Columnar>(`${ENDPOINTS.feedback}?shape=columnar`, 'GET', undefined, true);
+    if (!data.columns) return data as unknown as { feedback: Feedback[] };
+    return { feedback: fromColumnar<Feedback>(data) };
   }
 
   async markFeedbackAsRead(id: number, is_read: boolean): Promise<{ success: boolean }> {
@@ -222,6 +282,10 @@ class ApiClient {
     return this.request(`${ENDPOINTS.api}?path=services&id=${id}`, 'DELETE', undefined, true);
   }
 
+  async getDashboard(): Promise<DashboardSummary> {
+    return this.request<DashboardSummary>(`${ENDPOINTS.api}?path=dashboard`, 'GET', undefined, true);
+  }
+
   async getAllUsers(): Promise<{ users: User[] }> {
     return this.request<{ users: User[] }>(`${ENDPOINTS.api}?path=users`, 'GET', undefined, true);
   }
@@ -36,6 +36,31 @@ interface Review {
   created_at: string;
 }
 
+interface BulkResult {
+  index?: number;
+  id?: number;
+  status: string;
+  error?: string;
+}
+
+interface Slot {
+  employee_id: number;
+  date: string;
+  start_time: string;
+  end_time: string;
+}
+
+interface BatchRequest {
+  path: 'services' | 'schedule' | 'reviews' | 'availability' | 'me';
+  params?: Record<string, string>;
+}
+
+interface BatchResult<T = any> {
+  path?: string;
+  status: number;
+  body: T;
+}
+
 interface User {
   id: number;
   email: string;
@@ -78,11 +103,14 @@ class APIClient {
     return response.json();
   }
 
-  async getBookings(params?: { user_id?: number; employee_id?: number; status?: string }): Promise<{ bookings: Booking[] }> {
+  async getBookings(params?: { user_id?: number; employee_id?: number; status?: string; cursor?: string; limit?: number; fields?: string[] }): Promise<{ bookings: Booking[]; next_cursor: string | null }> {
     const queryParams = new URLSearchParams({ path: 'bookings' });
     if (params?.user_id) queryParams.append('user_id', params.user_id.toString());
     if (params?.employee_id) queryParams.append('employee_id', params.employee_id.toString());
     if (params?.status) queryParams.append('status', params.status);
+    if (params?.cursor) queryParams.append('cursor', params.cursor);
+    if (params?.limit) queryParams.append('limit', params.limit.toString());
+    if (params?.fields?.length) queryParams.append('fields', params.fields.join(','));
 
     const response = await fetch(`${API_URL}?${queryParams}`);
     if (!response.ok) throw new Error('Failed to fetch bookings');
@@ -109,6 +137,26 @@ class APIClient {
     return response.json();
   }
 
+  async createBookings(data: Omit<Booking, 'id' | 'created_at'>[]): Promise<{ results: BulkResult[]; created: number }> {
+    const response = await fetch(`${API_URL}?path=bookings`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(data),
+    });
+    if (!response.ok) throw new Error('Failed to create bookings');
+    return response.json();
+  }
+
+  async updateBookingsStatus(ids: number[], status: string): Promise<{ results: BulkResult[]; updated: number }> {
+    const response = await fetch(`${API_URL}?path=bookings`, {
+      method: 'PUT',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ ids, status }),
+    });
+    if (!response.ok) throw new Error('Failed to update bookings');
+    return response.json();
+  }
+
   async getReviews(status: string = 'approved'): Promise<{ reviews: Review[] }> {
     const response = await fetch(`${API_URL}?path=reviews&status=${status}`);
     if (!response.ok) throw new Error('Failed to fetch reviews');
@@ -164,6 +212,31 @@ class APIClient {
     return response.json();
   }
 
+  async getAvailability(params: { service_id: number; date_from?: string; date_to?: string; employee_id?: number }): Promise<{ service_id: number; duration: number; slots: Slot[] }> {
+    const queryParams = new URLSearchParams({ path: 'availability', service_id: params.service_id.toString() });
+    if (params.date_from) queryParams.append('date_from', params.date_from);
+    if (params.date_to) queryParams.append('date_to', params.date_to);
+    if (params.employee_id) queryParams.append('employee_id', params.employee_id.toString());
+
+    const response = await fetch(`${API_URL}?${queryParams}`);
+    if (!response.ok) throw new Error('Failed to fetch availability');
+    return response.json();
+  }
+
+  async batch(requests: BatchRequest[]): Promise<{ results: BatchResult[] }> {
+    const headers: Record<string, string> = { 'Content-Type': 'application/json' };
+    const sessionToken = localStorage.getItem('session_token');
+    if (sessionToken) headers['X-Session-Token'] = sessionToken;
+
+    const response = await fetch(`${API_URL}?path=batch`, {
+      method: 'POST',
+      headers,
+      body: JSON.stringify(requests),
+    });
+    if (!response.ok) throw new Error('Failed to run batch request');
+    return response.json();
+  }
+
   async createSchedule(data: { employee_id: number; day_of_week: number; start_time: string; end_time: string }): Promise<{ id: number; status: string }> {
     const response = await fetch(`${API_URL}?path=schedule`, {
       method: 'POST',
@@ -176,4 +249,4 @@ class APIClient {
 }
 
 export const apiClient = new APIClient();
-export type { Service, Booking, Review, User };
+export type { Service, Booking, Review, User, Slot, BatchRequest, BatchResult };
@@ -18,6 +18,8 @@ function Cabinet() {
   const { toast } = useToast();
   const [bookings, setBookings] = useState<Booking[]>([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     if (!authLoading && !user) {
@@ -35,6 +37,7 @@ function Cabinet() {
     try {
       const result = await api.getBookings();
       setBookings(result.bookings);
+      setNextCursor(result.next_cursor);
     } catch (error) {
       toast({
         title: 'Ошибка',
@@ -46,6 +49,24 @@ function Cabinet() {
     }
   };
 
+  const loadMoreBookings = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const result = await api.getBookings(nextCursor);
+      setBookings((current) => [...current, ...result.bookings]);
+      setNextCursor(result.next_cursor);
+    } catch (error) {
+      toast({
+        title: 'Ошибка',
+        description: 'Не удалось загрузить записи',
+        variant: 'destructive',
+      });
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleCancelBooking = async (id: number) => {
     try {
       await api.updateBooking(id, 'cancelled');
@@ -252,6 +273,16 @@ function Cabinet() {
                         </CardContent>
                       </Card>
                     ))}
+                    {nextCursor && (
+                      <Button
+                        variant="outline"
+                        className="w-full"
+                        onClick={loadMoreBookings}
+                        disabled={loadingMore}
+                      >
+                        {loadingMore ? 'Загрузка...' : 'Показать еще'}
+                      </Button>
+                    )}
                   </div>
                 )}
               </CardContent>
@@ -0,0 +1,170 @@
+"""
+Планы «горячих» запросов на засеянной базе (benchmarks/seed.py).
+
+    BENCH_DATABASE_URL=postgresql://localhost/sakura_bench python -m pytest tests/test_plans.py
+
+Без BENCH_DATABASE_URL тесты пропускаются. Читающие сценарии из mix.json
+и PLAN_SCENARIOS вызываются через настоящие обработчики; каждый выполненный
+SELECT записывается с подставленными параметрами и прогоняется через EXPLAIN
+с enable_seqscan и enable_sort выключенными. Так план с Seq Scan или Sort
+остается, только если у запроса нет подходящего индекса, и результат
+не зависит от объема засеянных данных.
+"""
+import importlib.util
+import json
+import os
+import random
+import sys
+from datetime import date, timedelta
+from typing import Any, Dict, Iterator, List, Tuple
+
+import pytest
+
+DSN = os.environ.get('BENCH_DATABASE_URL')
+if not DSN:
+    pytest.skip('BENCH_DATABASE_URL не задан', allow_module_level=True)
+
+import psycopg2  # noqa: E402
+
+BENCHMARKS = os.path.join(os.path.dirname(__file__), '..', 'benchmarks')
+BACKEND = os.path.join(os.path.dirname(__file__), '..', 'backend')
+sys.path.insert(0, BENCHMARKS)
+
+import harness  # noqa: E402
+from load import DEFAULT_MIX, build_event  # noqa: E402
+
+# Сочетания фильтров, которых нет в нагрузочной смеси
+PLAN_SCENARIOS = [
+    {'name': 'api_bookings_by_employee', 'function': 'api',
+     'query': {'path': 'bookings', 'employee_id': '{employee_id}'}},
+    {'name': 'api_bookings_by_client', 'function': 'api',
+     'query': {'path': 'bookings', 'user_id': '{client_id}'}},
+    {'name': 'api_reviews_pending', 'function': 'api',
+     'query': {'path': 'reviews', 'status': 'pending'}},
+    {'name': 'api_schedule_employee', 'function': 'api',
+     'query': {'path': 'schedule', 'employee_id': '{employee_id}'}},
+    {'name': 'reviews_admin', 'function': 'reviews',
+     'headers': {'X-Session-Token': 'bench-admin'}},
+    {'name': 'bookings_export', 'function': 'bookings',
+     'headers': {'X-Session-Token': 'bench-admin'},
+     'query': {'format': 'csv', 'date_from': '{week_ago}', 'date_to': '{today}'}},
+    {'name': 'feedback_export', 'function': 'feedback',
+     'headers': {'X-Session-Token': 'bench-admin'},
+     'query': {'format': 'csv', 'date_from': '{week_ago}', 'date_to': '{today}'}},
+]
+
+BAD_NODES = ('Seq Scan', 'Sort', 'Incremental Sort')
+
+# Частичные индексы V0009, заменившие idx_feedback_is_read и idx_reviews_approved
+# в счетчиках и списках сводки; idx_bookings_date заменен составным
+# idx_bookings_date_start_time_id с тем же первым столбцом
+DASHBOARD_INDEXES = ('idx_feedback_unread_created_at', 'idx_reviews_pending_created_at')
+
+
+def is_read_only(scenario: Dict[str, Any]) -> bool:
+    return scenario.get('method', 'GET') == 'GET' or scenario.get('query', {}).get('path') == 'batch'
+
+
+def load_scenarios() -> List[Dict[str, Any]]:
+    with open(DEFAULT_MIX, encoding='utf-8') as f:
+        return [scenario for scenario in json.load(f) if is_read_only(scenario)] + PLAN_SCENARIOS
+
+
+SCENARIOS = load_scenarios()
+
+
+def fill_ids(value: Any, ids: Dict[str, str]) -> Any:
+    if isinstance(value, str):
+        for key, item in ids.items():
+            value = value.replace('{' + key + '}', item)
+        return value
+    if isinstance(value, dict):
+        return {key: fill_ids(item, ids) for key, item in value.items()}
+    return value
+
+
+def walk(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from walk(child)
+
+
+def explain(cur, sql: str, params: Any = None) -> List[Dict[str, Any]]:
+    cur.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+    return list(walk(cur.fetchone()[0][0]['Plan']))
+
+
+def violations(cur, sql: str) -> List[Tuple[str, str]]:
+    return [
+        (node['Node Type'], node.get('Relation Name') or ', '.join(node.get('Sort Key', ())))
+        for node in explain(cur, sql) if node['Node Type'] in BAD_NODES
+    ]
+
+
+@pytest.fixture(scope='module')
+def handlers():
+    harness.configure_env(DSN)
+    # Запросы нужны в исходном виде, а не как EXECUTE подготовленных операторов
+    os.environ['PREPARED_STATEMENTS'] = '0'
+    harness.install_counting()
+    return harness.load_handlers()
+
+
+@pytest.fixture(scope='module')
+def ids() -> Dict[str, str]:
+    with psycopg2.connect(DSN) as conn, conn.cursor() as cur:
+        cur.execute("SELECT min(id) FILTER (WHERE role = 'employee'), min(id) FILTER (WHERE role = 'client') FROM users")
+        employee_id, client_id = cur.fetchone()
+    return {
+        'employee_id': str(employee_id),
+        'client_id': str(client_id),
+        'today': date.today().isoformat(),
+        'week_ago': (date.today() - timedelta(days=7)).isoformat(),
+    }
+
+
+@pytest.fixture(scope='module')
+def cur():
+    conn = psycopg2.connect(DSN)
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute('SET enable_seqscan = off')
+    cursor.execute('SET enable_sort = off')
+    yield cursor
+    conn.close()
+
+
+def capture(scenario: Dict[str, Any], handlers, ids: Dict[str, str]) -> List[str]:
+    '''SELECT-запросы, выполненные обработчиком на сценарии'''
+    event = build_event(fill_ids(scenario, ids), random.Random(1))
+    statements = harness.record_statements()
+    try:
+        result = harness.invoke(handlers[scenario['function']], event)
+    finally:
+        harness.stats.statements = None
+    assert result['status'] < 400, f"{scenario['name']}: статус {result['status']}"
+    return [sql for sql in statements if sql.lstrip().upper().startswith(('SELECT', 'WITH'))]
+
+
+@pytest.mark.parametrize('scenario', SCENARIOS, ids=[scenario['name'] for scenario in SCENARIOS])
+def test_hot_queries_use_indexes(scenario, handlers, ids, cur):
+    found = {}
+    for sql in capture(scenario, handlers, ids):
+        nodes = violations(cur, sql)
+        if nodes:
+            found[' '.join(sql.split())[:300]] = nodes
+    assert not found
+
+
+def test_dashboard_summary_uses_replacement_indexes(cur):
+    spec = importlib.util.spec_from_file_location('dashboard_plans', os.path.join(BACKEND, 'api', 'dashboard.py'))
+    dashboard = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(dashboard)
+    nodes = explain(cur, dashboard.SUMMARY_QUERY, {'limit': dashboard.DASHBOARD_RECENT_ITEMS})
+
+    used = {node.get('Index Name') for node in nodes}
+    for index in DASHBOARD_INDEXES:
+        assert index in used
+    bookings_scans = [node for node in nodes if (node.get('Relation Name') or '').startswith('bookings')]
+    assert bookings_scans
+    assert all(node['Node Type'] != 'Seq Scan' for node in bookings_scans)
@@ -0,0 +1,45 @@
+"""Условные ответы: 304 с теми же ETag и Vary, что и сжатый ответ 200."""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'auth'))
+
+import response  # noqa: E402
+
+BODY = '{"reviews":"' + 'x' * 4096 + '"}'
+
+
+def handler(event, context):
+    return response.cacheable_response(event, BODY, dict(response.JSON_HEADERS, Vary='X-Session-Token'))
+
+
+def conditional(encoding, etag):
+    headers = {'If-None-Match': etag}
+    if encoding:
+        headers['Accept-Encoding'] = encoding
+    return response.compress_response(handler({'headers': headers}, None), {'headers': headers})
+
+
+def test_not_modified_repeats_encoded_etag_and_vary():
+    event = {'headers': {'Accept-Encoding': 'gzip'}}
+    full = response.compress_response(handler(event, None), event)
+    assert full['headers']['ETag'].endswith('-gzip"')
+
+    not_modified = conditional('gzip', full['headers']['ETag'])
+    assert not_modified['statusCode'] == 304
+    assert not_modified['headers']['ETag'] == full['headers']['ETag']
+    assert not_modified['headers']['Vary'] == full['headers']['Vary'] == 'X-Session-Token, Accept-Encoding'
+
+
+def test_not_modified_without_compression_keeps_plain_etag():
+    etag = response.make_etag(BODY)
+    not_modified = conditional(None, etag)
+    assert not_modified['statusCode'] == 304
+    assert not_modified['headers']['ETag'] == etag
+    assert not_modified['headers']['Vary'] == 'X-Session-Token, Accept-Encoding'
+
+
+def test_small_body_has_no_encoding_headers():
+    small = response.cacheable_response({'headers': {'If-None-Match': '*'}}, '{}', dict(response.JSON_HEADERS))
+    assert small['statusCode'] == 304
+    assert 'Vary' not in small['headers']
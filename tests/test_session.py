@@ -0,0 +1,49 @@
+"""Подписанные токены сессий: испорченный токен — не авторизован, а не 500."""
+import base64
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'auth'))
+
+import session  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def signing_keys(monkeypatch):
+    monkeypatch.setattr(session, 'SIGNING_KEYS', session._parse_signing_keys('k2:secret2,k1:secret1'))
+    monkeypatch.setattr(session, 'SESSION_TOKEN_MODE', 'signed')
+
+
+def forge(claims, signature='x'):
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).rstrip(b'=').decode()
+    return f'{session.SIGNED_TOKEN_PREFIX}{payload}.{signature}'
+
+
+def test_issued_token_verifies():
+    token, _ = session.issue_signed_token(7, 'client')
+    claims = session.verify_signed_token(token)
+    assert claims['uid'] == 7 and claims['kid'] == 'k2'
+
+
+@pytest.mark.parametrize('token', [
+    forge({'kid': ['k1'], 'uid': 1}),
+    forge({'kid': {'k': 1}, 'uid': 1}),
+    forge({'kid': None, 'uid': 1}),
+    forge({'uid': 1}),
+    forge(['not', 'a', 'dict']),
+    forge({'kid': 'k1', 'uid': 1}, signature='подпись'),
+    forge({'kid': 'unknown', 'uid': 1}),
+    session.SIGNED_TOKEN_PREFIX + 'no-dot',
+    session.SIGNED_TOKEN_PREFIX + '%%%.sig',
+])
+def test_malformed_token_is_rejected(token):
+    assert session.verify_signed_token(token) is None
+
+
+def test_tampered_payload_is_rejected():
+    token, _ = session.issue_signed_token(7, 'client')
+    _, signature = token[len(session.SIGNED_TOKEN_PREFIX):].split('.')
+    assert session.verify_signed_token(forge({'kid': 'k2', 'uid': 1, 'role': 'admin', 'exp': 2 ** 40}, signature)) is None
@@ -0,0 +1,44 @@
+"""Журнал медленных запросов: что можно повторять через EXPLAIN ANALYZE."""
+import importlib.util
+import os
+
+import pytest
+
+BACKEND = os.path.join(os.path.dirname(__file__), '..', 'backend')
+FUNCTIONS = ('api', 'auth', 'bookings', 'feedback', 'reviews')
+
+
+def load_slowlog(function):
+    spec = importlib.util.spec_from_file_location(f'slowlog_{function}', os.path.join(BACKEND, function, 'slowlog.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(params=FUNCTIONS)
+def slowlog(request):
+    return load_slowlog(request.param)
+
+
+@pytest.mark.parametrize('query', [
+    'SELECT pg_advisory_lock(1)',
+    'SELECT pg_advisory_unlock (%s)',
+    'SELECT bookings_create_partition(%s)',
+    'SELECT bookings_archive_partition(%s)',
+    "SELECT nextval('bookings_id_seq')",
+    'SELECT public.custom_function(1)',
+    'UPDATE bookings SET status = %s',
+    'SELECT * FROM bookings WHERE id = %s FOR UPDATE',
+])
+def test_side_effects_are_not_read_only(slowlog, query):
+    assert slowlog.is_read_only(query) is False
+
+
+@pytest.mark.parametrize('query', [
+    'SELECT * FROM bookings WHERE user_id = %s ORDER BY booking_date DESC LIMIT %s',
+    'SELECT count(*) FROM bookings WHERE employee_id = ANY(%s) AND booking_date IN (%s, %s)',
+    "SELECT COALESCE(json_agg(b), '[]') FROM (SELECT to_char(start_time, 'HH24:MI') FROM bookings) b",
+    "SELECT 'pg_advisory_lock(' AS text",
+])
+def test_plain_reads_are_read_only(slowlog, query):
+    assert slowlog.is_read_only(query) is True